@@ -0,0 +1,186 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import MetaData, create_engine
+
+from benchmarks.synthetic import make_reviews
+from scripts.db_init_and_load import define_schema, load_reviews, upsert_banks
+from scripts.emoji_analysis import aggregate_emojis, emoji_table
+from scripts.keywords_themes import _DEFAULT_TAGGER, tokenize_corpus, top_keywords_by_group
+from scripts.preprocess_reviews import clean
+from scripts.sentiment_engine import label_scores, score_reviews
+
+RESULTS_DIR = Path("benchmarks/results")
+DEFAULT_SIZES = ["10k", "100k"]
+
+
+def _stage_clean(ctx: Dict) -> None:
+    clean(ctx["raw"])
+
+
+def _stage_themes(ctx: Dict) -> None:
+    _DEFAULT_TAGGER.tag_column(ctx["clean"]["review"])
+
+
+def _stage_keywords(ctx: Dict) -> None:
+    df = ctx["clean"]
+    X, terms = tokenize_corpus(df["review"])
+    top_keywords_by_group(X, terms, df[["bank"]], n=30)
+
+
+def _stage_emoji(ctx: Dict) -> None:
+    emojis = emoji_table(ctx["clean"][["review_id", "review", "bank"]])
+    emojis["sentiment_score"] = 0.0
+    aggregate_emojis(emojis)
+
+
+def _stage_sentiment(ctx: Dict) -> None:
+    label_scores(score_reviews(ctx["clean"]["review"], workers=1))
+
+
+def _stage_db_load(ctx: Dict) -> None:
+    df = ctx["clean"].assign(sentiment_label="neutral", sentiment_score=0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        metadata = MetaData()
+        banks_t, reviews_t = define_schema(metadata)
+        with engine.begin() as conn:
+            metadata.create_all(conn)
+            load_reviews(conn, reviews_t, upsert_banks(conn, banks_t, df), df)
+        engine.dispose()
+
+
+# Each stage times one pipeline function on the synthetic corpus (raw rows, or the cleaned ones)
+STAGES: Dict[str, Callable[[Dict], None]] = {
+    "clean": _stage_clean,
+    "themes": _stage_themes,
+    "keywords": _stage_keywords,
+    "emoji": _stage_emoji,
+    "sentiment": _stage_sentiment,
+    "db_load": _stage_db_load,
+}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def measure(fn: Callable[[Dict], None], ctx: Dict, repeat: int = 1, memory: bool = True) -> Dict:
+    """Best-of-``repeat`` wall time, then one traced run for peak Python/NumPy allocations.
+
+    Timing runs are untraced because tracemalloc slows allocation-heavy code down.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(ctx)
+        best = min(best, time.perf_counter() - t0)
+    out = {"seconds": best}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(ctx)
+            out["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return out
+
+
+def run_benchmarks(sizes: List[int], stages: List[str], repeat: int = 1, memory: bool = True,
+                   seed: int = 0) -> List[Dict]:
+    results = []
+    for rows in sizes:
+        raw = make_reviews(rows, seed=seed)
+        ctx = {"raw": raw, "clean": clean(raw)}
+        for name in stages:
+            m = measure(STAGES[name], ctx, repeat=repeat, memory=memory)
+            m.update(stage=name, rows=rows, rows_per_sec=rows / m["seconds"] if m["seconds"] > 0 else None)
+            results.append(m)
+            peak = f"{m['peak_mb']:9.1f} MB" if "peak_mb" in m else ""
+            print(f"{name:<10} {rows:>9,} rows {m['seconds']:9.3f}s {m['rows_per_sec']:12,.0f} rows/s {peak}",
+                  flush=True)
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float = 1.25,
+            min_seconds: float = 0.05) -> List[Dict]:
+    """Stage/size pairs whose time (or peak memory) grew by more than ``threshold`` x the baseline.
+
+    Timings under ``min_seconds`` in the baseline are too noisy to judge and are ignored.
+    """
+    base = {(r["stage"], r["rows"]): r for r in baseline}
+    flagged = []
+    for r in results:
+        old = base.get((r["stage"], r["rows"]))
+        if old is None:
+            continue
+        for metric, floor in (("seconds", min_seconds), ("peak_mb", 1.0)):
+            if metric in r and metric in old and old[metric] >= floor and r[metric] > threshold * old[metric]:
+                flagged.append({"stage": r["stage"], "rows": r["rows"], "metric": metric,
+                                "baseline": old[metric], "current": r[metric], "ratio": r[metric] / old[metric]})
+    return flagged
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory-profile each pipeline stage on synthetic corpora.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Corpus sizes, e.g. 10k 100k 1M")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Timing runs per stage (best is kept)")
+    parser.add_argument("--no_memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="Results JSON (default: benchmarks/results/bench_<UTC timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Flag stages slower (or heavier) than this multiple of the baseline")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    results = run_benchmarks([parse_size(s) for s in args.sizes], args.stages,
+                             repeat=args.repeat, memory=not args.no_memory)
+    report = {
+        "meta": {
+            "started": started.isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    out = args.out or RESULTS_DIR / f"bench_{started:%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved results to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            flagged = compare(results, json.load(f)["results"], threshold=args.threshold)
+        for r in flagged:
+            print(f"REGRESSION {r['stage']} @ {r['rows']:,} rows: {r['metric']} "
+                  f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['ratio']:.2f}x)")
+        if flagged:
+            sys.exit(1)
+        print(f"No stage regressed beyond {args.threshold:.2f}x the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from scripts.sentiment_engine import ScoreCache, label_scores, score_reviews
+from scripts.sentiment_partial import label_from_score
+
+SAMPLE_PATH = Path("data/processed/reviews_clean.csv")
+
+
+def make_corpus(rows: int, seed: int = 0) -> pd.Series:
+    base = pd.read_csv(SAMPLE_PATH, usecols=["review"])["review"].astype(str)
+    sample = base.sample(n=rows, replace=True, random_state=seed).reset_index(drop=True)
+    # Suffix each row so in-run deduplication does not flatter the engine
+    return sample + " #" + sample.index.astype(str)
+
+
+def legacy_path(reviews: pd.Series) -> pd.Series:
+    analyzer = SentimentIntensityAnalyzer()
+    scores = reviews.fillna("").astype(str).apply(analyzer.polarity_scores)
+    compound = scores.apply(lambda s: s["compound"])
+    return compound.apply(label_from_score)
+
+
+def _timed(label: str, rows: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f}s  {rows / elapsed:10.0f} reviews/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sentiment scoring throughput against the legacy apply path.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunksize", type=int, default=2000)
+    args = parser.parse_args()
+
+    reviews = make_corpus(args.rows)
+    base = _timed("legacy Series.apply", args.rows, lambda: legacy_path(reviews))
+    _timed("engine, 1 worker", args.rows, lambda: label_scores(score_reviews(reviews, workers=1)))
+    par = _timed(f"engine, {args.workers} workers", args.rows,
+                 lambda: label_scores(score_reviews(reviews, workers=args.workers, chunksize=args.chunksize)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScoreCache(Path(tmp) / "cache.parquet")
+        score_reviews(reviews, workers=args.workers, chunksize=args.chunksize, cache=cache)
+        warm = _timed("engine, warm cache", args.rows,
+                      lambda: label_scores(score_reviews(reviews, cache=ScoreCache(cache.path))))
+
+    print(f"speedup: {base / par:.1f}x parallel, {base / warm:.1f}x re-run with cache")
+
+
+if __name__ == "__main__":
+    main()
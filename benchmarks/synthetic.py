@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+# Share of reviews per bank, roughly following the Play Store review volumes of the apps
+BANK_WEIGHTS = {
+    "Commercial Bank of Ethiopia": 0.45,
+    "Bank of Abyssinia": 0.25,
+    "Dashen Bank": 0.20,
+    "Awash Bank": 0.07,
+    "Zemen Bank": 0.03,
+}
+# App store ratings are J-shaped: mostly 5s, then 1s
+RATING_WEIGHTS = {1: 0.18, 2: 0.05, 3: 0.07, 4: 0.12, 5: 0.58}
+
+ENGLISH = (
+    "app bank banking mobile transfer money account balance login otp password update version "
+    "slow fast easy good great best worst bad nice amazing crash error bug fail freeze loading "
+    "support service customer call agent response ui design interface navigation screen feature "
+    "statement receipt notification fingerprint face id pin the is to and very not it this my "
+    "please fix again after works working always never time day takes minutes transaction failed "
+    "delay processing secure reliable helpful thanks excellent simple convenient branch airtime"
+).split()
+AMHARIC = "ጥሩ አፕ በጣም ባንክ አመሰግናለሁ መተግበሪያ ችግር ገንዘብ ማስተላለፍ ፈጣን አይሰራም ደስ ይላል".split()
+OROMO = "baay'ee gaarii appii baankii rakkoo hin hojjetu galatoomaa".split()
+EMOJIS = ["👍", "😍", "❤️", "😡", "🙏", "🔥", "👎🏽", "🇪🇹", "😊", "💯", "😢", "👌"]
+
+
+def make_reviews(rows: int, seed: int = 0, duplicate_share: float = 0.02) -> pd.DataFrame:
+    """Synthetic raw reviews (``review, rating, date, bank, source``) in the scraper's layout.
+
+    Most reviews are English, with Amharic, Afaan Oromo and code-mixed ones; about one in
+    eight carries emojis. A ``duplicate_share`` of rows repeats earlier rows and a few are
+    empty, so cleaning has real work to do.
+    """
+    rng = np.random.default_rng(seed)
+    banks = rng.choice(list(BANK_WEIGHTS), size=rows, p=list(BANK_WEIGHTS.values()))
+    ratings = rng.choice(list(RATING_WEIGHTS), size=rows, p=list(RATING_WEIGHTS.values()))
+    days = rng.integers(0, 730, size=rows)
+    dates = (np.datetime64("2023-01-01") + days.astype("timedelta64[D]")).astype(str)
+
+    lengths = np.minimum(rng.geometric(1 / 14, size=rows), 80)
+    language = rng.choice(3, size=rows, p=[0.75, 0.15, 0.10])
+    mixed = rng.random(rows) < 0.10
+    with_emoji = rng.random(rows) < 0.12
+    pools = [np.array(ENGLISH, dtype=object), np.array(AMHARIC, dtype=object), np.array(OROMO, dtype=object)]
+    english = pools[0]
+    emojis = np.array(EMOJIS, dtype=object)
+
+    reviews = []
+    for i in range(rows):
+        pool = pools[language[i]]
+        words = list(pool[rng.integers(0, len(pool), size=lengths[i])])
+        if mixed[i]:
+            words += list(english[rng.integers(0, len(english), size=3)])
+        if with_emoji[i]:
+            words += list(emojis[rng.integers(0, len(emojis), size=rng.integers(1, 4))])
+        reviews.append(" ".join(words))
+
+    df = pd.DataFrame({
+        "review": reviews,
+        "rating": ratings,
+        "date": dates,
+        "bank": banks,
+        "source": "Google Play",
+    })
+    n_dup = int(rows * duplicate_share)
+    if n_dup:
+        take = np.arange(rows)
+        take[rng.choice(rows, size=n_dup, replace=False)] = rng.integers(0, rows, size=n_dup)
+        df = df.iloc[take].reset_index(drop=True)
+    empty = rng.random(rows) < 0.005
+    df.loc[empty, "review"] = ""
+    return df
@@ -0,0 +1,119 @@
+import shutil
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROCESSED_DIR = Path("data/processed")
+PARTITION_COL = "bank"
+COMPRESSION = "zstd"
+FORMATS = ("parquet", "csv")
+
+# Column order of the review datasets; partitioned reads return the partition column last
+BASE_COLUMNS = ["review_id", "review", "rating", "date", "bank", "source"]
+
+
+def parquet_path(name: str) -> Path:
+    return PROCESSED_DIR / name
+
+
+def csv_path(name: str) -> Path:
+    return PROCESSED_DIR / f"{name}.csv"
+
+
+def dataset_exists(name: str) -> bool:
+    return parquet_path(name).is_dir() or csv_path(name).exists()
+
+
+def formats_from_arg(value: str) -> Sequence[str]:
+    return FORMATS if value == "both" else (value,)
+
+
+def _write_partitions(df: pd.DataFrame, root: Path) -> None:
+    # Hive layout (bank=<name>/part-<uuid>.parquet) so appends never overwrite earlier parts
+    root.mkdir(parents=True, exist_ok=True)
+    if PARTITION_COL not in df.columns:
+        groups = [(root, df)]
+    else:
+        groups = [
+            (root / f"{PARTITION_COL}={quote(str(key), safe='')}", sub.drop(columns=PARTITION_COL))
+            for key, sub in df.groupby(PARTITION_COL, sort=False, dropna=False, observed=True)
+        ]
+    for part_dir, sub in groups:
+        part_dir.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(sub, preserve_index=False)
+        pq.write_table(table, part_dir / f"part-{uuid.uuid4().hex}.parquet", compression=COMPRESSION)
+
+
+def write_dataset(
+    df: pd.DataFrame,
+    name: str,
+    formats: Iterable[str] = ("parquet",),
+    append: bool = False,
+) -> List[Path]:
+    """Write ``df`` as a bank-partitioned, zstd-compressed Parquet dataset and/or a CSV.
+
+    With ``append=True`` the rows are added to what is already there, which lets
+    chunked producers write their output as they go. A fresh write removes the copy
+    in any format it does not produce, so readers never fall back on stale data.
+    """
+    written = []
+    formats = set(formats)
+    if not append:
+        if "parquet" not in formats and parquet_path(name).exists():
+            shutil.rmtree(parquet_path(name))
+        if "csv" not in formats:
+            csv_path(name).unlink(missing_ok=True)
+    if "parquet" in formats:
+        root = parquet_path(name)
+        if not append and root.exists():
+            shutil.rmtree(root)
+        _write_partitions(df, root)
+        written.append(root)
+    if "csv" in formats:
+        path = csv_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = not (append and path.exists())
+        df.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        written.append(path)
+    return written
+
+
+def _restore_order(df: pd.DataFrame) -> pd.DataFrame:
+    head = [c for c in BASE_COLUMNS if c in df.columns]
+    return df[head + [c for c in df.columns if c not in head]]
+
+
+def read_dataset(
+    name: str,
+    columns: Optional[List[str]] = None,
+    banks: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Read a processed dataset, preferring the Parquet copy and falling back to CSV.
+
+    Only ``columns`` are read when given, and ``banks`` prunes whole partitions.
+    """
+    root = parquet_path(name)
+    banks = list(banks) if banks is not None else None
+    if root.is_dir():
+        filters = [(PARTITION_COL, "in", banks)] if banks is not None else None
+        df = pd.read_parquet(root, columns=columns, filters=filters)
+        if PARTITION_COL in df.columns:
+            # Partition keys come back as categories; keep the plain string column of the CSV path
+            df[PARTITION_COL] = df[PARTITION_COL].astype(object)
+        return df[columns] if columns is not None else _restore_order(df)
+
+    path = csv_path(name)
+    if not path.exists():
+        raise FileNotFoundError(f"Dataset '{name}' not found at {root} or {path}")
+    usecols = columns
+    if columns is not None and banks is not None and PARTITION_COL not in columns:
+        usecols = columns + [PARTITION_COL]
+    df = pd.read_csv(path, usecols=usecols)
+    if banks is not None:
+        df = df[df[PARTITION_COL].isin(banks)].reset_index(drop=True)
+    return df[columns] if columns is not None else df
@@ -1,18 +1,45 @@
+import argparse
+import io
 import os
-from pathlib import Path
+import time
 from typing import Optional
 
 import pandas as pd
-from sqlalchemy import (Column, Date, Float, ForeignKey, Integer, MetaData,
-                        String, Table, create_engine, text)
+from sqlalchemy import (BigInteger, Column, Date, Float, ForeignKey, Index,
+                        Integer, MetaData, String, Table, and_, case,
+                        create_engine, exists, func, inspect, literal, or_,
+                        select, text, true)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
 
-CLEAN_PATH = Path("data/processed/reviews_clean.csv")
-SENTIMENT_PATH = Path("data/processed/reviews_sentiment_partial.csv")
+from scripts.dataset_io import dataset_exists
+from scripts.instrument import instrumented, span
+from scripts.report_queries import (UNDATED_DAY, avg_rating_per_bank,
+                                    reviews_per_bank, sentiment_per_bank)
+from scripts.schema import read_reviews
+
+CLEAN_NAME = "reviews_clean"
+SENTIMENT_NAME = "reviews_sentiment_partial"
+THEMES_NAME = "reviews_themes"
+
+REVIEW_COLUMNS = ["review_id", "bank_id", "review_text", "rating", "review_date",
+                  "sentiment_label", "sentiment_score", "source", "themes"]
+# Derived columns a re-run may change; everything else is fixed by the content-derived review_id
+UPDATABLE_COLUMNS = ["sentiment_label", "sentiment_score", "themes"]
+RATINGS = range(1, 6)
+SENTIMENT_LABELS = ["positive", "neutral", "negative"]
+MAX_REVIEW_CHARS = 10000
+COPY_CHUNK_ROWS = 50000
+# Bound parameters per multi-row INSERT; SQLite allows 32766 and psycopg2/Postgres 65535
+INSERT_MAX_PARAMS = 30000
 
 
 def get_engine_from_env() -> Engine:
+    # DATABASE_URL (e.g. sqlite:///reviews.db) overrides the PG* variables
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return create_engine(url, echo=False, future=True)
     host = os.getenv("PGHOST", "localhost")
     port = os.getenv("PGPORT", "5432")
     user = os.getenv("PGUSER", "postgres")
@@ -34,7 +61,8 @@ def define_schema(metadata: MetaData) -> tuple[Table, Table]:
     reviews = Table(
         "reviews",
         metadata,
-        Column("review_id", Integer, primary_key=True, autoincrement=True),
+        # Content-derived id assigned by preprocess_reviews.clean()
+        Column("review_id", BigInteger, primary_key=True, autoincrement=False),
         Column("bank_id", Integer, ForeignKey("banks.bank_id"), nullable=False),
         Column("review_text", String, nullable=False),
         Column("rating", Integer, nullable=True),
@@ -42,76 +70,356 @@ def define_schema(metadata: MetaData) -> tuple[Table, Table]:
         Column("sentiment_label", String(32), nullable=True),
         Column("sentiment_score", Float, nullable=True),
         Column("source", String(64), nullable=True),
+        Column("themes", String, nullable=True),
+        Index("ix_reviews_bank_date", "bank_id", "review_date"),
+        Index("ix_reviews_sentiment_label", "sentiment_label"),
     )
     return banks, reviews
 
 
+def define_rollups(metadata: MetaData) -> tuple[Table, Table]:
+    """Per bank and review day aggregates, refreshed by ``upsert_reviews`` for the days a load touches.
+
+    Undated reviews are counted under ``UNDATED_DAY``.
+    """
+    daily_bank_stats = Table(
+        "daily_bank_stats",
+        metadata,
+        Column("bank_id", Integer, ForeignKey("banks.bank_id"), primary_key=True),
+        Column("day", Date, primary_key=True),
+        Column("n_reviews", Integer, nullable=False),
+        *[Column(f"rating_{r}", Integer, nullable=False) for r in RATINGS],
+        # Mean sentiment is sentiment_sum / sentiment_n, so days roll up into any period exactly
+        Column("sentiment_sum", Float, nullable=False),
+        Column("sentiment_n", Integer, nullable=False),
+        *[Column(f"n_{label}", Integer, nullable=False) for label in SENTIMENT_LABELS],
+    )
+
+    daily_theme_counts = Table(
+        "daily_theme_counts",
+        metadata,
+        Column("bank_id", Integer, ForeignKey("banks.bank_id"), primary_key=True),
+        Column("day", Date, primary_key=True),
+        Column("theme", String(64), primary_key=True),
+        Column("n_reviews", Integer, nullable=False),
+    )
+    return daily_bank_stats, daily_theme_counts
+
+
+def ensure_schema(conn, metadata: MetaData) -> None:
+    # create_all skips existing tables, so columns and indexes added later are created here
+    metadata.create_all(conn)
+    for table in metadata.sorted_tables:
+        add_missing_columns(conn, table)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# INSERT constructs that support ON CONFLICT; other databases merge with plain INSERT/UPDATE
+ON_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _dialect_insert(conn):
+    return ON_CONFLICT_INSERTS.get(conn.dialect.name)
+
+
+def add_missing_columns(conn, table: Table) -> None:
+    """Add columns introduced after ``table`` was first created (create_all never alters tables)."""
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for col in table.columns:
+        if col.name not in existing:
+            col_type = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+
+
 def upsert_banks(conn, banks_table: Table, df: pd.DataFrame) -> dict:
-    bank_name_to_id: dict[str, int] = {}
-    existing = conn.execute(text("SELECT bank_id, bank_name FROM banks"))
-    for row in existing:
-        bank_name_to_id[row.bank_name] = row.bank_id
-
-    unique_banks = sorted(set(df["bank"].dropna().tolist()))
-    for name in unique_banks:
-        if name not in bank_name_to_id:
-            res = conn.execute(banks_table.insert().values(bank_name=name, app_name=None).returning(banks_table.c.bank_id))
-            bank_id = res.scalar_one()
-            bank_name_to_id[name] = bank_id
-    return bank_name_to_id
-
-
-def load_reviews(conn, reviews_table: Table, bank_name_to_id: dict, df: pd.DataFrame):
-    records = []
-    for _, r in df.iterrows():
-        records.append({
-            "bank_id": bank_name_to_id.get(r.get("bank")),
-            "review_text": str(r.get("review", ""))[:10000],
-            "rating": int(r["rating"]) if pd.notna(r.get("rating")) else None,
-            "review_date": pd.to_datetime(r.get("date"), errors="coerce").date() if pd.notna(r.get("date")) else None,
-            "sentiment_label": r.get("sentiment_label"),
-            "sentiment_score": float(r.get("sentiment_score")) if pd.notna(r.get("sentiment_score")) else None,
-            "source": r.get("source"),
-        })
-    if records:
-        conn.execute(reviews_table.insert(), records)
+    names = sorted(set(df["bank"].dropna().tolist()))
+    insert = _dialect_insert(conn)
+    if names and insert is not None:
+        stmt = insert(banks_table).values([{"bank_name": n, "app_name": None} for n in names])
+        conn.execute(stmt.on_conflict_do_nothing(index_elements=[banks_table.c.bank_name]))
+    elif names:
+        existing = set(conn.execute(select(banks_table.c.bank_name)).scalars())
+        missing = [{"bank_name": n, "app_name": None} for n in names if n not in existing]
+        if missing:
+            conn.execute(banks_table.insert(), missing)
+    rows = conn.execute(select(banks_table.c.bank_id, banks_table.c.bank_name))
+    return {row.bank_name: row.bank_id for row in rows}
+
+
+def prepare_reviews(df: pd.DataFrame, bank_name_to_id: dict) -> pd.DataFrame:
+    """Column-wise conversion of merged review rows into ``reviews`` table columns."""
+    return pd.DataFrame({
+        "review_id": df["review_id"].astype("int64"),
+        "bank_id": df["bank"].map(bank_name_to_id).astype("Int64"),
+        "review_text": df["review"].fillna("").astype(str).str.slice(0, MAX_REVIEW_CHARS),
+        "rating": pd.to_numeric(df["rating"], errors="coerce").round().astype("Int64"),
+        "review_date": pd.to_datetime(df["date"], errors="coerce").dt.date,
+        "sentiment_label": df["sentiment_label"].astype(object),
+        "sentiment_score": pd.to_numeric(df["sentiment_score"], errors="coerce"),
+        "source": df["source"].astype(object),
+        "themes": df["themes"].astype(object) if "themes" in df.columns else None,
+    }, columns=REVIEW_COLUMNS)
+
+
+def _copy_chunks(conn, table: Table, frame: pd.DataFrame, chunk_rows: int) -> None:
+    # CSV COPY: unquoted empty fields are NULL, except in review_text where "" must stay ""
+    sql = (f"COPY {table.name} ({', '.join(frame.columns)}) FROM STDIN "
+           f"WITH (FORMAT csv, FORCE_NOT_NULL (review_text))")
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        for start in range(0, len(frame), chunk_rows):
+            buf = io.StringIO(frame.iloc[start:start + chunk_rows].to_csv(index=False, header=False))
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+
+
+def _insert_chunks(conn, table: Table, frame: pd.DataFrame, chunk_rows: int) -> None:
+    chunk_rows = max(1, min(chunk_rows, INSERT_MAX_PARAMS // len(frame.columns)))
+    frame = frame.astype(object).where(frame.notna(), None)
+    for start in range(0, len(frame), chunk_rows):
+        records = frame.iloc[start:start + chunk_rows].to_dict("records")
+        conn.execute(table.insert().values(records))
+
+
+def load_reviews(conn, reviews_table: Table, bank_name_to_id: dict, df: pd.DataFrame,
+                 chunk_rows: int = COPY_CHUNK_ROWS, method: Optional[str] = None) -> int:
+    """Bulk load ``df`` into ``reviews`` and return the number of rows written.
+
+    PostgreSQL (psycopg2) streams ``COPY FROM STDIN`` in ``chunk_rows`` chunks; other
+    databases get chunked multi-row INSERTs. ``method`` ("copy"/"insert") forces a path.
+    """
+    frame = prepare_reviews(df, bank_name_to_id).drop_duplicates(subset=["review_id"])
+    if frame.empty:
+        return 0
+    if method is None:
+        method = "copy" if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2" else "insert"
+    with span("COPY" if method == "copy" else "INSERT", rows_in=len(frame)):
+        if method == "copy":
+            _copy_chunks(conn, reviews_table, frame, chunk_rows)
+        else:
+            _insert_chunks(conn, reviews_table, frame, chunk_rows)
+    return len(frame)
 
 
+def _rollup_day(column):
+    return func.coalesce(column, literal(UNDATED_DAY, Date))
+
+
+def _touched_table(conn, reviews_table: Table) -> Table:
+    touched = Table(f"{reviews_table.name}_touched", MetaData(),
+                    Column("bank_id", Integer), Column("day", Date), prefixes=["TEMPORARY"])
+    touched.create(conn)
+    return touched
+
+
+def _stage_touched_days(conn, reviews_table: Table, staging: Table) -> Table:
+    """Temporary table of the (bank_id, day) keys whose reviews the staged rows add or change."""
+    touched = _touched_table(conn, reviews_table)
+    current = reviews_table.alias("current")
+    changed = or_(
+        current.c.review_id.is_(None),
+        *[current.c[c].is_distinct_from(staging.c[c]) for c in UPDATABLE_COLUMNS],
+    )
+    keys = (
+        select(staging.c.bank_id, _rollup_day(staging.c.review_date)).distinct()
+        .select_from(staging.outerjoin(current, current.c.review_id == staging.c.review_id))
+        .where(changed)
+    )
+    conn.execute(touched.insert().from_select(["bank_id", "day"], keys))
+    return touched
+
+
+def refresh_rollups(conn, reviews_table: Table, rollups: tuple[Table, Table], touched: Table) -> None:
+    """Recompute the rollup rows of every (bank_id, day) in ``touched`` from ``reviews``."""
+    stats_t, themes_t = rollups
+    for table in rollups:
+        conn.execute(table.delete().where(
+            exists().where(touched.c.bank_id == table.c.bank_id, touched.c.day == table.c.day)))
+
+    r = reviews_table
+    day = _rollup_day(r.c.review_date)
+    # Matching on review_date itself where there is one keeps the (bank_id, review_date) index usable
+    day_rows = r.join(touched, and_(
+        touched.c.bank_id == r.c.bank_id,
+        or_(touched.c.day == r.c.review_date, and_(r.c.review_date.is_(None), touched.c.day == UNDATED_DAY)),
+    ))
+    stats = (
+        select(
+            r.c.bank_id,
+            day,
+            func.count(),
+            *[func.sum(case((r.c.rating == rating, 1), else_=0)) for rating in RATINGS],
+            func.coalesce(func.sum(r.c.sentiment_score), 0.0),
+            func.count(r.c.sentiment_score),
+            *[func.sum(case((r.c.sentiment_label == label, 1), else_=0)) for label in SENTIMENT_LABELS],
+        )
+        .select_from(day_rows)
+        .group_by(r.c.bank_id, day)
+    )
+    conn.execute(stats_t.insert().from_select([c.name for c in stats_t.columns], stats))
+
+    # Themes are stored as "A, B" per review; split them here rather than in dialect-specific SQL
+    tagged = pd.DataFrame(conn.execute(
+        select(r.c.bank_id, day.label("day"), r.c.themes)
+        .select_from(day_rows).where(r.c.themes.isnot(None))
+    ).all(), columns=["bank_id", "day", "themes"])
+    if not tagged.empty:
+        tagged["theme"] = tagged["themes"].str.split(", ")
+        counts = tagged.explode("theme").groupby(["bank_id", "day", "theme"]).size()
+        conn.execute(themes_t.insert(), counts.rename("n_reviews").reset_index().to_dict("records"))
+
+
+def rebuild_rollups(conn, reviews_table: Table, rollups: tuple[Table, Table]) -> None:
+    """Recompute every rollup row from ``reviews``, e.g. for a database loaded before the rollups existed."""
+    touched = _touched_table(conn, reviews_table)
+    try:
+        for table in rollups:
+            conn.execute(table.delete())
+        conn.execute(touched.insert().from_select(
+            ["bank_id", "day"],
+            select(reviews_table.c.bank_id, _rollup_day(reviews_table.c.review_date)).distinct(),
+        ))
+        refresh_rollups(conn, reviews_table, rollups, touched)
+    finally:
+        touched.drop(conn)
+
+
+def _rollups_missing(conn, reviews_table: Table, rollups: tuple[Table, Table]) -> bool:
+    # Fresh (or never filled) rollup tables next to existing reviews
+    has_rows = [conn.execute(select(exists().select_from(t))).scalar() for t in (rollups[0], reviews_table)]
+    return not has_rows[0] and bool(has_rows[1])
+
+
+def _merge_without_on_conflict(conn, reviews_table: Table, staging: Table) -> int:
+    """Standard-SQL merge of ``staging``: UPDATE the changed rows, then INSERT the new ones."""
+    r = reviews_table
+    match = staging.c.review_id == r.c.review_id
+    changed = or_(*[r.c[c].is_distinct_from(staging.c[c]) for c in UPDATABLE_COLUMNS])
+    updated = conn.execute(
+        r.update()
+        .values({c: select(staging.c[c]).where(match).scalar_subquery() for c in UPDATABLE_COLUMNS})
+        .where(exists().where(match, changed))
+    ).rowcount
+    inserted = conn.execute(r.insert().from_select(
+        REVIEW_COLUMNS,
+        select(*[staging.c[c] for c in REVIEW_COLUMNS]).where(~exists().where(match)),
+    )).rowcount
+    return updated + inserted
+
+
+def upsert_reviews(conn, reviews_table: Table, bank_name_to_id: dict, df: pd.DataFrame,
+                   chunk_rows: int = COPY_CHUNK_ROWS,
+                   rollups: Optional[tuple[Table, Table]] = None) -> tuple[int, int]:
+    """Idempotently merge ``df`` into ``reviews`` through a temporary staging table.
+
+    New review_ids are inserted; existing rows are only rewritten when a sentiment or
+    theme column actually changed. PostgreSQL and SQLite do this in one INSERT ... ON
+    CONFLICT; other databases get a portable UPDATE plus INSERT. With ``rollups`` (from ``define_rollups``), the
+    rollup rows of the bank-days those inserts and updates fall on are recomputed; empty rollup
+    tables next to existing reviews are rebuilt in full instead.
+    Returns (rows staged, rows inserted or updated).
+    """
+    # Same columns without keys or constraints; load_reviews already dedupes on review_id
+    staging = Table(f"{reviews_table.name}_staging", MetaData(),
+                    *[Column(c, reviews_table.c[c].type) for c in REVIEW_COLUMNS],
+                    prefixes=["TEMPORARY"])
+    staging.create(conn)
+    touched = None
+    rebuild = rollups is not None and _rollups_missing(conn, reviews_table, rollups)
+    try:
+        staged = load_reviews(conn, staging, bank_name_to_id, df, chunk_rows=chunk_rows)
+        if rollups is not None and not rebuild:
+            touched = _stage_touched_days(conn, reviews_table, staging)
+        insert = _dialect_insert(conn)
+        with span("upsert", rows_in=staged) as s:
+            if insert is None:
+                written = _merge_without_on_conflict(conn, reviews_table, staging)
+            else:
+                stmt = insert(reviews_table).from_select(
+                    REVIEW_COLUMNS,
+                    # WHERE keeps SQLite from parsing ON CONFLICT as part of the SELECT's join
+                    select(*[staging.c[c] for c in REVIEW_COLUMNS]).where(true()),
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[reviews_table.c.review_id],
+                    set_={c: stmt.excluded[c] for c in UPDATABLE_COLUMNS},
+                    where=or_(*[reviews_table.c[c].is_distinct_from(stmt.excluded[c]) for c in UPDATABLE_COLUMNS]),
+                )
+                written = conn.execute(stmt).rowcount
+            s.rows_out = written
+        if touched is not None:
+            with span("refresh_rollups"):
+                refresh_rollups(conn, reviews_table, rollups, touched)
+        elif rebuild:
+            with span("rebuild_rollups"):
+                rebuild_rollups(conn, reviews_table, rollups)
+    finally:
+        staging.drop(conn)
+        if touched is not None:
+            touched.drop(conn)
+    return staged, written
+
+
+@instrumented("db_load")
 def main():
-    if not CLEAN_PATH.exists():
-        raise FileNotFoundError(f"Expected cleaned dataset at {CLEAN_PATH}")
-
-    df_clean = pd.read_csv(CLEAN_PATH)
-    if SENTIMENT_PATH.exists():
-        df_sent = pd.read_csv(SENTIMENT_PATH)
-        # Merge to include sentiment columns if available
-        merge_cols = [c for c in df_clean.columns if c != "review"] + ["review"]
-        df = df_clean.merge(df_sent[["review", "sentiment_label", "sentiment_score"]], on="review", how="left")
-    else:
-        df = df_clean.copy()
-        df["sentiment_label"] = None
-        df["sentiment_score"] = None
+    parser = argparse.ArgumentParser(description="Create the review schema and load the processed reviews.")
+    parser.add_argument("--rebuild_rollups", action="store_true",
+                        help="Recompute the daily rollup tables from all reviews instead of only the days a load touches")
+    args = parser.parse_args()
+
+    if not dataset_exists(CLEAN_NAME):
+        raise FileNotFoundError(f"Expected cleaned dataset '{CLEAN_NAME}'")
+
+    with span("read_dataset") as s:
+        df_clean = read_reviews(CLEAN_NAME)
+        s.rows_out = len(df_clean)
+    with span("merge", rows_in=len(df_clean)) as s:
+        if dataset_exists(SENTIMENT_NAME):
+            df_sent = read_reviews(SENTIMENT_NAME, columns=["review_id", "sentiment_label", "sentiment_score"])
+            # Merge to include sentiment columns if available
+            df = df_clean.merge(df_sent, on="review_id", how="left")
+        else:
+            df = df_clean.copy()
+            df["sentiment_label"] = None
+            df["sentiment_score"] = None
+        if dataset_exists(THEMES_NAME):
+            df_themes = read_reviews(THEMES_NAME, columns=["review_id", "themes"])
+            df = df.merge(df_themes.drop_duplicates("review_id"), on="review_id", how="left")
+        s.rows_out = len(df)
 
     engine = get_engine_from_env()
     metadata = MetaData()
     banks_t, reviews_t = define_schema(metadata)
+    rollups = define_rollups(metadata)
 
     try:
         with engine.begin() as conn:
-            metadata.create_all(conn)
+            ensure_schema(conn, metadata)
             bank_map = upsert_banks(conn, banks_t, df)
-            load_reviews(conn, reviews_t, bank_map, df)
+            t0 = time.perf_counter()
+            n_rows, n_written = upsert_reviews(conn, reviews_t, bank_map, df,
+                                               rollups=None if args.rebuild_rollups else rollups)
+            secs = time.perf_counter() - t0
+            print(f"Staged {n_rows} reviews in {secs:.2f}s ({n_rows / max(secs, 1e-9):.0f} rows/s); "
+                  f"{n_written} inserted or updated, {n_rows - n_written} unchanged")
+            if args.rebuild_rollups:
+                with span("rebuild_rollups"):
+                    rebuild_rollups(conn, reviews_t, rollups)
 
-            # Example checks
+            # Standard reports, answered from the rollup tables
             print("Counts per bank:")
-            res = conn.execute(text("SELECT b.bank_name, COUNT(*) AS cnt FROM reviews r JOIN banks b ON r.bank_id=b.bank_id GROUP BY b.bank_name ORDER BY cnt DESC"))
-            for row in res:
-                print(f"  {row.bank_name}: {row.cnt}")
+            for row in reviews_per_bank(conn).itertuples():
+                print(f"  {row.bank_name}: {row.n_reviews}")
 
             print("Average rating per bank:")
-            res2 = conn.execute(text("SELECT b.bank_name, AVG(r.rating)::numeric(10,2) AS avg_rating FROM reviews r JOIN banks b ON r.bank_id=b.bank_id GROUP BY b.bank_name ORDER BY avg_rating DESC"))
-            for row in res2:
-                print(f"  {row.bank_name}: {row.avg_rating}")
+            for row in avg_rating_per_bank(conn).itertuples():
+                print(f"  {row.bank_name}: {row.avg_rating:.2f}")
+
+            print("Mean sentiment per bank:")
+            for row in sentiment_per_bank(conn).itertuples():
+                print(f"  {row.bank_name}: {row.sentiment_mean:.3f}")
 
         print("Database load completed.")
     except SQLAlchemyError as e:
@@ -1,7 +1,7 @@
+import argparse
 import re
-from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Iterable, List
 
 import emoji
 import pandas as pd
@@ -11,14 +11,18 @@ import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
-CLEAN_PATH = Path("data/processed/reviews_clean.csv")
-SENTIMENT_PATH = Path("data/processed/reviews_sentiment_partial.csv")
+from scripts.dataset_io import dataset_exists
+from scripts.figures import FIG_DIR, FigureJob, bank_slug, render_figures
+from scripts.instrument import instrumented, span
+from scripts.schema import read_reviews
+
+CLEAN_NAME = "reviews_clean"
+SENTIMENT_NAME = "reviews_sentiment_partial"
 EMOJI_COUNTS_OUT = Path("data/processed/emoji_counts.csv")
 EMOJI_SENTIMENT_OUT = Path("data/processed/emoji_sentiment.csv")
-FIG_DIR = Path("outputs/figures")
 
-# Regex-based fallback for emoji extraction (in case library misses edge cases)
-EMOJI_PATTERN = emoji.get_emoji_regexp()
+# Longest sequences first so multi-codepoint emojis (flags, ZWJ families) win over their parts
+EMOJI_PATTERN = re.compile("|".join(map(re.escape, sorted(emoji.EMOJI_DATA, key=len, reverse=True))))
 
 
 def extract_emojis(text: str) -> Iterable[str]:
@@ -27,77 +31,98 @@ def extract_emojis(text: str) -> Iterable[str]:
     return [m.group(0) for m in EMOJI_PATTERN.finditer(text)]
 
 
-def plot_top_emojis(df_counts: pd.DataFrame, topn: int = 10):
-    FIG_DIR.mkdir(parents=True, exist_ok=True)
-    for bank, sub in df_counts.groupby("bank"):
-        top = sub.sort_values("count", ascending=False).head(topn)
-        if top.empty:
-            continue
-        plt.figure(figsize=(8, 5))
-        # Show emoji labels on y-axis
-        plt.barh(top["emoji"], top["count"], color="#4C72B0")
-        plt.gca().invert_yaxis()
-        plt.title(f"Top {topn} Emojis: {bank}")
-        plt.xlabel("Count")
-        plt.tight_layout()
-        out_path = FIG_DIR / f"top_emojis_{bank.replace(' ', '_').lower()}.png"
-        plt.savefig(out_path, dpi=200)
-        plt.close()
-
-
+def plot_top_emojis(top: pd.DataFrame, out_path: Path, dpi: int):
+    bank = top["bank"].iat[0]
+    plt.figure(figsize=(8, 5))
+    # Show emoji labels on y-axis
+    plt.barh(top["emoji"], top["count"], color="#4C72B0")
+    plt.gca().invert_yaxis()
+    plt.title(f"Top {top['topn'].iat[0]} Emojis: {bank}")
+    plt.xlabel("Count")
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+
+
+def emoji_figure_jobs(df_counts: pd.DataFrame, topn: int = 10) -> List[FigureJob]:
+    jobs = []
+    for bank, sub in df_counts.groupby("bank", observed=True):
+        top = sub.sort_values("count", ascending=False).head(topn).reset_index(drop=True)
+        if not top.empty:
+            # topn travels with the data because the title shows it
+            jobs.append(FigureJob(f"top_emojis_{bank_slug(bank)}.png", plot_top_emojis, top.assign(topn=topn)))
+    return jobs
+
+
+def emoji_table(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per emoji occurrence: the review's ``review_id`` and ``bank`` plus the ``emoji``."""
+    df = df.reset_index(drop=True)
+    texts = df["review"].fillna("").astype(str)
+    # Every emoji has a non-ASCII code point, and str.isascii is O(1), so most reviews are skipped here
+    has_emoji = ~texts.map(str.isascii).astype(bool)
+    found = texts[has_emoji].str.findall(EMOJI_PATTERN).explode().dropna()
+    out = df.loc[found.index, ["review_id", "bank"]]
+    out["emoji"] = found.to_numpy()
+    return out.reset_index(drop=True)
+
+
+def aggregate_emojis(emojis: pd.DataFrame) -> pd.DataFrame:
+    """Per (bank, emoji) occurrence ``count`` and, when scores are present, ``n`` and ``sentiment_mean``."""
+    grouped = emojis.groupby(["bank", "emoji"], sort=False, observed=True)
+    if "sentiment_score" not in emojis.columns:
+        return grouped.size().rename("count").reset_index()
+    return grouped.agg(
+        count=("emoji", "size"),
+        n=("sentiment_score", "count"),
+        sentiment_mean=("sentiment_score", "mean"),
+    ).reset_index()
+
+
+@instrumented("emoji")
 def main():
-    if not CLEAN_PATH.exists():
-        raise FileNotFoundError(f"Cleaned dataset not found at {CLEAN_PATH}")
-    clean_df = pd.read_csv(CLEAN_PATH)
-
-    # Prepare per-bank emoji counts
-    rows = []
-    for bank, sub in clean_df.groupby("bank"):
-        counter = Counter()
-        for txt in sub["review"].fillna("").astype(str):
-            counter.update(extract_emojis(txt))
-        for e, c in counter.items():
-            rows.append({"bank": bank, "emoji": e, "count": int(c)})
-
-    counts_df = pd.DataFrame(rows)
-    counts_df.sort_values(["bank", "count"], ascending=[True, False], inplace=True)
+    parser = argparse.ArgumentParser(description="Count emojis per bank and relate them to review sentiment.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes rendering figures (default: all cores)")
+    parser.add_argument("--preview", action="store_true",
+                        help="Quick low-resolution figures into outputs/figures/preview")
+    args = parser.parse_args()
+
+    if not dataset_exists(CLEAN_NAME):
+        raise FileNotFoundError(f"Cleaned dataset '{CLEAN_NAME}' not found")
+    with span("read_dataset") as s:
+        clean_df = read_reviews(CLEAN_NAME, columns=["review_id", "review", "bank"])
+        s.rows_out = len(clean_df)
+    with span("extract_emojis", rows_in=len(clean_df)) as s:
+        emojis = emoji_table(clean_df)
+        s.rows_out = len(emojis)
+
+    has_sentiment = dataset_exists(SENTIMENT_NAME)
+    if has_sentiment:
+        with span("merge", rows_in=len(emojis)) as s:
+            sent_df = read_reviews(SENTIMENT_NAME, columns=["review_id", "sentiment_score"])
+            emojis = emojis.merge(sent_df.drop_duplicates("review_id"), on="review_id", how="left")
+            s.rows_out = len(emojis)
+    with span("aggregate", rows_in=len(emojis)) as s:
+        agg = aggregate_emojis(emojis)
+        s.rows_out = len(agg)
+
+    # Per-bank emoji counts (ties keep first-seen order)
+    counts_df = agg[["bank", "emoji", "count"]].sort_values(["bank", "count"], ascending=[True, False])
     EMOJI_COUNTS_OUT.parent.mkdir(parents=True, exist_ok=True)
     counts_df.to_csv(EMOJI_COUNTS_OUT, index=False)
 
     # Optional: sentiment aggregated by emoji
-    if SENTIMENT_PATH.exists():
-        sent_df = pd.read_csv(SENTIMENT_PATH)
-        merged = clean_df.merge(sent_df[["review", "sentiment_score"]], on="review", how="left")
-        agg_map: Dict[Tuple[str, str], list] = defaultdict(list)
-        for _, row in merged.iterrows():
-            emjs = extract_emojis(str(row.get("review", "")))
-            if not emjs:
-                continue
-            bank = row.get("bank", "Unknown")
-            sc = row.get("sentiment_score")
-            for e in emjs:
-                if pd.notna(sc):
-                    agg_map[(bank, e)].append(float(sc))
-        sent_rows = []
-        for (bank, e), vals in agg_map.items():
-            if not vals:
-                continue
-            sent_rows.append({
-                "bank": bank,
-                "emoji": e,
-                "n": len(vals),
-                "sentiment_mean": sum(vals)/len(vals),
-            })
-        sent_df_out = pd.DataFrame(sent_rows)
-        sent_df_out.sort_values(["bank", "n"], ascending=[True, False], inplace=True)
+    if has_sentiment:
+        sent_df_out = agg.loc[agg["n"] > 0, ["bank", "emoji", "n", "sentiment_mean"]]
+        sent_df_out = sent_df_out.sort_values(["bank", "n"], ascending=[True, False])
         sent_df_out.to_csv(EMOJI_SENTIMENT_OUT, index=False)
 
     # Figures
-    if not counts_df.empty:
-        plot_top_emojis(counts_df)
+    with span("render_figures") as s:
+        stats = render_figures(emoji_figure_jobs(counts_df), "emoji", workers=args.workers, preview=args.preview)
+        s.rows_out = stats["rendered"]
 
     print(f"Saved emoji counts to {EMOJI_COUNTS_OUT}")
-    if SENTIMENT_PATH.exists():
+    if has_sentiment:
         print(f"Saved emoji sentiment to {EMOJI_SENTIMENT_OUT}")
     print(f"Figures in {FIG_DIR}")
 
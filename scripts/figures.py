@@ -0,0 +1,113 @@
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+FIG_DIR = Path("outputs/figures")
+FULL_DPI = 200
+PREVIEW_DPI = 60
+
+
+@dataclass
+class FigureJob:
+    """One output image: ``render(data, out_path, dpi)`` draws ``data`` into ``filename``.
+
+    ``render`` must be a module-level function so the job can be sent to a worker
+    process, and ``data`` should already be aggregated to what the figure shows.
+    """
+
+    filename: str
+    render: Callable[[Any, Path, int], None]
+    data: Any
+
+
+def data_digest(data: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(data, pd.DataFrame):
+        h.update(json.dumps([list(map(str, data.columns)), list(map(str, data.dtypes))]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    elif isinstance(data, str):
+        h.update(data.encode("utf-8"))
+    else:
+        h.update(json.dumps(data, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def job_digest(job: FigureJob, dpi: int) -> str:
+    # The renderer's source is part of the key, so changing how a figure is drawn re-renders it
+    code = inspect.getsource(job.render)
+    key = json.dumps([job.render.__module__, code, dpi, data_digest(job.data)])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_manifest(path: Path) -> Dict[str, str]:
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _render(job: FigureJob, out_path: Path, dpi: int) -> None:
+    job.render(job.data, out_path, dpi)
+
+
+def render_figures(
+    jobs: List[FigureJob],
+    manifest: str,
+    workers: Optional[int] = None,
+    preview: bool = False,
+    force: bool = False,
+    fig_dir: Path = FIG_DIR,
+) -> Dict[str, int]:
+    """Render ``jobs`` across a process pool, skipping figures whose data and code are unchanged.
+
+    Digests are kept in ``<fig_dir>/.figures_<manifest>.json``, one file per caller so
+    scripts rendering into the same directory concurrently never race on it. Preview
+    mode renders at ``PREVIEW_DPI`` into ``<fig_dir>/preview`` so it never replaces
+    full-resolution figures. Returns the number of figures rendered and skipped.
+    """
+    dpi = PREVIEW_DPI if preview else FULL_DPI
+    out_dir = fig_dir / "preview" if preview else fig_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / f".figures_{manifest}.json"
+    recorded = _load_manifest(manifest_path)
+
+    todo = []
+    for job in jobs:
+        digest = job_digest(job, dpi)
+        if not force and recorded.get(job.filename) == digest and (out_dir / job.filename).exists():
+            continue
+        todo.append((job, digest))
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        if workers <= 1 or len(todo) <= 1:
+            for job, digest in todo:
+                _render(job, out_dir / job.filename, dpi)
+                recorded[job.filename] = digest
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = {pool.submit(_render, job, out_dir / job.filename, dpi): (job, digest)
+                           for job, digest in todo}
+                for fut in as_completed(futures):
+                    fut.result()
+                    job, digest = futures[fut]
+                    recorded[job.filename] = digest
+    finally:
+        # Figures are recorded as they are written, so a failed run only re-renders the rest
+        if todo:
+            tmp = manifest_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(recorded, f, indent=1, sort_keys=True)
+            os.replace(tmp, manifest_path)
+    return {"rendered": len(todo), "skipped": len(jobs) - len(todo)}
+
+
+def bank_slug(bank: str) -> str:
+    return bank.replace(" ", "_").lower()
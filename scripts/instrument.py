@@ -0,0 +1,184 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_DIR = Path(os.getenv("REVIEWS_METRICS_DIR", "outputs/metrics"))
+# "1"/"all" profiles every stage; otherwise a comma-separated list of stage names
+PROFILE_ENV = "REVIEWS_PROFILE"
+PROM_PREFIX = "reviews_span"
+
+
+def cpu_seconds() -> float:
+    # User + system time of this process and of its finished child processes (e.g. scoring pools)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water mark of this process's resident memory, if the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class Span:
+    stage: str
+    span: str
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    started: str = ""
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        if rows is None or self.wall_seconds <= 0:
+            return None
+        return rows / self.wall_seconds
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    run_id: str
+    spans: List[Span] = field(default_factory=list)
+
+
+_CURRENT: Optional[StageMetrics] = None
+
+
+@contextmanager
+def span(name: str, rows_in: Optional[int] = None) -> Iterator[Span]:
+    """Time a step of the current stage; set ``rows_out`` (or ``rows_in``) on the yielded span.
+
+    Outside ``stage()`` the span is still measured but not recorded.
+    """
+    s = Span(stage=_CURRENT.name if _CURRENT else "", span=name, rows_in=rows_in,
+             started=datetime.now(timezone.utc).isoformat(timespec="milliseconds"))
+    wall0, cpu0 = time.perf_counter(), cpu_seconds()
+    try:
+        yield s
+    finally:
+        s.wall_seconds = time.perf_counter() - wall0
+        s.cpu_seconds = cpu_seconds() - cpu0
+        s.peak_rss_bytes = peak_rss_bytes()
+        if _CURRENT is not None:
+            _CURRENT.spans.append(s)
+
+
+def _profiling(name: str) -> bool:
+    wanted = os.getenv(PROFILE_ENV, "").strip()
+    return wanted in ("1", "all") or name in {w.strip() for w in wanted.split(",")}
+
+
+def span_records(metrics: StageMetrics) -> List[dict]:
+    return [{"run_id": metrics.run_id, **asdict(s), "rows_per_second": s.rows_per_second} for s in metrics.spans]
+
+
+def prometheus_text(metrics: StageMetrics) -> str:
+    """The stage's spans in the Prometheus text exposition format (e.g. for a node_exporter textfile)."""
+    gauges = [
+        ("wall_seconds", "Wall-clock seconds spent in the span", lambda s: s.wall_seconds),
+        ("cpu_seconds", "CPU seconds of the process and its finished children during the span", lambda s: s.cpu_seconds),
+        ("peak_rss_bytes", "Peak resident memory of the process at the end of the span", lambda s: s.peak_rss_bytes),
+        ("rows_in", "Rows entering the span", lambda s: s.rows_in),
+        ("rows_out", "Rows leaving the span", lambda s: s.rows_out),
+        ("rows_per_second", "Rows processed per wall-clock second", lambda s: s.rows_per_second),
+    ]
+    # Repeated spans (e.g. one per chunk) become one series: times and rows add up, memory is the max
+    merged = {}
+    for s in metrics.spans:
+        if s.span not in merged:
+            merged[s.span] = Span(s.stage, s.span, s.rows_in, s.rows_out, s.wall_seconds, s.cpu_seconds,
+                                  s.peak_rss_bytes, s.started)
+            continue
+        m = merged[s.span]
+        m.wall_seconds += s.wall_seconds
+        m.cpu_seconds += s.cpu_seconds
+        m.rows_in = None if m.rows_in is None or s.rows_in is None else m.rows_in + s.rows_in
+        m.rows_out = None if m.rows_out is None or s.rows_out is None else m.rows_out + s.rows_out
+        m.peak_rss_bytes = max(filter(None, [m.peak_rss_bytes, s.peak_rss_bytes]), default=None)
+
+    lines = []
+    for metric, help_text, value in gauges:
+        name = f"{PROM_PREFIX}_{metric}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for s in merged.values():
+            v = value(s)
+            if v is not None:
+                label = s.span.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{stage="{metrics.name}",span="{label}"}} {float(v):.6g}')
+    return "\n".join(lines) + "\n"
+
+
+def export(metrics: StageMetrics, out_dir: Path = METRICS_DIR) -> None:
+    """Append the spans to ``metrics.jsonl`` and rewrite ``<stage>.prom`` with the latest run."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "metrics.jsonl", "a", encoding="utf-8") as f:
+        for record in span_records(metrics):
+            f.write(json.dumps(record) + "\n")
+    prom = out_dir / f"{metrics.name}.prom"
+    tmp = prom.with_suffix(".tmp")
+    tmp.write_text(prometheus_text(metrics), encoding="utf-8")
+    os.replace(tmp, prom)
+
+
+@contextmanager
+def stage(name: str, out_dir: Optional[Path] = None) -> Iterator[StageMetrics]:
+    """Record a script run as stage ``name``: a "total" span around the body plus any nested spans.
+
+    Metrics are exported when the stage ends, even if it fails. With REVIEWS_PROFILE
+    set to "1", "all" or a list including ``name``, the stage also runs under cProfile
+    and ``<stage>.prof`` plus a cumulative-time summary ``<stage>.prof.txt`` are written.
+    """
+    global _CURRENT
+    out_dir = out_dir or METRICS_DIR
+    previous = _CURRENT
+    _CURRENT = StageMetrics(name, run_id=f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}")
+    profiler = cProfile.Profile() if _profiling(name) else None
+    try:
+        if profiler:
+            profiler.enable()
+        with span("total"):
+            yield _CURRENT
+    finally:
+        if profiler:
+            profiler.disable()
+            out_dir.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(out_dir / f"{name}.prof")
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(40)
+            (out_dir / f"{name}.prof.txt").write_text(buf.getvalue(), encoding="utf-8")
+        metrics, _CURRENT = _CURRENT, previous
+        export(metrics, out_dir)
+
+
+def instrumented(name: str):
+    """Decorator running a script's ``main`` inside ``stage(name)``."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
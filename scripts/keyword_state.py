@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from scripts.keywords_themes import KEYWORD_MIN_DF, KEYWORD_VECTORIZER, TERM_FREQ_TOP, top_term_counts
+
+STATE_DIR = Path("data/cache/keyword_state")
+
+
+def _grow(m: sparse.csr_matrix, shape) -> sparse.csr_matrix:
+    m = sparse.csr_matrix(m)
+    m.resize(shape)
+    return m
+
+
+class KeywordState:
+    """Mergeable per-bank term statistics over a persisted vocabulary.
+
+    For every (bank, term) it keeps the raw term count ``tf``, the document frequency
+    ``df``, and ``ntf``, the sum of the term's L2-normalized count in each document. It
+    also keeps the number of documents per bank and the review ids already counted. All
+    of these are sums, so only new reviews are tokenized and counted. Reviews cannot be
+    subtracted again: when counted ids leave the corpus (``removed``), the state has to be
+    rebuilt. Callers still read the whole corpus to find new and removed ids.
+    """
+
+    def __init__(self, terms: Optional[List[str]] = None, banks: Optional[List[str]] = None,
+                 tf=None, ntf=None, df=None, n_docs=None, seen=None):
+        self.terms: List[str] = list(terms or [])
+        self.banks: List[str] = list(banks or [])
+        shape = (len(self.banks), len(self.terms))
+        self.tf = sparse.csr_matrix(tf if tf is not None else shape, dtype=np.float64)
+        self.ntf = sparse.csr_matrix(ntf if ntf is not None else shape, dtype=np.float64)
+        self.df = sparse.csr_matrix(df if df is not None else shape, dtype=np.float64)
+        self.n_docs = np.asarray(n_docs if n_docs is not None else np.zeros(len(self.banks)), dtype=np.int64)
+        self.seen = np.asarray(seen if seen is not None else np.empty(0), dtype=np.int64)
+        self._term_index: Dict[str, int] = {t: i for i, t in enumerate(self.terms)}
+        self._bank_index: Dict[str, int] = {b: i for i, b in enumerate(self.banks)}
+
+    @classmethod
+    def load(cls, path: Path = STATE_DIR) -> "KeywordState":
+        if not (path / "meta.json").exists():
+            return cls()
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            terms=meta["terms"],
+            banks=meta["banks"],
+            tf=sparse.load_npz(path / "tf.npz"),
+            ntf=sparse.load_npz(path / "ntf.npz"),
+            df=sparse.load_npz(path / "df.npz"),
+            n_docs=meta["n_docs"],
+            seen=np.load(path / "seen_ids.npy"),
+        )
+
+    def save(self, path: Path = STATE_DIR) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        sparse.save_npz(path / "tf.npz", self.tf)
+        sparse.save_npz(path / "ntf.npz", self.ntf)
+        sparse.save_npz(path / "df.npz", self.df)
+        np.save(path / "seen_ids.npy", self.seen)
+        # meta.json last: a state is only picked up once all of its arrays are written
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"terms": self.terms, "banks": self.banks, "n_docs": self.n_docs.tolist()}, f)
+
+    def _index(self, index: Dict[str, int], names: List[str], values) -> np.ndarray:
+        out = np.empty(len(values), dtype=np.int64)
+        for i, v in enumerate(values):
+            if v not in index:
+                index[v] = len(names)
+                names.append(v)
+            out[i] = index[v]
+        return out
+
+    def removed(self, review_ids) -> int:
+        """Number of counted reviews missing from ``review_ids``, the full current corpus."""
+        return int((~np.isin(self.seen, np.asarray(review_ids, dtype=np.int64))).sum())
+
+    def update(self, reviews: pd.DataFrame) -> int:
+        """Fold reviews (``review_id``, ``bank``, ``review``) not seen before into the state."""
+        reviews = reviews[reviews["bank"].notna()].drop_duplicates(subset=["review_id"])
+        new = reviews[~np.isin(reviews["review_id"].to_numpy(dtype=np.int64), self.seen)]
+        if new.empty:
+            return 0
+
+        vec = CountVectorizer(**KEYWORD_VECTORIZER, dtype=np.float64)
+        try:
+            X = sparse.csr_matrix(vec.fit_transform(new["review"].fillna("").astype(str).tolist()))
+            delta_terms = vec.get_feature_names_out().tolist()
+        except ValueError:
+            # Only stop words in the delta: nothing to count, but the reviews are still seen
+            X, delta_terms = sparse.csr_matrix((len(new), 0)), []
+        cols = self._index(self._term_index, self.terms, delta_terms)
+        rows = self._index(self._bank_index, self.banks, new["bank"].tolist())
+        shape = (len(self.banks), len(self.terms))
+
+        # (banks x delta docs) indicator, so each statistic is one sparse product
+        G = sparse.csr_matrix((np.ones(len(rows)), (rows, np.arange(len(rows)))), shape=(shape[0], len(rows)))
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        N = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ X
+        B = X.copy()
+        B.data[:] = 1.0
+        # Delta columns are positions in the delta vocabulary; P maps them onto the global vocabulary
+        P = sparse.csr_matrix((np.ones(len(cols)), (np.arange(len(cols)), cols)), shape=(len(cols), shape[1]))
+
+        self.tf = _grow(self.tf, shape) + G @ X @ P
+        self.ntf = _grow(self.ntf, shape) + G @ N @ P
+        self.df = _grow(self.df, shape) + G @ B @ P
+        self.n_docs = np.concatenate([self.n_docs, np.zeros(shape[0] - len(self.n_docs), dtype=np.int64)])
+        self.n_docs += np.bincount(rows, minlength=shape[0])
+        self.seen = np.union1d(self.seen, new["review_id"].to_numpy(dtype=np.int64))
+        return len(new)
+
+    def top_keywords(self, n: int = 30, min_df: int = KEYWORD_MIN_DF) -> pd.DataFrame:
+        """Per-bank top terms by idf-weighted mean normalized term frequency.
+
+        This tracks the mean TF-IDF of the full recompute, but each document is normalized
+        by its raw-count norm, because idf-weighted norms cannot be merged.
+        """
+        terms = np.asarray(self.terms, dtype=object)
+        rows = []
+        for b in np.argsort(self.banks, kind="stable"):
+            df_row = self.df.getrow(b).toarray().ravel()
+            cand = np.flatnonzero(df_row >= min_df)
+            if len(cand) == 0:
+                continue
+            n_docs = self.n_docs[b]
+            idf = np.log((1.0 + n_docs) / (1.0 + df_row[cand])) + 1.0
+            scores = self.ntf.getrow(b).toarray().ravel()[cand] * idf / n_docs
+            if len(cand) > n:
+                part = np.argpartition(-scores, n - 1)[:n]
+                cand, scores = cand[part], scores[part]
+            order = np.lexsort((terms[cand], -scores))
+            for rank, i in enumerate(order, start=1):
+                rows.append({"bank": self.banks[b], "rank": rank, "term": terms[cand[i]], "score": float(scores[i])})
+        return pd.DataFrame(rows, columns=["bank", "rank", "term", "score"])
+
+    def term_frequencies(self, n: int = TERM_FREQ_TOP) -> pd.DataFrame:
+        """Per-bank word counts, in the layout of ``term_frequencies_by_group``."""
+        order = np.argsort(self.banks, kind="stable")
+        return top_term_counts(self.tf[order], self.terms, [self.banks[b] for b in order], "bank", n)
@@ -1,14 +1,30 @@
+import argparse
+import json
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 
-CLEAN_PATH = Path("data/processed/reviews_clean.csv")
-SENTIMENT_PATH = Path("data/processed/reviews_sentiment_partial.csv")
-THEMES_OUT = Path("data/processed/reviews_themes.csv")
+from scripts.dataset_io import dataset_exists, formats_from_arg, write_dataset
+from scripts.instrument import instrumented, span
+from scripts.schema import REVIEW_DTYPES, read_reviews
+
+CLEAN_NAME = "reviews_clean"
+THEMES_NAME = "reviews_themes"
 KEYWORDS_OUT = Path("data/processed/keywords_by_bank.csv")
+TERM_FREQ_OUT = Path("data/processed/term_freq_by_bank.csv")
+# Word cloud draws at most this many words per bank (WordCloud's max_words default)
+TERM_FREQ_TOP = 200
+
+# Tokenization shared by every keyword grouping; min_df is applied per group
+KEYWORD_VECTORIZER = {"lowercase": True, "stop_words": "english", "ngram_range": (1, 2)}
+KEYWORD_MIN_DF = 3
 
 # Simple, rule-based theme definitions. Adjust as needed.
 THEME_RULES: Dict[str, List[str]] = {
@@ -32,7 +48,7 @@ THEME_RULES: Dict[str, List[str]] = {
 
 def _top_tfidf_keywords(df: pd.DataFrame, text_col: str, n: int = 30) -> List[Tuple[str, float]]:
     corpus = df[text_col].fillna("").astype(str).tolist()
-    vec = TfidfVectorizer(lowercase=True, stop_words="english", ngram_range=(1, 2), min_df=3)
+    vec = TfidfVectorizer(**KEYWORD_VECTORIZER, min_df=KEYWORD_MIN_DF)
     X = vec.fit_transform(corpus)
     # Average TF-IDF across documents
     avg_scores = X.mean(axis=0).A1
@@ -42,42 +58,281 @@ def _top_tfidf_keywords(df: pd.DataFrame, text_col: str, n: int = 30) -> List[Tu
     return pairs[:n]
 
 
-def _assign_themes(text: str) -> List[str]:
-    text_l = text.lower()
-    matched = []
-    for theme, patterns in THEME_RULES.items():
-        for pat in patterns:
-            if re.search(pat, text_l):
-                matched.append(theme)
+def tokenize_corpus(texts: pd.Series) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Term counts for the whole corpus, tokenized once and shared by every grouping."""
+    vec = CountVectorizer(**KEYWORD_VECTORIZER, dtype=np.float64)
+    X = vec.fit_transform(texts.fillna("").astype(str).tolist())
+    return sparse.csr_matrix(X), vec.get_feature_names_out()
+
+
+def _indicator(codes: np.ndarray, n_groups: int) -> sparse.csr_matrix:
+    # (groups x docs) 0/1 matrix; docs with code -1 (missing key) belong to no group
+    docs = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix(
+        (np.ones(len(docs)), (codes[docs], docs)), shape=(n_groups, len(codes))
+    )
+
+
+def top_keywords_by_group(
+    X: sparse.csr_matrix,
+    terms: np.ndarray,
+    keys: pd.DataFrame,
+    n: int = 30,
+    min_df: int = KEYWORD_MIN_DF,
+) -> pd.DataFrame:
+    """Top ``n`` terms by mean TF-IDF within each group of ``keys``, from one count matrix.
+
+    Reproduces fitting ``TfidfVectorizer(min_df=min_df)`` separately on every group:
+    document frequencies, the min_df cut, smoothed IDF and the per-document L2 norm
+    are all computed per group, with indicator-matrix products instead of re-tokenizing
+    each subset.
+    """
+    by = list(keys.columns)
+    grouped = keys.groupby(by, sort=True, dropna=True, observed=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    group_names = list(grouped.groups.keys())
+    n_groups, n_terms = len(group_names), X.shape[1]
+    G = _indicator(codes, n_groups)
+    n_docs = np.asarray(G.sum(axis=1)).ravel()
+
+    # Per-group document frequency, the min_df cut and smoothed idf, all on the sparse (groups x terms) matrix
+    B = X.copy()
+    B.data[:] = 1.0
+    idf = sparse.csr_matrix(G @ B)
+    idf.data[idf.data < min_df] = 0.0
+    idf.eliminate_zeros()
+    idf.sort_indices()
+    if idf.nnz == 0:
+        return pd.DataFrame(columns=by + ["rank", "term", "score"])
+    group_of_entry = np.repeat(np.arange(n_groups), np.diff(idf.indptr))
+    idf.data = np.log((1.0 + n_docs[group_of_entry]) / (1.0 + idf.data)) + 1.0
+
+    # Look up idf[group(doc), term] for every non-zero of X, then L2-normalize each document
+    X = X.copy()
+    X.sort_indices()
+    doc_of_entry = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    entry_group = codes[doc_of_entry]
+    wanted = entry_group.astype(np.int64) * n_terms + X.indices
+    have = group_of_entry.astype(np.int64) * n_terms + idf.indices
+    pos = np.minimum(np.searchsorted(have, wanted), len(have) - 1)
+    found = (entry_group >= 0) & (have[pos] == wanted)
+    X.data = np.where(found, X.data * idf.data[pos], 0.0)
+    norms = np.sqrt(np.bincount(doc_of_entry, weights=X.data ** 2, minlength=X.shape[0]))
+    X.data = np.divide(X.data, norms[doc_of_entry], out=np.zeros_like(X.data), where=norms[doc_of_entry] > 0)
+
+    means = sparse.csr_matrix(G @ X)
+    rows = []
+    for g, name in enumerate(group_names):
+        start, end = idf.indptr[g], idf.indptr[g + 1]
+        if start == end:
+            continue
+        cand = idf.indices[start:end]
+        scores = np.asarray(means[g, cand].todense()).ravel() / n_docs[g]
+        if len(cand) > n:
+            part = np.argpartition(-scores, n - 1)[:n]
+            cand, scores = cand[part], scores[part]
+        # Highest score first, ties in vocabulary order like the stable sort over sorted feature names
+        order = np.lexsort((cand, -scores))
+        name = name if isinstance(name, tuple) else (name,)
+        for rank, i in enumerate(order, start=1):
+            rows.append({**dict(zip(by, name)), "rank": rank, "term": terms[cand[i]], "score": float(scores[i])})
+    return pd.DataFrame(rows, columns=by + ["rank", "term", "score"])
+
+
+def top_term_counts(counts: sparse.csr_matrix, terms: np.ndarray, group_names, col: str,
+                    n: int = TERM_FREQ_TOP) -> pd.DataFrame:
+    """The ``n`` most frequent single words per row of a (groups x terms) count matrix.
+
+    Bigrams and bare numbers are left out, matching what a word cloud shows.
+    """
+    terms = np.asarray(terms, dtype=object)
+    words = np.array([" " not in t and not t.isdigit() for t in terms], dtype=bool)
+    counts = sparse.csr_matrix(counts)
+    rows = []
+    for g, name in enumerate(group_names):
+        start, end = counts.indptr[g], counts.indptr[g + 1]
+        cand, values = counts.indices[start:end], counts.data[start:end]
+        keep = words[cand] & (values > 0)
+        cand, values = cand[keep], values[keep]
+        order = np.lexsort((terms[cand], -values))[:n]
+        rows.extend({col: name, "term": terms[cand[i]], "count": int(values[i])} for i in order)
+    return pd.DataFrame(rows, columns=[col, "term", "count"])
+
+
+def term_frequencies_by_group(X: sparse.csr_matrix, terms: np.ndarray, groups: pd.Series,
+                              n: int = TERM_FREQ_TOP) -> pd.DataFrame:
+    """Per-group word counts from the shared count matrix, e.g. for word clouds."""
+    grouper = groups.groupby(groups.to_numpy(), sort=True, observed=True)
+    codes = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    names = list(grouper.groups)
+    G = _indicator(codes, len(names))
+    return top_term_counts(G @ X, terms, names, groups.name, n)
+
+
+def _group_key(df: pd.DataFrame, key: str) -> pd.Series:
+    if key == "month":
+        months = pd.to_datetime(df["date"], errors="coerce").dt.to_period("M")
+        return months.astype(str).where(months.notna())
+    return df[key]
+
+
+def load_theme_rules(path: Path) -> Dict[str, List[str]]:
+    # JSON object of {"Theme name": ["regex", ...]}, in the order themes should be reported
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict) or not all(isinstance(v, list) for v in rules.values()):
+        raise ValueError(f"Theme rules in {path} must map theme names to lists of patterns")
+    return rules
+
+
+class ThemeTagger:
+    """Theme rules compiled into one regex so each review is scanned once.
+
+    Every theme becomes a named group inside a single zero-width lookahead, so matches
+    never consume text and overlapping hits from different themes are all seen. When
+    one theme wins the alternation at a position, only the themes after it still need
+    an anchored check at that same position. The tags are therefore identical to
+    running every pattern with ``re.search``.
+
+    ``tag_column`` also has a vectorized path. It runs each theme's alternation over
+    the whole column with Arrow's RE2 matcher, which is automaton-based and linear in
+    the text length however many patterns a theme has. RE2's ``\b`` and lowercasing are
+    ASCII-only, so only ASCII rows take that path and the rest use the scanner.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, List[str]]] = None):
+        rules = THEME_RULES if rules is None else rules
+        self.themes = list(rules)
+        self._theme_res = [re.compile("|".join(f"(?:{p})" for p in patterns)) for patterns in rules.values()]
+        alternation = "|".join(f"(?P<t{i}>{r.pattern})" for i, r in enumerate(self._theme_res))
+        self._scanner = re.compile(f"(?=(?:{alternation}))")
+        self._re2_ok = self._re2_compatible()
+
+    def _re2_compatible(self) -> bool:
+        # Lookarounds and backreferences are valid for `re` but rejected by RE2
+        probe = pa.array([""], type=pa.string())
+        try:
+            for r in self._theme_res:
+                pc.match_substring_regex(probe, r.pattern)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return False
+        return True
+
+    def _tag_lowered(self, text_l: str) -> List[str]:
+        found = set()
+        n_themes = len(self.themes)
+        for m in self._scanner.finditer(text_l):
+            k = int(m.lastgroup[1:])
+            found.add(k)
+            pos = m.start()
+            for j in range(k + 1, n_themes):
+                if j not in found and self._theme_res[j].match(text_l, pos):
+                    found.add(j)
+            if len(found) == n_themes:
                 break
-    return matched if matched else ["Other"]
+        return [self.themes[i] for i in sorted(found)] or ["Other"]
+
+    def tag(self, text: str) -> List[str]:
+        return self._tag_lowered(text.lower())
+
+    def tag_column(self, texts: pd.Series) -> pd.Series:
+        texts = texts.fillna("").astype(str)
+        out = np.empty(len(texts), dtype=object)
+        slow = np.ones(len(texts), dtype=bool)
+
+        if self._re2_ok and len(texts):
+            arr = pa.array(texts.tolist(), type=pa.large_string())
+            slow = ~pc.string_is_ascii(arr).to_numpy(zero_copy_only=False)
+            lowered = pc.ascii_lower(arr)
+            hits = np.column_stack([
+                pc.match_substring_regex(lowered, r.pattern).to_numpy(zero_copy_only=False)
+                for r in self._theme_res
+            ])
+            # Build each distinct tag string once
+            combos, inverse = np.unique(hits, axis=0, return_inverse=True)
+            labels = np.array(
+                [", ".join(t for t, hit in zip(self.themes, row) if hit) or "Other" for row in combos],
+                dtype=object,
+            )
+            out[:] = labels[inverse.reshape(-1)]
+
+        for i in np.flatnonzero(slow):
+            out[i] = ", ".join(self._tag_lowered(texts.iat[i].lower()))
+        return pd.Series(out, index=texts.index, dtype=object)
 
 
+_DEFAULT_TAGGER = ThemeTagger()
+
+
+def _assign_themes(text: str) -> List[str]:
+    return _DEFAULT_TAGGER.tag(text)
+
+
+@instrumented("keywords")
 def main():
-    if not CLEAN_PATH.exists():
-        raise FileNotFoundError(f"Cleaned dataset not found at {CLEAN_PATH}")
-    df = pd.read_csv(CLEAN_PATH)
-
-    # Generate per-bank top keywords using TF-IDF
-    banks = sorted(df["bank"].dropna().unique())
-    kw_rows = []
-    for bank in banks:
-        sub = df[df["bank"] == bank]
-        if len(sub) == 0:
-            continue
-        top_kw = _top_tfidf_keywords(sub, "review", n=30)
-        for rank, (term, score) in enumerate(top_kw, start=1):
-            kw_rows.append({"bank": bank, "rank": rank, "term": term, "score": float(score)})
-    kw_df = pd.DataFrame(kw_rows)
+    parser = argparse.ArgumentParser(description="Extract per-bank keywords and tag review themes.")
+    parser.add_argument("--format", choices=["parquet", "csv", "both"], default="parquet",
+                        help="Output format of the themes dataset")
+    parser.add_argument("--rules", type=Path, default=None,
+                        help="JSON file of theme rules to use instead of the built-in THEME_RULES")
+    parser.add_argument("--also_by", nargs="*", choices=["month", "rating"], default=[],
+                        help="Extra per-bank keyword breakdowns, written to keywords_by_bank_<key>.csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update persisted keyword statistics with new reviews only, rebuilding them "
+                             "if reviews were removed (approximate TF-IDF, see KeywordState.top_keywords)")
+    args = parser.parse_args()
+    if args.incremental and args.also_by:
+        parser.error("--also_by needs the full corpus and cannot be combined with --incremental")
+
+    if not dataset_exists(CLEAN_NAME):
+        raise FileNotFoundError(f"Cleaned dataset '{CLEAN_NAME}' not found")
+    with span("read_dataset") as s:
+        df = read_reviews(CLEAN_NAME)
+        s.rows_out = len(df)
+
+    if args.incremental:
+        from scripts.keyword_state import KeywordState
+
+        # Only reviews missing from the persisted state are tokenized
+        with span("keyword_state_update", rows_in=len(df)) as s:
+            state = KeywordState.load()
+            removed = state.removed(df["review_id"])
+            if removed:
+                # Counts cannot be taken back out, so start over from the current corpus
+                print(f"{removed} counted reviews are no longer in {CLEAN_NAME}; rebuilding keyword state")
+                state = KeywordState()
+            added = state.update(df[["review_id", "bank", "review"]])
+            state.save()
+            s.rows_out = added
+        print(f"Added {added} new reviews to keyword state ({len(state.seen)} total)")
+        kw_df = state.top_keywords(n=30)
+        freq_df = state.term_frequencies()
+    else:
+        # Generate per-bank top keywords using TF-IDF, tokenizing the corpus once for all groupings
+        with span("tokenize", rows_in=len(df)):
+            X, terms = tokenize_corpus(df["review"])
+        with span("tfidf_keywords", rows_in=len(df)):
+            kw_df = top_keywords_by_group(X, terms, df[["bank"]], n=30)
+            freq_df = term_frequencies_by_group(X, terms, df["bank"])
     KEYWORDS_OUT.parent.mkdir(parents=True, exist_ok=True)
     kw_df.to_csv(KEYWORDS_OUT, index=False)
+    # Word counts for the word clouds, so visualize never re-tokenizes the corpus
+    freq_df.to_csv(TERM_FREQ_OUT, index=False)
+
+    for key in args.also_by:
+        keys = pd.DataFrame({"bank": df["bank"], key: _group_key(df, key)})
+        out = KEYWORDS_OUT.with_name(f"keywords_by_bank_{key}.csv")
+        top_keywords_by_group(X, terms, keys, n=30).to_csv(out, index=False)
+        print(f"Saved keywords by bank and {key} to {out}")
 
     # Assign themes to each review via keyword rules
-    df["themes"] = df["review"].fillna("").astype(str).apply(lambda t: ", ".join(_assign_themes(t)))
+    tagger = ThemeTagger(load_theme_rules(args.rules)) if args.rules else _DEFAULT_TAGGER
+    with span("assign_themes", rows_in=len(df)):
+        df["themes"] = tagger.tag_column(df["review"]).astype(REVIEW_DTYPES["themes"])
 
-    THEMES_OUT.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(THEMES_OUT, index=False)
-    print(f"Saved themes per review to {THEMES_OUT} and keywords to {KEYWORDS_OUT}")
+    with span("write_dataset", rows_in=len(df)):
+        out_paths = write_dataset(df, THEMES_NAME, formats_from_arg(args.format))
+    print(f"Saved themes per review to {', '.join(map(str, out_paths))} and keywords to {KEYWORDS_OUT}")
 
 
 if __name__ == "__main__":
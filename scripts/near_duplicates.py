@@ -0,0 +1,242 @@
+import json
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+INDEX_DIR = Path("data/cache/near_dup_index")
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_CHARS = 5
+# Short reviews ("good app") repeat across genuine users, so they are never flagged
+MIN_CHARS = 30
+SEED = 1
+# Shingle hashes processed per batch when computing signatures (bounds temporary memory)
+BATCH_SHINGLES = 2_000_000
+# Earlier reviews verified per band key; beyond that a shared key is mostly boilerplate text
+MAX_BAND_CANDIDATES = 16
+
+MODES = ("off", "flag", "drop")
+FLAG_COL = "near_duplicate_of"
+
+_NON_WORD = re.compile(r"[\W_]+")
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize_text(text: str) -> str:
+    # Case, punctuation and spacing edits should not hide a copy
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows) whose S-curve midpoint ``(1/bands) ** (1/rows)`` is closest to ``threshold``."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        err = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: spreads polynomial hashes over all 64 bits
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def shingle_hashes(texts: List[str], k: int = SHINGLE_CHARS) -> Tuple[np.ndarray, np.ndarray]:
+    """64-bit hashes of every k-character window of each text, and the number of windows per text.
+
+    All texts are encoded as one UTF-32 buffer, so the rolling hash is a handful of
+    array operations however many texts there are. Texts shorter than ``k`` get no shingles.
+    """
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    counts = np.maximum(lengths - k + 1, 0)
+    total = int(lengths.sum())
+    if counts.sum() == 0:
+        return np.empty(0, dtype=np.uint64), counts
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        h = np.zeros(total - k + 1, dtype=np.uint64)
+        for j in range(k):
+            h = h * _GOLDEN + codes[j:total - k + 1 + j]
+        h = _mix(h)
+    # Keep only windows that start and end inside one text
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    return h[np.repeat(starts, counts) + offsets], counts
+
+
+class NearDuplicateIndex:
+    """Persisted MinHash signatures and LSH band tables of the reviews seen so far.
+
+    Each indexed review stores its signature and ``canon``, the position of the
+    earliest review of its near-duplicate cluster. Band tables are kept sorted by key,
+    so a new review finds the reviews sharing a band with one binary search per band.
+    Only candidates whose estimated Jaccard similarity reaches the threshold count as
+    duplicates. The first ``MAX_BAND_CANDIDATES`` sharing a key are checked, so a copy
+    of a review behind more band collisions than that goes unflagged in that band. A
+    batch never re-reads the reviews behind the index.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM,
+                 shingle_chars: int = SHINGLE_CHARS, min_chars: int = MIN_CHARS, seed: int = SEED):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_chars = shingle_chars
+        self.min_chars = max(min_chars, shingle_chars)
+        self.seed = seed
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: odd multipliers, top 32 bits of the wrapped product
+        self._a = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 64, size=num_perm, dtype=np.uint64, endpoint=False)
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.sigs = np.empty((0, num_perm), dtype=np.uint32)
+        self.canon = np.empty(0, dtype=np.int64)
+        self.band_keys = np.empty((self.bands, 0), dtype=np.uint64)
+        self.band_pos = np.empty((self.bands, 0), dtype=np.int64)
+
+    def _params(self) -> dict:
+        return {"threshold": self.threshold, "num_perm": self.num_perm, "shingle_chars": self.shingle_chars,
+                "min_chars": self.min_chars, "seed": self.seed}
+
+    @classmethod
+    def load(cls, path: Path = INDEX_DIR, **params) -> "NearDuplicateIndex":
+        """The index at ``path``; a fresh one if it is missing or was built with other parameters."""
+        index = cls(**params)
+        if not (path / "meta.json").exists():
+            return index
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["params"] != index._params():
+            print(f"Near-duplicate index at {path} was built with {meta['params']}; starting a new one")
+            return index
+        index.ids = np.load(path / "ids.npy")
+        index.sigs = np.load(path / "sigs.npy")
+        index.canon = np.load(path / "canon.npy")
+        index.band_keys = np.load(path / "band_keys.npy")
+        index.band_pos = np.load(path / "band_pos.npy")
+        return index
+
+    def save(self, path: Path = INDEX_DIR) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ("ids", "sigs", "canon", "band_keys", "band_pos"):
+            np.save(path / f"{name}.npy", getattr(self, name))
+        # meta.json last: an index is only picked up once all of its arrays are written
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"params": self._params(), "n_reviews": len(self.ids)}, f)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """(len(texts) x num_perm) MinHash signatures over character shingles."""
+        sigs = np.full((len(texts), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        start = 0
+        while start < len(texts):
+            # Grow the batch until it holds about BATCH_SHINGLES windows
+            end, size = start, 0
+            while end < len(texts) and (size == 0 or size + len(texts[end]) <= BATCH_SHINGLES):
+                size += len(texts[end])
+                end += 1
+            hashes, counts = shingle_hashes(texts[start:end], self.shingle_chars)
+            docs = np.flatnonzero(counts) + start
+            if len(docs):
+                bounds = np.concatenate([[0], np.cumsum(counts[counts > 0])[:-1]])
+                with np.errstate(over="ignore"):
+                    for p in range(self.num_perm):
+                        values = ((self._a[p] * hashes + self._b[p]) >> np.uint64(32)).astype(np.uint32)
+                        sigs[docs, p] = np.minimum.reduceat(values, bounds)
+            start = end
+        return sigs
+
+    def _band_keys(self, sigs: np.ndarray) -> np.ndarray:
+        keys = np.zeros((self.bands, len(sigs)), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for band in range(self.bands):
+                h = np.full(len(sigs), band, dtype=np.uint64)
+                for col in sigs[:, band * self.rows:(band + 1) * self.rows].T:
+                    h = _mix(h * _GOLDEN + col.astype(np.uint64))
+                keys[band] = h
+        return keys
+
+    def _add(self, ids: np.ndarray, sigs: np.ndarray) -> None:
+        start = len(self.ids)
+        pos = np.arange(start, start + len(ids), dtype=np.int64)
+        keys = self._band_keys(sigs)
+        table_keys, table_pos = [], []
+        for band in range(self.bands):
+            # Old entries stay ahead of equal new keys, and new ones go in position order,
+            # so every key run lists its reviews from earliest to latest
+            order = np.lexsort((pos, keys[band]))
+            at = np.searchsorted(self.band_keys[band], keys[band][order], side="right")
+            table_keys.append(np.insert(self.band_keys[band], at, keys[band][order]))
+            table_pos.append(np.insert(self.band_pos[band], at, pos[order]))
+        self.band_keys, self.band_pos = np.vstack(table_keys), np.vstack(table_pos)
+        self.ids = np.concatenate([self.ids, ids])
+        self.sigs = np.vstack([self.sigs, sigs])
+
+        # Per band, walk the earlier reviews sharing the key (oldest first, at most
+        # MAX_BAND_CANDIDATES) and keep the earliest one that is really similar
+        best = np.full(len(ids), np.iinfo(np.int64).max, dtype=np.int64)
+        for band in range(self.bands):
+            lo = np.searchsorted(self.band_keys[band], keys[band], side="left")
+            hi = np.searchsorted(self.band_keys[band], keys[band], side="right")
+            rows = np.arange(len(ids))
+            for k in range(MAX_BAND_CANDIDATES):
+                rows = rows[lo[rows] + k < hi[rows]]
+                other = self.band_pos[band][lo[rows] + k]
+                # Runs are in position order, so the first entry that is not earlier ends the walk
+                earlier = other < pos[rows]
+                rows, other = rows[earlier], other[earlier]
+                if len(rows) == 0:
+                    break
+                ok = (self.sigs[other] == sigs[rows]).mean(axis=1) >= self.threshold
+                best[rows[ok]] = np.minimum(best[rows[ok]], other[ok])
+                rows = rows[~ok]
+        canon = np.where(best < start + len(ids), best, pos)
+
+        # Candidates always come earlier, so following links to their roots terminates
+        self.canon = np.concatenate([self.canon, canon])
+        while True:
+            nxt = self.canon[self.canon[start:]]
+            if np.array_equal(nxt, self.canon[start:]):
+                break
+            self.canon[start:] = nxt
+
+    def update(self, reviews: pd.DataFrame) -> pd.Series:
+        """Index reviews (``review_id``, ``review``) not seen before and return, per row, the
+        ``review_id`` of the earliest near-duplicate (missing when the review is the original).
+        """
+        texts = reviews["review"].fillna("").astype(str).map(normalize_text)
+        ids = reviews["review_id"].to_numpy(dtype=np.int64)
+        eligible = (texts.str.len() >= self.min_chars).to_numpy()
+
+        known = pd.Index(self.ids).get_indexer(ids)
+        new = eligible & (known < 0) & ~pd.Series(ids).duplicated().to_numpy()
+        if new.any():
+            self._add(ids[new], self.signatures(texts[new].tolist()))
+
+        positions = pd.Index(self.ids).get_indexer(ids)
+        canon = np.full(len(ids), -1, dtype=np.int64)
+        canon[positions >= 0] = self.canon[positions[positions >= 0]]
+        is_dup = eligible & (positions >= 0) & (canon != positions)
+        out = pd.Series(pd.NA, index=reviews.index, dtype="Int64", name=FLAG_COL)
+        out[is_dup] = self.ids[canon[is_dup]]
+        return out
+
+
+def apply_near_duplicates(df: pd.DataFrame, index: NearDuplicateIndex, mode: str = "flag") -> pd.DataFrame:
+    """``flag`` adds a ``near_duplicate_of`` column; ``drop`` removes the flagged reviews."""
+    if mode == "off":
+        return df
+    if mode not in MODES:
+        raise ValueError(f"Unknown near-duplicate mode '{mode}', expected one of {MODES}")
+    dup_of = index.update(df)
+    if mode == "drop":
+        return df[dup_of.isna().to_numpy()].reset_index(drop=True)
+    return df.assign(**{FLAG_COL: dup_of})
@@ -0,0 +1,293 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+STATE_PATH = Path("data/cache/pipeline_state.json")
+# Rewritten after every successful run that changed outputs; readers caching results key on it
+PUBLISHED_PATH = Path("data/processed/.published")
+
+
+@dataclass
+class Stage:
+    """One ``python -m scripts.<module>`` step with the files it reads and writes.
+
+    Stages depend on the stages that write their inputs. A stage is current when its
+    outputs exist and the fingerprint of its code, ``args`` and input contents matches
+    the one recorded after its last successful run. ``default=False`` stages (network
+    or database side effects) only run when named explicitly. ``always_run`` stages
+    read something outside the repository (the Play Store), so they are never current.
+    """
+
+    name: str
+    module: str
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    args: List[str] = field(default_factory=list)
+    default: bool = True
+    always_run: bool = False
+
+
+STAGES = [
+    Stage("scrape", "scrape_reviews", outputs=["data/raw"], args=["--incremental"], default=False,
+          always_run=True),
+    Stage("preprocess", "preprocess_reviews", inputs=["data/raw"],
+          outputs=["data/processed/reviews_clean"]),
+    Stage("sentiment", "sentiment_partial", inputs=["data/processed/reviews_clean"],
+          outputs=["data/processed/reviews_sentiment_partial"]),
+    Stage("keywords", "keywords_themes", inputs=["data/processed/reviews_clean"],
+          outputs=["data/processed/reviews_themes", "data/processed/keywords_by_bank.csv",
+                   "data/processed/term_freq_by_bank.csv"]),
+    Stage("emoji", "emoji_analysis",
+          inputs=["data/processed/reviews_clean", "data/processed/reviews_sentiment_partial"],
+          outputs=["data/processed/emoji_counts.csv", "data/processed/emoji_sentiment.csv"]),
+    Stage("visualize", "visualize",
+          inputs=["data/processed/reviews_clean", "data/processed/reviews_sentiment_partial",
+                  "data/processed/keywords_by_bank.csv", "data/processed/term_freq_by_bank.csv"],
+          outputs=["outputs/figures"]),
+    Stage("trends", "trends",
+          inputs=["data/processed/reviews_clean", "data/processed/reviews_sentiment_partial",
+                  "data/processed/reviews_themes"],
+          outputs=["data/processed/trends_daily.csv", "data/processed/theme_trends.csv",
+                   "data/processed/emoji_trends.csv"]),
+    Stage("db_load", "db_init_and_load",
+          inputs=["data/processed/reviews_clean", "data/processed/reviews_sentiment_partial",
+                  "data/processed/reviews_themes"],
+          default=False),
+]
+
+
+def dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """Map each stage to the stages that produce one of its inputs."""
+    producers = {out: s.name for s in stages for out in s.outputs}
+    return {s.name: sorted({producers[i] for i in s.inputs if i in producers} - {s.name}) for s in stages}
+
+
+# ast.parse is not safe to call from several threads at once on some CPython versions
+_PARSE_LOCK = threading.Lock()
+
+
+def _module_files(module: str) -> List[Path]:
+    # The stage's module plus every scripts.* module it imports, transitively
+    seen, todo = set(), [module]
+    while todo:
+        name = todo.pop()
+        path = SCRIPTS_DIR / f"{name}.py"
+        if name in seen or not path.exists():
+            continue
+        seen.add(name)
+        with _PARSE_LOCK:
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("scripts."):
+                todo.append(node.module.split(".", 1)[1])
+    return [SCRIPTS_DIR / f"{name}.py" for name in sorted(seen)]
+
+
+class FileHasher:
+    """Content digests of files and directory trees, reusing digests of files whose size and mtime are unchanged."""
+
+    def __init__(self, known: Optional[Dict[str, list]] = None):
+        self.known: Dict[str, list] = dict(known or {})
+        self._lock = threading.Lock()
+
+    def file_digest(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path)
+        with self._lock:
+            hit = self.known.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.known[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def snapshot(self) -> Dict[str, list]:
+        # Drop entries of files that no longer exist (e.g. rewritten Parquet parts)
+        with self._lock:
+            return {k: v for k, v in self.known.items() if Path(k).exists()}
+
+    def digest(self, path: Path) -> str:
+        """Digest of a file or directory tree; "-" if missing.
+
+        Directory digests cover each file's subdirectory and contents but not its name,
+        so a dataset rewritten with identical data under new part-<uuid> names is unchanged.
+        """
+        if path.is_file():
+            return self.file_digest(path)
+        if not path.is_dir():
+            return "-"
+        entries = sorted(f"{f.parent.relative_to(path).as_posix()}/{self.file_digest(f)}"
+                         for f in path.rglob("*") if f.is_file())
+        return hashlib.blake2b("\n".join(entries).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def fingerprint(stage: Stage, hasher: FileHasher) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([stage.module, stage.args]).encode("utf-8"))
+    for path in _module_files(stage.module):
+        h.update(hasher.file_digest(path).encode("ascii"))
+    for inp in stage.inputs:
+        h.update(f"{inp}={hasher.digest(Path(inp))}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_state(path: Path) -> Dict:
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+
+def save_state(path: Path, state: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def mark_published(path: Path = PUBLISHED_PATH) -> str:
+    """Announce a new consistent set of outputs and return its version."""
+    version = f"{time.time_ns():x}"
+    save_state(path, {"version": version, "published_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")})
+    return version
+
+
+def published_version(path: Path = PUBLISHED_PATH) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def run_stage(stage: Stage) -> None:
+    # Output is captured so concurrently running stages don't interleave their logs
+    proc = subprocess.run([sys.executable, "-m", f"scripts.{stage.module}", *stage.args],
+                          capture_output=True, text=True)
+    output = (proc.stdout + proc.stderr).rstrip()
+    if output:
+        print("\n".join(f"[{stage.name}] {line}" for line in output.splitlines()), flush=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Stage '{stage.name}' failed with exit code {proc.returncode}")
+
+
+def run_pipeline(
+    stages: List[Stage],
+    selected: List[str],
+    jobs: int = 4,
+    state_path: Path = STATE_PATH,
+    force: bool = False,
+    dry_run: bool = False,
+    runner: Callable[[Stage], None] = run_stage,
+) -> Dict[str, str]:
+    """Run the ``selected`` stages in dependency order, up to ``jobs`` at a time.
+
+    Returns each selected stage's outcome: "ran", "skipped" (already current),
+    "failed", "blocked" (an upstream stage failed) or "stale" (``dry_run``).
+    Unselected upstream stages are treated as already done.
+    """
+    by_name = {s.name: s for s in stages}
+    deps = {name: [d for d in ds if d in selected] for name, ds in dependencies(stages).items()}
+    state = load_state(state_path)
+    hasher = FileHasher(state["files"])
+    lock = threading.Lock()
+    status: Dict[str, str] = {}
+
+    def is_current(stage: Stage, fp: str) -> bool:
+        return (not force and not stage.always_run and state["stages"].get(stage.name) == fp
+                and all(Path(o).exists() for o in stage.outputs))
+
+    def execute(stage: Stage) -> str:
+        fp = fingerprint(stage, hasher)
+        if is_current(stage, fp):
+            return "skipped"
+        if dry_run:
+            return "stale"
+        t0 = time.perf_counter()
+        runner(stage)
+        print(f"[{stage.name}] done in {time.perf_counter() - t0:.1f}s", flush=True)
+        with lock:
+            state["stages"][stage.name] = fp
+            state["files"] = hasher.snapshot()
+            save_state(state_path, state)
+        return "ran"
+
+    pending = [name for name in selected if name in by_name]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                upstream = [status.get(d) for d in deps[name]]
+                if any(u in ("failed", "blocked") for u in upstream):
+                    status[name] = "blocked"
+                    pending.remove(name)
+                elif all(u is not None for u in upstream):
+                    # A dry run cannot know whether a stale upstream will change this stage's inputs
+                    if dry_run and "stale" in upstream:
+                        status[name] = "stale"
+                    else:
+                        running[pool.submit(execute, by_name[name])] = name
+                    pending.remove(name)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    status[name] = fut.result()
+                except Exception as e:
+                    print(f"[{name}] {e}", flush=True)
+                    status[name] = "failed"
+    with lock:
+        state["files"] = hasher.snapshot()
+        save_state(state_path, state)
+    return {name: status[name] for name in selected if name in status}
+
+
+def main():
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Run the review pipeline, skipping stages that are already current.")
+    parser.add_argument("--stages", nargs="+", choices=names + ["all"], default=None,
+                        help="Stages to run (default: every stage except scrape and db_load)")
+    parser.add_argument("--jobs", type=int, default=4, help="Stages run concurrently")
+    parser.add_argument("--force", action="store_true", help="Re-run the selected stages even if current")
+    parser.add_argument("--dry_run", action="store_true", help="Only report which stages would run")
+    args = parser.parse_args()
+
+    if args.stages is None:
+        selected = [s.name for s in STAGES if s.default]
+    elif "all" in args.stages:
+        selected = names
+    else:
+        selected = [n for n in names if n in args.stages]
+
+    t0 = time.perf_counter()
+    status = run_pipeline(STAGES, selected, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    for name, outcome in status.items():
+        print(f"  {name}: {outcome}")
+    print(f"Pipeline finished in {time.perf_counter() - t0:.1f}s")
+    if any(v in ("failed", "blocked") for v in status.values()):
+        sys.exit(1)
+    if "ran" in status.values():
+        print(f"Published data version {mark_published()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
-import pandas as pd
+import argparse
+import hashlib
 from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from scripts.dataset_io import formats_from_arg, write_dataset
+from scripts.instrument import instrumented, span
+from scripts.near_duplicates import DEFAULT_THRESHOLD, MODES, NearDuplicateIndex, apply_near_duplicates
+from scripts.schema import apply_schema
 
 RAW_DIR = Path("data/raw")
-PROCESSED_DIR = Path("data/processed")
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+
+ID_SEP = "\x1f"
+
+
+def raw_files() -> List[Path]:
+    return sorted(RAW_DIR.glob("*_reviews.csv"))
 
 
 def load_and_concat() -> pd.DataFrame:
-    files = list(RAW_DIR.glob("*_reviews.csv"))
+    files = raw_files()
     dfs = []
     for fp in files:
         df = pd.read_csv(fp)
@@ -17,10 +31,12 @@ def load_and_concat() -> pd.DataFrame:
     return pd.concat(dfs, ignore_index=True)
 
 
-def clean(df: pd.DataFrame) -> pd.DataFrame:
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     # Standardize column names
     df.columns = [c.strip().lower() for c in df.columns]
+    # Ids are always derived from the normalized values below
+    df = df.drop(columns=["review_id"], errors="ignore")
 
     # Basic validation
     required = {"review", "rating", "date", "bank", "source"}
@@ -35,25 +51,131 @@ def clean(df: pd.DataFrame) -> pd.DataFrame:
     # Handle missing ratings
     df["rating"] = pd.to_numeric(df["rating"], errors="coerce")
 
-    # Normalize dates to YYYY-MM-DD
-    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+    # Normalize dates to YYYY-MM-DD (explicit format so parsing never depends on which row comes first)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce", format="ISO8601").dt.date
+    return df
 
-    # Remove duplicates
-    df = df.drop_duplicates(subset=["review", "rating", "date", "bank"]).reset_index(drop=True)
 
+def _fill_metadata(df: pd.DataFrame) -> pd.DataFrame:
     # Ensure metadata
     df["bank"] = df["bank"].fillna("Unknown")
     df["source"] = df["source"].fillna("Google Play")
+    return df
 
+
+def make_review_ids(df: pd.DataFrame) -> np.ndarray:
+    """Stable 64-bit review ids derived from bank, date, rating and text.
+
+    Values are rendered canonically first (ISO date, ``5`` rather than ``5.0``), so the
+    same review gets the same id whether it comes from memory, CSV or Parquet.
+    """
+    dates = pd.to_datetime(df["date"], errors="coerce").dt.strftime("%Y-%m-%d").fillna("")
+    ratings = pd.to_numeric(df["rating"], errors="coerce").astype("float64")
+    ratings = ratings.map(lambda v: "" if pd.isna(v) else f"{v:g}")
+    keys = (
+        df["bank"].astype(object).fillna("").astype(str) + ID_SEP + dates + ID_SEP + ratings + ID_SEP
+        + df["review"].fillna("").astype(str)
+    )
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(k.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+         for k in keys),
+        dtype=np.int64,
+        count=len(keys),
+    )
+
+
+def ensure_review_ids(df: pd.DataFrame) -> pd.DataFrame:
+    # Datasets written before ids existed get them computed on read
+    if "review_id" in df.columns:
+        return df
+    df = df.copy()
+    df.insert(0, "review_id", make_review_ids(df))
     return df
 
 
+def clean(df: pd.DataFrame) -> pd.DataFrame:
+    df = _fill_metadata(_normalize(df))
+    df.insert(0, "review_id", make_review_ids(df))
+
+    # Remove duplicates; the id is a hash of the (review, rating, date, bank) key
+    df = df.drop_duplicates(subset=["review_id"]).reset_index(drop=True)
+
+    return apply_schema(df)
+
+
+def clean_stream(files: List[Path], chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+    """Chunked equivalent of ``clean(load_and_concat())``, yielding cleaned chunks in order.
+
+    Only the 64-bit review ids are kept between chunks, in a sorted NumPy array, so
+    memory is bounded by the chunk size plus 8 bytes per distinct review.
+    """
+    if not files:
+        raise FileNotFoundError("No raw review CSVs found in data/raw")
+    seen = np.empty(0, dtype=np.int64)
+    columns = None
+    for fp in files:
+        for chunk in pd.read_csv(fp, chunksize=chunksize):
+            chunk = _fill_metadata(_normalize(chunk))
+            ids = make_review_ids(chunk)
+            keep = ~pd.Series(ids).duplicated().to_numpy()
+            if len(seen):
+                pos = np.minimum(np.searchsorted(seen, ids), len(seen) - 1)
+                keep &= seen[pos] != ids
+            # Two sorted runs, which the stable sort merges in linear time
+            seen = np.sort(np.concatenate([seen, np.sort(ids[keep])]), kind="stable")
+            chunk = chunk[keep].reset_index(drop=True)
+            chunk.insert(0, "review_id", ids[keep])
+
+            if columns is None:
+                columns = list(chunk.columns)
+            yield apply_schema(chunk.reindex(columns=columns))
+
+
+@instrumented("preprocess")
 def main():
-    df = load_and_concat()
-    clean_df = clean(df)
-    out_path = PROCESSED_DIR / "reviews_clean.csv"
-    clean_df.to_csv(out_path, index=False)
-    print(f"Saved cleaned dataset: {out_path} ({len(clean_df)} rows)")
+    parser = argparse.ArgumentParser(description="Clean and consolidate raw review CSVs.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process raw files in fixed-size chunks with bounded memory")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--format", choices=["parquet", "csv", "both"], default="parquet",
+                        help="Output format of the cleaned dataset")
+    parser.add_argument("--near_dupes", choices=MODES, default="off",
+                        help="Flag (near_duplicate_of column) or drop near-duplicate reviews via MinHash/LSH")
+    parser.add_argument("--near_dup_threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Estimated Jaccard similarity of character shingles that counts as a near-duplicate")
+    args = parser.parse_args()
+    formats = formats_from_arg(args.format)
+    # Signatures persist in data/cache/, so only reviews new to the index are compared
+    index = NearDuplicateIndex.load(threshold=args.near_dup_threshold) if args.near_dupes != "off" else None
+
+    if args.stream:
+        n_rows = 0
+        for i, chunk in enumerate(clean_stream(raw_files(), chunksize=args.chunksize)):
+            if index is not None:
+                with span("near_duplicates", rows_in=len(chunk)) as s:
+                    chunk = apply_near_duplicates(chunk, index, args.near_dupes)
+                    s.rows_out = len(chunk)
+            with span("write_dataset", rows_in=len(chunk)):
+                out_paths = write_dataset(chunk, "reviews_clean", formats, append=i > 0)
+            n_rows += len(chunk)
+    else:
+        with span("read_csv") as s:
+            df = load_and_concat()
+            s.rows_out = len(df)
+        with span("clean", rows_in=len(df)) as s:
+            clean_df = clean(df)
+            s.rows_out = len(clean_df)
+        if index is not None:
+            with span("near_duplicates", rows_in=len(clean_df)) as s:
+                clean_df = apply_near_duplicates(clean_df, index, args.near_dupes)
+                s.rows_out = len(clean_df)
+        with span("write_dataset", rows_in=len(clean_df)):
+            out_paths = write_dataset(clean_df, "reviews_clean", formats)
+        n_rows = len(clean_df)
+    print(f"Saved cleaned dataset: {', '.join(map(str, out_paths))} ({n_rows} rows)")
+    if index is not None:
+        index.save()
+        print(f"Near-duplicate index holds {len(index.ids)} reviews")
 
 
 if __name__ == "__main__":
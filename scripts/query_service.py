@@ -0,0 +1,365 @@
+import argparse
+import datetime as dt
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sqlalchemy.exc import SQLAlchemyError
+
+from scripts.dataset_io import dataset_exists
+from scripts.pipeline import PUBLISHED_PATH, published_version
+from scripts.report_queries import (avg_rating_per_bank, daily_series, rating_histogram,
+                                    reviews_per_bank, sentiment_per_bank, top_themes)
+from scripts.schema import read_reviews
+
+CLEAN_NAME = "reviews_clean"
+THEMES_NAME = "reviews_themes"
+SENTIMENT_NAME = "reviews_sentiment_partial"
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 512
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# Every word, however short, so lookups for "ui" or "otp" work
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+RESULT_COLUMNS = ["review_id", "bank", "date", "rating", "sentiment_label", "sentiment_score", "themes", "review"]
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class InvertedIndex:
+    """Word -> sorted row positions of the reviews containing it."""
+
+    def __init__(self, texts: pd.Series):
+        self._vec = CountVectorizer(lowercase=True, token_pattern=TOKEN_PATTERN, binary=True, dtype=np.int8)
+        try:
+            X = self._vec.fit_transform(texts.fillna("").astype(str).tolist())
+        except ValueError:
+            # No words at all
+            X = None
+        # Transposed to (terms x docs), so each term's postings are one contiguous slice
+        self._postings = X.T.tocsr() if X is not None else None
+        if self._postings is not None:
+            self._postings.sort_indices()
+        self._analyze = self._vec.build_analyzer()
+
+    def lookup(self, query: str) -> np.ndarray:
+        """Positions of the reviews containing every word of ``query``."""
+        if self._postings is None:
+            return np.empty(0, dtype=np.int64)
+        lists = []
+        for word in set(self._analyze(query)):
+            col = self._vec.vocabulary_.get(word)
+            if col is None:
+                return np.empty(0, dtype=np.int64)
+            p = self._postings
+            lists.append(p.indices[p.indptr[col]:p.indptr[col + 1]])
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        # Intersect shortest first, so the work shrinks with every word
+        lists.sort(key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows.astype(np.int64)
+
+
+class ReviewStore:
+    """Processed reviews held in memory, newest first, with per-column arrays for filtering."""
+
+    def __init__(self, df: pd.DataFrame):
+        for col, dtype in (("sentiment_label", "category"), ("themes", "category")):
+            if col not in df.columns:
+                df = df.assign(**{col: pd.Series(pd.NA, index=df.index, dtype=dtype)})
+        if "sentiment_score" not in df.columns:
+            df = df.assign(sentiment_score=np.nan)
+        self.df = df.sort_values(["date", "review_id"], ascending=[False, True], na_position="last",
+                                 kind="stable").reset_index(drop=True)
+        self.index = InvertedIndex(self.df["review"])
+        self._dates = self.df["date"].to_numpy(dtype="datetime64[ns]")
+        self._codes = {col: self.df[col].cat.codes.to_numpy() for col in ("bank", "sentiment_label", "themes")}
+
+    @classmethod
+    def load(cls) -> "ReviewStore":
+        name = THEMES_NAME if dataset_exists(THEMES_NAME) else CLEAN_NAME
+        df = read_reviews(name)
+        if dataset_exists(SENTIMENT_NAME):
+            sent = read_reviews(SENTIMENT_NAME, columns=["review_id", "sentiment_label", "sentiment_score"])
+            df = df.merge(sent.drop_duplicates("review_id"), on="review_id", how="left")
+        return cls(df)
+
+    def _category_codes(self, col: str, match: Callable[[str], bool]) -> np.ndarray:
+        cats = self.df[col].cat.categories
+        return np.flatnonzero([match(c) for c in cats])
+
+    def search(self, bank: Optional[str] = None, start: Optional[dt.date] = None, end: Optional[dt.date] = None,
+               sentiment: Optional[str] = None, theme: Optional[str] = None, q: Optional[str] = None,
+               limit: int = DEFAULT_LIMIT, offset: int = 0) -> Dict:
+        # Start from the keyword postings when there is a query, then narrow by each filter
+        rows = self.index.lookup(q) if q else np.arange(len(self.df))
+        for col, wanted in (("bank", bank), ("sentiment_label", sentiment)):
+            if wanted is not None:
+                rows = rows[np.isin(self._codes[col][rows], self._category_codes(col, lambda c: c == wanted))]
+        if theme is not None:
+            codes = self._category_codes("themes", lambda c: theme in c.split(", "))
+            rows = rows[np.isin(self._codes["themes"][rows], codes)]
+        if start is not None or end is not None:
+            days = self._dates[rows]
+            keep = ~np.isnat(days)
+            if start is not None:
+                keep &= days >= np.datetime64(start, "ns")
+            if end is not None:
+                keep &= days < np.datetime64(end + dt.timedelta(days=1), "ns")
+            rows = rows[keep]
+
+        # Rows stay in store order (newest first) through every step above
+        page = self.df.iloc[rows[offset:offset + limit]][RESULT_COLUMNS]
+        return {"total": int(len(rows)), "offset": offset, "limit": limit, "reviews": _records(page)}
+
+
+def _records(df: pd.DataFrame) -> List[Dict]:
+    # Dates as YYYY-MM-DD; to_json turns NaN/NA into null
+    out = df.copy()
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime("%Y-%m-%d")
+        elif out[col].dtype == object:
+            out[col] = out[col].map(lambda v: v.isoformat() if isinstance(v, dt.date) else v)
+    return json.loads(out.to_json(orient="records", force_ascii=False))
+
+
+class ResultCache:
+    """LRU map from request key to serialized response body."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        body = self._items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Tuple, body: bytes) -> None:
+        self._items[key] = body
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+def _param(params: Dict[str, str], name: str, parse: Callable = str, default=None):
+    if name not in params or params[name] == "":
+        return default
+    try:
+        return parse(params[name])
+    except ValueError as e:
+        raise BadRequest(f"Invalid value for '{name}': {params[name]!r}") from e
+
+
+def _bounded_int(lo: int, hi: int) -> Callable[[str], int]:
+    def parse(value: str) -> int:
+        n = int(value)
+        if not lo <= n <= hi:
+            raise ValueError(value)
+        return n
+    return parse
+
+
+class QueryService:
+    """Answers API requests from a ``ReviewStore`` and the database rollups, caching results.
+
+    Before each request the published data version written by the pipeline is checked;
+    when it changes the cache is emptied and the reviews are reloaded on first use.
+    The lock only covers the version, cache and store reference, so searches, database
+    queries and store loads of concurrent requests run in parallel.
+    """
+
+    def __init__(self, engine=None, cache_size: int = CACHE_SIZE, published_path=PUBLISHED_PATH,
+                 store_loader: Callable[[], ReviewStore] = ReviewStore.load):
+        self.engine = engine
+        self.cache = ResultCache(cache_size)
+        self.published_path = published_path
+        self._store_loader = store_loader
+        self._store: Optional[ReviewStore] = None
+        self._version = published_version(published_path)
+        self._lock = threading.Lock()
+        # One thread builds the store; the others needing it wait here, not on _lock
+        self._load_lock = threading.Lock()
+        self._routes: Dict[str, Callable[[Dict[str, str]], Dict]] = {
+            "/health": self._health,
+            "/reviews": self._reviews,
+            "/aggregates/banks": self._banks,
+            "/aggregates/ratings": self._ratings,
+            "/aggregates/themes": self._themes,
+            "/aggregates/daily": self._daily,
+        }
+
+    def _refresh(self) -> Optional[str]:
+        version = published_version(self.published_path)
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self.cache.clear()
+                self._store = None
+            return self._version
+
+    def store(self) -> ReviewStore:
+        with self._lock:
+            store, version = self._store, self._version
+        if store is not None:
+            return store
+        with self._load_lock:
+            with self._lock:
+                if self._store is not None:
+                    return self._store
+            store = self._store_loader()
+            with self._lock:
+                # A store loaded while a newer version was published is used once, not kept
+                if self._version == version:
+                    self._store = store
+            return store
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """Status code and JSON body for ``GET path?params``."""
+        route = self._routes.get(path.rstrip("/") or "/")
+        if route is None:
+            return 404, _json({"error": f"Unknown endpoint '{path}'", "endpoints": sorted(self._routes)})
+        key = (path, tuple(sorted(params.items())))
+        version = self._refresh()
+        if route != self._health:
+            with self._lock:
+                body = self.cache.get(key)
+            if body is not None:
+                return 200, body
+        try:
+            body = _json(route(params))
+        except BadRequest as e:
+            return 400, _json({"error": str(e)})
+        except SQLAlchemyError as e:
+            return 503, _json({"error": f"Database unavailable: {e.__class__.__name__}"})
+        if route != self._health:
+            with self._lock:
+                # Results computed from data that has since been replaced are not cached
+                if self._version == version:
+                    self.cache.put(key, body)
+        return 200, body
+
+    def _health(self, params: Dict[str, str]) -> Dict:
+        return {"version": self._version, "reviews_loaded": None if self._store is None else len(self._store.df),
+                "cache": {"size": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses}}
+
+    def _reviews(self, params: Dict[str, str]) -> Dict:
+        return self.store().search(
+            bank=_param(params, "bank"),
+            start=_param(params, "start", dt.date.fromisoformat),
+            end=_param(params, "end", dt.date.fromisoformat),
+            sentiment=_param(params, "sentiment"),
+            theme=_param(params, "theme"),
+            q=_param(params, "q"),
+            limit=_param(params, "limit", _bounded_int(1, MAX_LIMIT), DEFAULT_LIMIT),
+            offset=_param(params, "offset", _bounded_int(0, 2 ** 31), 0),
+        )
+
+    def _report(self, query: Callable, params: Dict[str, str], **kwargs) -> Dict:
+        if self.engine is None:
+            raise BadRequest("No database configured for aggregate queries")
+        start = _param(params, "start", dt.date.fromisoformat)
+        end = _param(params, "end", dt.date.fromisoformat)
+        with self.engine.connect() as conn:
+            return {"rows": _records(query(conn, start=start, end=end, **kwargs))}
+
+    def _banks(self, params: Dict[str, str]) -> Dict:
+        def query(conn, start, end):
+            out = reviews_per_bank(conn, start, end)
+            for extra in (avg_rating_per_bank(conn, start, end), sentiment_per_bank(conn, start, end)):
+                out = out.merge(extra, on="bank_name", how="left")
+            return out
+        return self._report(query, params)
+
+    def _ratings(self, params: Dict[str, str]) -> Dict:
+        return self._report(rating_histogram, params)
+
+    def _themes(self, params: Dict[str, str]) -> Dict:
+        return self._report(top_themes, params, n=_param(params, "n", _bounded_int(1, 100), 5))
+
+    def _daily(self, params: Dict[str, str]) -> Dict:
+        bank = _param(params, "bank")
+        if bank is None:
+            raise BadRequest("'bank' is required")
+        return self._report(daily_series, params, bank_name=bank)
+
+
+def _json(payload: Dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def make_server(service: QueryService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            t0 = time.perf_counter()
+            status, body = service.handle(url.path, params)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Elapsed-Ms", f"{(time.perf_counter() - t0) * 1000:.2f}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve review search and aggregate reports as a local JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache_size", type=int, default=CACHE_SIZE, help="Responses kept in the LRU cache")
+    parser.add_argument("--no_db", action="store_true", help="Serve review search only, without the rollup reports")
+    args = parser.parse_args()
+
+    engine = None
+    if not args.no_db:
+        from scripts.db_init_and_load import get_engine_from_env
+        engine = get_engine_from_env()
+    service = QueryService(engine, cache_size=args.cache_size)
+    t0 = time.perf_counter()
+    n = len(service.store().df)
+    print(f"Loaded {n} reviews and built the word index in {time.perf_counter() - t0:.2f}s")
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"(/reviews, /aggregates/banks|ratings|themes|daily, /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
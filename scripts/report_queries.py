@@ -0,0 +1,99 @@
+import datetime as dt
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+# All reports read the daily rollup tables maintained by db_init_and_load, so their cost
+# depends on the number of bank-days in range, not on the number of reviews.
+
+RATINGS = range(1, 6)
+# Rollup day of reviews without a date; they count in unfiltered reports but fall in no date range
+UNDATED_DAY = dt.date(1, 1, 1)
+_RATED = " + ".join(f"s.rating_{r}" for r in RATINGS)
+_RATING_TOTAL = " + ".join(f"{r} * s.rating_{r}" for r in RATINGS)
+
+
+def _day_filter(start: Optional[dt.date], end: Optional[dt.date]) -> tuple[str, dict]:
+    clauses, params = [], {}
+    if start is not None:
+        clauses.append("s.day >= :start")
+        params["start"] = start
+    if end is not None:
+        clauses.append("s.day <= :end")
+        params["end"] = end
+    if clauses:
+        clauses.append("s.day <> :undated")
+        params["undated"] = UNDATED_DAY
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def _query(conn, sql: str, start: Optional[dt.date], end: Optional[dt.date]) -> pd.DataFrame:
+    where, params = _day_filter(start, end)
+    return pd.read_sql(text(sql.format(where=where)), conn, params=params)
+
+
+def reviews_per_bank(conn, start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    return _query(conn, """
+        SELECT b.bank_name, SUM(s.n_reviews) AS n_reviews
+        FROM daily_bank_stats s JOIN banks b ON b.bank_id = s.bank_id
+        {where}
+        GROUP BY b.bank_name ORDER BY n_reviews DESC, b.bank_name
+    """, start, end)
+
+
+def avg_rating_per_bank(conn, start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    return _query(conn, f"""
+        SELECT b.bank_name, 1.0 * SUM({_RATING_TOTAL}) / NULLIF(SUM({_RATED}), 0) AS avg_rating
+        FROM daily_bank_stats s JOIN banks b ON b.bank_id = s.bank_id
+        {{where}}
+        GROUP BY b.bank_name ORDER BY avg_rating DESC, b.bank_name
+    """, start, end)
+
+
+def rating_histogram(conn, start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    sums = ", ".join(f"SUM(s.rating_{r}) AS rating_{r}" for r in RATINGS)
+    return _query(conn, f"""
+        SELECT b.bank_name, {sums}
+        FROM daily_bank_stats s JOIN banks b ON b.bank_id = s.bank_id
+        {{where}}
+        GROUP BY b.bank_name ORDER BY b.bank_name
+    """, start, end)
+
+
+def sentiment_per_bank(conn, start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    return _query(conn, """
+        SELECT b.bank_name,
+               SUM(s.sentiment_sum) / NULLIF(SUM(s.sentiment_n), 0) AS sentiment_mean,
+               SUM(s.n_positive) AS n_positive, SUM(s.n_neutral) AS n_neutral, SUM(s.n_negative) AS n_negative
+        FROM daily_bank_stats s JOIN banks b ON b.bank_id = s.bank_id
+        {where}
+        GROUP BY b.bank_name ORDER BY sentiment_mean DESC, b.bank_name
+    """, start, end)
+
+
+def top_themes(conn, n: int = 5, start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    counts = _query(conn, """
+        SELECT b.bank_name, s.theme, SUM(s.n_reviews) AS n_reviews
+        FROM daily_theme_counts s JOIN banks b ON b.bank_id = s.bank_id
+        {where}
+        GROUP BY b.bank_name, s.theme
+    """, start, end)
+    counts = counts.sort_values(["bank_name", "n_reviews", "theme"], ascending=[True, False, True])
+    return counts.groupby("bank_name").head(n).reset_index(drop=True)
+
+
+def daily_series(conn, bank_name: str, start: Optional[dt.date] = None,
+                 end: Optional[dt.date] = None) -> pd.DataFrame:
+    """Per-day review count, mean rating and mean sentiment for one bank."""
+    where, params = _day_filter(start, end)
+    where = f"{where} AND b.bank_name = :bank" if where else "WHERE b.bank_name = :bank AND s.day <> :undated"
+    sql = f"""
+        SELECT s.day, s.n_reviews,
+               1.0 * ({_RATING_TOTAL}) / NULLIF({_RATED}, 0) AS avg_rating,
+               s.sentiment_sum / NULLIF(s.sentiment_n, 0) AS sentiment_mean
+        FROM daily_bank_stats s JOIN banks b ON b.bank_id = s.bank_id
+        {where}
+        ORDER BY s.day
+    """
+    return pd.read_sql(text(sql), conn, params={**params, "bank": bank_name, "undated": UNDATED_DAY})
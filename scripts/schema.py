@@ -0,0 +1,55 @@
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+from scripts.dataset_io import read_dataset
+
+SENTIMENT_LABELS = ["negative", "neutral", "positive"]
+
+# In-memory dtypes of the review columns. Repeated labels are categories (one small
+# integer code per row), ratings fit in a nullable int8, dates are real datetimes and
+# review text lives in Arrow string buffers instead of one Python object per row.
+REVIEW_DTYPES = {
+    "review_id": "int64",
+    "review": pd.StringDtype("pyarrow"),
+    "rating": "Int8",
+    "date": "datetime64[ns]",
+    "bank": "category",
+    "source": "category",
+    "sentiment_label": pd.CategoricalDtype(SENTIMENT_LABELS),
+    "sentiment_score": "float64",
+    "themes": "category",
+}
+
+
+def _convert(s: pd.Series, dtype) -> pd.Series:
+    if dtype == "datetime64[ns]":
+        # Parquet gives datetime.date objects, CSV gives ISO strings
+        return pd.to_datetime(s, errors="coerce", format="ISO8601").astype(dtype)
+    if dtype == "Int8":
+        return pd.to_numeric(s, errors="coerce").round().astype(dtype)
+    # Values outside a fixed category list (e.g. sentiment labels) become missing
+    return s.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the review columns present in ``df`` to ``REVIEW_DTYPES``; other columns are kept as is."""
+    out = {}
+    for col, dtype in REVIEW_DTYPES.items():
+        if col not in df.columns:
+            continue
+        current = df[col].dtype
+        # A "category" request is met by any categorical; a fixed CategoricalDtype must match exactly
+        if current == dtype or (dtype == "category" and isinstance(current, pd.CategoricalDtype)):
+            continue
+        out[col] = _convert(df[col], dtype)
+    return df.assign(**out) if out else df
+
+
+def read_reviews(
+    name: str,
+    columns: Optional[List[str]] = None,
+    banks: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """``read_dataset`` with the review columns cast to their schema dtypes."""
+    return apply_schema(read_dataset(name, columns=columns, banks=banks))
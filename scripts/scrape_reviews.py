@@ -1,17 +1,33 @@
 import argparse
 import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from pathlib import Path
+from typing import Callable, List, Dict, Optional
 
 from google_play_scraper import Sort, reviews
+# Private class, pinned through requirements.txt; saved tokens that don't match its fields are discarded
+from google_play_scraper.features.reviews import _ContinuationToken
+
+from scripts.instrument import instrumented, span
 
 BANK_APPS = {
-    
-    "Commercial Bank of Ethiopia": "com.combanketh.mobilebanking",  
-    "Bank of Abyssinia": "com.infonow.bofa",     
-    "Dashen Bank": "com.dashen.dashensuperapp"     
+
+    "Commercial Bank of Ethiopia": "com.combanketh.mobilebanking",
+    "Bank of Abyssinia": "com.infonow.bofa",
+    "Dashen Bank": "com.dashen.dashensuperapp"
 }
 
+RAW_DIR = Path("data/raw")
+CHECKPOINT_PATH = RAW_DIR / "scrape_checkpoint.json"
+WATERMARK_PATH = RAW_DIR / "scrape_watermarks.json"
+PAGE_SIZE = 200
+FIELDNAMES = ["review", "rating", "date", "bank", "source"]
+
 
 def fetch_reviews(app_id: str, lang: str = "en", country: str = "us", count: int = 500) -> List[Dict]:
     all_reviews: List[Dict] = []
@@ -32,34 +48,321 @@ def fetch_reviews(app_id: str, lang: str = "en", country: str = "us", count: int
     return all_reviews[:count]
 
 
+def _to_row(r: Dict, bank_name: str) -> Dict:
+    return {
+        "review": r.get("content", "").strip(),
+        "rating": r.get("score", None),
+        "date": r.get("at").strftime("%Y-%m-%d") if isinstance(r.get("at"), datetime) else "",
+        "bank": bank_name,
+        "source": "Google Play"
+    }
+
+
 def save_csv(rows: List[Dict], bank_name: str, output_path: str) -> None:
-    fieldnames = ["review", "rating", "date", "bank", "source"]
     with open(output_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
         for r in rows:
-            writer.writerow({
-                "review": r.get("content", "").strip(),
-                "rating": r.get("score", None),
-                "date": r.get("at").strftime("%Y-%m-%d") if isinstance(r.get("at"), datetime) else "",
-                "bank": bank_name,
-                "source": "Google Play"
-            })
+            writer.writerow(_to_row(r, bank_name))
+
+
+def append_csv(rows: List[Dict], bank_name: str, output_path: Path) -> None:
+    # Header is written only when the file is created, so pages can be appended as they arrive
+    write_header = not output_path.exists()
+    with open(output_path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if write_header:
+            writer.writeheader()
+        for r in rows:
+            writer.writerow(_to_row(r, bank_name))
+
+
+def raw_path_for(bank: str) -> Path:
+    return RAW_DIR / f"{bank.replace(' ', '_').lower()}_reviews.csv"
+
+
+def partition_path_for(bank: str, stamp: str) -> Path:
+    # Still matches the *_reviews.csv glob used by preprocessing
+    return RAW_DIR / f"{bank.replace(' ', '_').lower()}_{stamp}_reviews.csv"
+
+
+def _write_json_atomic(path: Path, payload: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _token_to_dict(token) -> Optional[Dict]:
+    if token is None:
+        return None
+    return {name: getattr(token, name) for name in _ContinuationToken.__slots__}
+
+
+def _token_from_dict(state: Optional[Dict]):
+    if not state or set(state) != set(_ContinuationToken.__slots__):
+        return None
+    return _ContinuationToken(**state)
+
+
+def load_watermarks(path: Path = WATERMARK_PATH) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _watermark_of(review: Dict) -> Dict:
+    at = review.get("at")
+    return {
+        "at": at.isoformat() if isinstance(at, datetime) else None,
+        "review_id": review.get("reviewId"),
+        # Every ingested review sharing the newest timestamp, since ties can be listed in any order
+        "ids": [review.get("reviewId")],
+    }
+
+
+def _advance(newest: Optional[Dict], batch: List[Dict]) -> Optional[Dict]:
+    for r in batch:
+        if newest is None:
+            newest = _watermark_of(r)
+        elif _watermark_of(r)["at"] == newest["at"]:
+            newest["ids"].append(r.get("reviewId"))
+    return newest
+
+
+def _until_seen(batch: List[Dict], mark: Optional[Dict]) -> tuple[List[Dict], bool]:
+    # With Sort.NEWEST everything from the last ingested review onwards is already on disk
+    if not mark:
+        return batch, False
+    mark_at = datetime.fromisoformat(mark["at"]) if mark.get("at") else None
+    tied = set(mark.get("ids") or [mark.get("review_id")])
+    kept = []
+    for r in batch:
+        at = r.get("at")
+        if r.get("reviewId") == mark.get("review_id"):
+            return kept, True
+        if mark_at is not None and isinstance(at, datetime) and at < mark_at:
+            return kept, True
+        if not (at == mark_at and r.get("reviewId") in tied):
+            kept.append(r)
+    return kept, False
+
+
+def discard_partitions(apps: Dict[str, Dict]) -> None:
+    # Raw partitions of an abandoned incremental run; preprocessing would otherwise load them forever
+    for state in apps.values():
+        if state.get("partition") and state.get("output"):
+            Path(state["output"]).unlink(missing_ok=True)
+
 
+def discard_checkpoint(path: Path = CHECKPOINT_PATH) -> None:
+    """Forget an interrupted run, removing the incremental partitions it was writing."""
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            discard_partitions(json.load(f).get("apps", {}))
+        path.unlink()
 
+
+class ScrapeCheckpoint:
+    """Per-app scrape progress (continuation token, pages, rows) shared by all workers."""
+
+    def __init__(self, path: Path, params: Dict):
+        self.path = path
+        self.params = params
+        self._lock = threading.Lock()
+        self._apps: Dict[str, Dict] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            # Progress recorded under different run settings cannot be resumed
+            if saved.get("params") == params:
+                self._apps = saved.get("apps", {})
+            else:
+                discard_partitions(saved.get("apps", {}))
+
+    def get(self, app_id: str) -> Dict:
+        with self._lock:
+            return dict(self._apps.get(app_id, {}))
+
+    def update(self, app_id: str, **fields) -> None:
+        with self._lock:
+            self._apps.setdefault(app_id, {}).update(fields)
+            _write_json_atomic(self.path, {"params": self.params, "apps": self._apps})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._apps = {}
+            if self.path.exists():
+                self.path.unlink()
+
+
+class RateLimiter:
+    def __init__(self, min_interval: float = 0.0):
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    def wait(self) -> None:
+        delay = self._last + self.min_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._last = time.monotonic()
+
+
+def scrape_app(
+    bank: str,
+    app_id: str,
+    checkpoint: ScrapeCheckpoint,
+    lang: str = "en",
+    country: str = "us",
+    count: int = 500,
+    min_interval: float = 0.0,
+    fetch: Callable = reviews,
+    since: Optional[Dict] = None,
+    output_path: Optional[Path] = None,
+) -> int:
+    state = checkpoint.get(app_id)
+    fetched = state.get("fetched", 0)
+    if state.get("done"):
+        return fetched
+
+    partition = state.get("partition", output_path is not None)
+    output_path = Path(state.get("output") or output_path or raw_path_for(bank))
+    if "output" not in state:
+        # Recorded before anything is written, so a crash never leaves an untracked partition
+        checkpoint.update(app_id, bank=bank, output=str(output_path), partition=partition)
+    token = _token_from_dict(state.get("token"))
+    if fetched and token is None:
+        # A cursor saved by another google_play_scraper version cannot be resumed
+        fetched = 0
+    if fetched == 0 and output_path.exists():
+        # Fresh start for this app: drop whatever a previous full run left behind
+        output_path.unlink()
+    elif output_path.exists() and output_path.stat().st_size > state.get("size", 0):
+        # Rows appended after the last checkpoint are fetched again below
+        with open(output_path, "r+b") as f:
+            f.truncate(state.get("size", 0))
+    pages = state.get("pages", 0) if fetched else 0
+    newest = state.get("newest") if fetched else None
+    limiter = RateLimiter(min_interval)
+    # Catching up from a watermark pages until it is reached, however many reviews arrived meanwhile
+    limit = None if since else count
+
+    while limit is None or fetched < limit:
+        limiter.wait()
+        batch, token = fetch(
+            app_id,
+            lang=lang,
+            country=country,
+            sort=Sort.NEWEST,
+            count=PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - fetched),
+            continuation_token=token,
+        )
+        raw_batch = bool(batch)
+        batch, reached_seen = _until_seen(batch, since)
+        if limit is not None:
+            batch = batch[: limit - fetched]
+        newest = _advance(newest, batch)
+        if batch:
+            append_csv(batch, bank, output_path)
+        fetched += len(batch)
+        pages += 1
+        exhausted = reached_seen or not raw_batch or getattr(token, "token", None) is None
+        checkpoint.update(
+            app_id,
+            bank=bank,
+            output=str(output_path),
+            token=_token_to_dict(token),
+            pages=pages,
+            fetched=fetched,
+            size=output_path.stat().st_size if output_path.exists() else 0,
+            newest=newest,
+            done=exhausted or (limit is not None and fetched >= limit),
+        )
+        if exhausted:
+            break
+    return fetched
+
+
+def scrape_all(
+    apps: Dict[str, str],
+    lang: str = "en",
+    country: str = "us",
+    count: int = 500,
+    workers: int = 4,
+    min_interval: float = 0.0,
+    checkpoint_path: Path = CHECKPOINT_PATH,
+    fetch: Callable = reviews,
+    incremental: bool = False,
+    watermark_path: Path = WATERMARK_PATH,
+) -> Dict[str, int]:
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    params = {"lang": lang, "country": country, "count": count, "incremental": incremental}
+    checkpoint = ScrapeCheckpoint(checkpoint_path, params)
+    watermarks = load_watermarks(watermark_path)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            bank: pool.submit(
+                scrape_app, bank, app_id, checkpoint,
+                lang=lang, country=country, count=count, min_interval=min_interval, fetch=fetch,
+                since=watermarks.get(app_id) if incremental else None,
+                output_path=partition_path_for(bank, stamp) if incremental else None,
+            )
+            for bank, app_id in apps.items()
+        }
+        # Any failure propagates here and leaves the checkpoint in place for the next run
+        results = {bank: fut.result() for bank, fut in futures.items()}
+
+    # Advance high-water marks only once every app has completed
+    for app_id in apps.values():
+        newest = checkpoint.get(app_id).get("newest")
+        if newest:
+            old = watermarks.get(app_id)
+            if incremental and old and old.get("at") == newest["at"]:
+                newest["ids"] = sorted(set(newest["ids"]) | set(old.get("ids") or [old.get("review_id")]))
+            watermarks[app_id] = newest
+    _write_json_atomic(watermark_path, watermarks)
+    checkpoint.clear()
+    return results
+
+
+@instrumented("scrape")
 def main():
     parser = argparse.ArgumentParser(description="Scrape Google Play reviews for Ethiopian bank apps.")
-    parser.add_argument("--per_bank", type=int, default=500, help="Number of reviews per bank to fetch")
+    parser.add_argument("--per_bank", type=int, default=500, help="Number of reviews per bank to fetch (--incremental ignores it once a watermark exists)")
     parser.add_argument("--lang", type=str, default="en", help="Language code")
     parser.add_argument("--country", type=str, default="us", help="Country code")
+    parser.add_argument("--workers", type=int, default=4, help="Number of apps scraped concurrently")
+    parser.add_argument("--min_interval", type=float, default=0.5,
+                        help="Minimum seconds between page requests for the same app")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch reviews newer than the last run and append them as a new raw partition")
+    parser.add_argument("--fresh", action="store_true", help="Discard any checkpoint left by an interrupted run, with the partitions it was writing")
     args = parser.parse_args()
 
-    for bank, app_id in BANK_APPS.items():
-        print(f"Fetching reviews for {bank} ({app_id})...")
-        rows = fetch_reviews(app_id, lang=args.lang, country=args.country, count=args.per_bank)
-        output_path = f"data/raw/{bank.replace(' ', '_').lower()}_reviews.csv"
-        save_csv(rows, bank, output_path)
-        print(f"Saved {len(rows)} reviews to {output_path}")
+    if args.fresh:
+        discard_checkpoint(CHECKPOINT_PATH)
+
+    print(f"Fetching reviews for {len(BANK_APPS)} apps with {args.workers} workers...")
+    with span("scrape_all") as s:
+        counts = scrape_all(
+            BANK_APPS,
+            lang=args.lang,
+            country=args.country,
+            count=args.per_bank,
+            workers=args.workers,
+            min_interval=args.min_interval,
+            incremental=args.incremental,
+        )
+        s.rows_out = sum(counts.values())
+    for bank, n in counts.items():
+        if args.incremental:
+            print(f"Fetched {n} new reviews for {bank}")
+        else:
+            print(f"Saved {n} reviews to {raw_path_for(bank)}")
 
 
 if __name__ == "__main__":
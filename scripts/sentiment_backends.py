@@ -0,0 +1,148 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+
+@dataclass
+class Throughput:
+    backend: str
+    texts: int = 0
+    seconds: float = 0.0
+
+    def add(self, texts: int, seconds: float) -> None:
+        self.texts += texts
+        self.seconds += seconds
+
+    @property
+    def rate(self) -> float:
+        return self.texts / self.seconds if self.seconds > 0 else 0.0
+
+
+class SentimentBackend:
+    """Scores lists of texts with a compound score in [-1, 1].
+
+    Subclasses implement ``score_batch``; ``score`` sorts inputs by length and feeds
+    batches of at most ``max_batch_size`` similar-length texts, which keeps padding
+    waste low for models that pad to the longest text in a batch.
+    """
+
+    name = "base"
+    default_batch_size = 256
+    # Whether runs of whitespace can be collapsed before caching a text's score
+    whitespace_insensitive = False
+
+    def __init__(self, max_batch_size: Optional[int] = None):
+        self.max_batch_size = max_batch_size or self.default_batch_size
+        self.throughput = Throughput(self.name)
+
+    def score_batch(self, texts: List[str]) -> Sequence[float]:
+        raise NotImplementedError
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        scores = np.empty(len(texts), dtype="float64")
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        for start in range(0, len(order), self.max_batch_size):
+            idx = order[start:start + self.max_batch_size]
+            t0 = time.perf_counter()
+            scores[idx] = self.score_batch([texts[i] for i in idx])
+            self.throughput.add(len(idx), time.perf_counter() - t0)
+        return scores
+
+
+class VaderBackend(SentimentBackend):
+    name = "vader"
+    default_batch_size = 2000
+    # VADER splits on whitespace, so the score never depends on how much of it there is
+    whitespace_insensitive = True
+
+    def __init__(self, max_batch_size: Optional[int] = None):
+        super().__init__(max_batch_size)
+        self._analyzer = SentimentIntensityAnalyzer()
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        return [self._analyzer.polarity_scores(t)["compound"] for t in texts]
+
+
+class SklearnBackend(SentimentBackend):
+    """A pickled scikit-learn text pipeline exposing ``predict_proba`` (e.g. TF-IDF + LogisticRegression).
+
+    The compound score is P(positive) - P(negative).
+    """
+
+    name = "sklearn"
+    default_batch_size = 4096
+
+    def __init__(self, model_path: str, max_batch_size: Optional[int] = None,
+                 positive_label="positive", negative_label="negative"):
+        import joblib
+
+        super().__init__(max_batch_size)
+        self._model = joblib.load(model_path)
+        classes = list(self._model.classes_)
+        self._pos = classes.index(positive_label)
+        self._neg = classes.index(negative_label)
+
+    def score_batch(self, texts: List[str]) -> np.ndarray:
+        proba = self._model.predict_proba(texts)
+        return proba[:, self._pos] - proba[:, self._neg]
+
+
+class TransformersBackend(SentimentBackend):
+    """A locally stored Hugging Face sequence-classification model, run on CPU.
+
+    The compound score is P(positive) - P(negative); a neutral class, if any, contributes 0.
+    Classes are read from the model's ``id2label``: named ones (positive/neutral/negative)
+    directly, generic ``LABEL_i`` ones by the usual 2-class (neg, pos) or 3-class
+    (neg, neu, pos) order. Anything else needs ``label_map`` ({label: weight}).
+    """
+
+    name = "transformers"
+    default_batch_size = 32
+    NAMED_WEIGHTS = {"positive": 1.0, "pos": 1.0, "neutral": 0.0, "neu": 0.0, "negative": -1.0, "neg": -1.0}
+    GENERIC_WEIGHTS = {2: (-1.0, 1.0), 3: (-1.0, 0.0, 1.0)}
+
+    def __init__(self, model_path: str, max_batch_size: Optional[int] = None, max_length: int = 256,
+                 label_map: Optional[Dict[str, float]] = None):
+        try:
+            from transformers import pipeline
+        except ImportError as e:
+            raise ImportError("The transformers backend needs `pip install transformers torch`") from e
+
+        super().__init__(max_batch_size)
+        self._pipe = pipeline("text-classification", model=model_path, tokenizer=model_path, device=-1,
+                              top_k=None, truncation=True, max_length=max_length)
+        self._weights = self.label_weights(self._pipe.model.config.id2label, label_map)
+
+    @classmethod
+    def label_weights(cls, id2label: Dict[int, str], label_map: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        if label_map:
+            return {str(k).lower(): float(v) for k, v in label_map.items()}
+        labels = [id2label[i].lower() for i in sorted(id2label)]
+        if all(label in cls.NAMED_WEIGHTS for label in labels):
+            return {label: cls.NAMED_WEIGHTS[label] for label in labels}
+        if labels == [f"label_{i}" for i in range(len(labels))] and len(labels) in cls.GENERIC_WEIGHTS:
+            return dict(zip(labels, cls.GENERIC_WEIGHTS[len(labels)]))
+        raise ValueError(f"Cannot tell which of the model's labels {labels} are positive or negative; "
+                         "pass label_map, e.g. {\"LABEL_0\": -1, \"LABEL_2\": 1}")
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        out = []
+        for labels in self._pipe(texts, batch_size=len(texts)):
+            out.append(sum(self._weights.get(d["label"].lower(), 0.0) * d["score"] for d in labels))
+        return out
+
+
+BACKENDS: Dict[str, type] = {
+    VaderBackend.name: VaderBackend,
+    SklearnBackend.name: SklearnBackend,
+    TransformersBackend.name: TransformersBackend,
+}
+
+
+def get_backend(name: str = "vader", **options) -> SentimentBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sentiment backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scripts.sentiment_backends import BACKENDS, SentimentBackend, Throughput, get_backend
+
+CACHE_DIR = Path("data/cache")
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+_BACKEND: Optional[SentimentBackend] = None
+_BACKEND_KEY: Optional[str] = None
+
+
+def normalize_text(text: str) -> str:
+    # VADER tokenizes on whitespace, so collapsing it never changes a VADER score
+    return " ".join(text.split())
+
+
+def text_key(text: str, normalize: bool = True) -> str:
+    if normalize:
+        text = normalize_text(text)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def model_fingerprint(path: str) -> List[List]:
+    """Size and mtime of the model file, or of every file under a model directory."""
+    root = Path(path)
+    files = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+    return [[str(p.relative_to(root)) if root.is_dir() else p.name, p.stat().st_size, p.stat().st_mtime_ns]
+            for p in files if p.exists()]
+
+
+def label_scores(scores) -> np.ndarray:
+    """Vectorized ``label_from_score`` over an array of compound scores."""
+    scores = np.asarray(scores, dtype="float64")
+    return np.select(
+        [scores >= POSITIVE_THRESHOLD, scores <= NEGATIVE_THRESHOLD],
+        ["positive", "negative"],
+        default="neutral",
+    )
+
+
+def cache_path(backend: str = "vader", options: Optional[Dict] = None) -> Path:
+    # Scores from different models (or model files) must never share a cache, and a model
+    # retrained into the same path is a different model
+    if not options:
+        return CACHE_DIR / f"sentiment_{backend}.parquet"
+    keyed = dict(options)
+    if "model_path" in keyed:
+        keyed["model_files"] = model_fingerprint(keyed["model_path"])
+    tag = hashlib.blake2b(json.dumps(keyed, sort_keys=True).encode("utf-8"), digest_size=4).hexdigest()
+    return CACHE_DIR / f"sentiment_{backend}_{tag}.parquet"
+
+
+class ScoreCache:
+    """Persistent map from normalized-text hash to compound score."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._scores: Dict[str, float] = {}
+        self._dirty = False
+        if path.exists():
+            saved = pd.read_parquet(path)
+            self._scores = dict(zip(saved["key"], saved["score"]))
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, key: str) -> Optional[float]:
+        return self._scores.get(key)
+
+    def update(self, keys: List[str], scores) -> None:
+        self._scores.update(zip(keys, map(float, scores)))
+        self._dirty = self._dirty or len(keys) > 0
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        pd.DataFrame({"key": list(self._scores), "score": list(self._scores.values())}).to_parquet(tmp, index=False)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def _backend_key(backend: str, options: Dict) -> str:
+    return json.dumps([backend, options], sort_keys=True)
+
+
+def _init_worker(backend: str, options: Dict) -> None:
+    # One model instance per process, reused for every chunk it scores
+    global _BACKEND, _BACKEND_KEY
+    _BACKEND = get_backend(backend, **options)
+    _BACKEND_KEY = _backend_key(backend, options)
+
+
+def _score_chunk(args: Tuple[str, Dict, List[str]]) -> Tuple[np.ndarray, float]:
+    backend, options, texts = args
+    if _BACKEND_KEY != _backend_key(backend, options):
+        _init_worker(backend, options)
+    t0 = time.perf_counter()
+    scores = _BACKEND.score(texts)
+    return scores, time.perf_counter() - t0
+
+
+def score_texts(
+    texts: List[str],
+    workers: int = 1,
+    chunksize: int = 2000,
+    backend: str = "vader",
+    options: Optional[Dict] = None,
+    throughput: Optional[Throughput] = None,
+) -> np.ndarray:
+    """Compound scores for ``texts``, sharded across ``workers`` processes in ``chunksize`` batches.
+
+    Texts are ordered by length before sharding so each chunk, and each model batch
+    within it, holds texts of similar length.
+    """
+    options = options or {}
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    chunks = [
+        (backend, options, [texts[i] for i in order[start:start + chunksize]])
+        for start in range(0, len(texts), chunksize)
+    ]
+    if workers <= 1 or len(chunks) <= 1:
+        results = [_score_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend, options)) as pool:
+            results = list(pool.map(_score_chunk, chunks))
+
+    scores = np.empty(len(texts), dtype="float64")
+    if results:
+        scores[order] = np.concatenate([r[0] for r in results])
+    if throughput is not None:
+        throughput.add(len(texts), sum(r[1] for r in results))
+    return scores
+
+
+def score_reviews(
+    reviews: pd.Series,
+    workers: int = 1,
+    chunksize: int = 2000,
+    cache: Optional[ScoreCache] = None,
+    backend: str = "vader",
+    options: Optional[Dict] = None,
+    throughput: Optional[Throughput] = None,
+) -> np.ndarray:
+    """Score a review column, only running the model on texts not seen before.
+
+    Texts are deduplicated by text hash within the run and against ``cache``; the cache
+    is updated with every newly scored text. Whitespace is collapsed before hashing only
+    for backends whose scores cannot depend on it.
+    """
+    texts = reviews.fillna("").astype(str).tolist()
+    normalize = BACKENDS[backend].whitespace_insensitive
+    keys = [text_key(t, normalize) for t in texts]
+
+    known: Dict[str, float] = {}
+    todo: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key in known or key in todo:
+            continue
+        hit = cache.get(key) if cache is not None else None
+        if hit is None:
+            todo[key] = text
+        else:
+            known[key] = hit
+
+    if todo:
+        fresh = score_texts(list(todo.values()), workers=workers, chunksize=chunksize,
+                            backend=backend, options=options, throughput=throughput)
+        known.update(zip(todo.keys(), fresh.tolist()))
+        if cache is not None:
+            cache.update(list(todo.keys()), fresh)
+            cache.save()
+    return np.fromiter((known[k] for k in keys), dtype="float64", count=len(keys))
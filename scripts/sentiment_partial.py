@@ -1,9 +1,17 @@
+import argparse
+import json
+import os
+
 import pandas as pd
-from pathlib import Path
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-INPUT_PATH = Path("data/processed/reviews_clean.csv")
-OUTPUT_PATH = Path("data/processed/reviews_sentiment_partial.csv")
+from scripts.dataset_io import dataset_exists, formats_from_arg, write_dataset
+from scripts.instrument import instrumented, span
+from scripts.schema import REVIEW_DTYPES, read_reviews
+from scripts.sentiment_backends import BACKENDS, Throughput
+from scripts.sentiment_engine import ScoreCache, cache_path, label_scores, score_reviews
+
+INPUT_NAME = "reviews_clean"
+OUTPUT_NAME = "reviews_sentiment_partial"
 
 
 def label_from_score(compound: float) -> str:
@@ -15,18 +23,52 @@ def label_from_score(compound: float) -> str:
         return "neutral"
 
 
+@instrumented("sentiment")
 def main():
-    if not INPUT_PATH.exists():
-        raise FileNotFoundError(f"Expected cleaned reviews at {INPUT_PATH}")
-    df = pd.read_csv(INPUT_PATH)
-    analyzer = SentimentIntensityAnalyzer()
+    parser = argparse.ArgumentParser(description="Score review sentiment (VADER by default).")
+    parser.add_argument("--format", choices=["parquet", "csv", "both"], default="parquet",
+                        help="Output format of the sentiment dataset")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes used to score reviews")
+    parser.add_argument("--chunksize", type=int, default=2000, help="Reviews per scoring task")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="vader", help="Sentiment model backend")
+    parser.add_argument("--model_path", type=str, default=None,
+                        help="Local model file/directory for the sklearn and transformers backends")
+    parser.add_argument("--label_map", type=json.loads, default=None,
+                        help='Class weights for the transformers backend, e.g. \'{"LABEL_0": -1, "LABEL_2": 1}\'')
+    parser.add_argument("--batch_size", type=int, default=None,
+                        help="Max texts per model call (defaults to the backend's own setting)")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="Score every review instead of reusing cached scores")
+    args = parser.parse_args()
+
+    if not dataset_exists(INPUT_NAME):
+        raise FileNotFoundError(f"Expected cleaned reviews dataset '{INPUT_NAME}'")
+    with span("read_dataset") as s:
+        df = read_reviews(INPUT_NAME)
+        s.rows_out = len(df)
+    options = {"model_path": args.model_path} if args.model_path else {}
+    if args.label_map:
+        options["label_map"] = args.label_map
+    cache = None if args.no_cache else ScoreCache(cache_path(args.backend, options))
+    if args.batch_size:
+        options["max_batch_size"] = args.batch_size
+    throughput = Throughput(args.backend)
 
-    scores = df["review"].fillna("").astype(str).apply(analyzer.polarity_scores)
-    df["sentiment_score"] = scores.apply(lambda s: s["compound"])  # -1..1
-    df["sentiment_label"] = df["sentiment_score"].apply(label_from_score)
+    with span("polarity_scores", rows_in=len(df)) as s:
+        df["sentiment_score"] = score_reviews(df["review"], workers=args.workers, chunksize=args.chunksize,
+                                              cache=cache, backend=args.backend, options=options,
+                                              throughput=throughput)  # -1..1
+        df["sentiment_label"] = pd.Categorical(label_scores(df["sentiment_score"]),
+                                               dtype=REVIEW_DTYPES["sentiment_label"])
+        s.rows_out = throughput.texts
+    if throughput.texts:
+        print(f"Scored {throughput.texts} new texts with {args.backend} "
+              f"at {throughput.rate:.0f} texts/s per worker")
 
-    df.to_csv(OUTPUT_PATH, index=False)
-    print(f"Saved partial sentiment results: {OUTPUT_PATH} ({len(df)} rows)")
+    with span("write_dataset", rows_in=len(df)):
+        out_paths = write_dataset(df, OUTPUT_NAME, formats_from_arg(args.format))
+    print(f"Saved partial sentiment results: {', '.join(map(str, out_paths))} ({len(df)} rows)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,321 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from scripts.dataset_io import dataset_exists
+from scripts.emoji_analysis import emoji_table
+from scripts.instrument import instrumented, span
+from scripts.schema import read_reviews
+from scripts.sentiment_engine import NEGATIVE_THRESHOLD
+
+CLEAN_NAME = "reviews_clean"
+SENTIMENT_NAME = "reviews_sentiment_partial"
+THEMES_NAME = "reviews_themes"
+STATE_DIR = Path("data/cache/trends")
+DAILY_OUT = Path("data/processed/trends_daily.csv")
+THEME_OUT = Path("data/processed/theme_trends.csv")
+EMOJI_OUT = Path("data/processed/emoji_trends.csv")
+
+WINDOWS = (7, 30)
+# A day is a negative spike when its negative count sits this many binomial standard
+# deviations above the bank's rate over the previous BASELINE_DAYS
+SPIKE_Z = 3.0
+SPIKE_MIN_REVIEWS = 5
+BASELINE_DAYS = 30
+# Fewer scored reviews in the baseline window give no reliable rate to compare against
+BASELINE_MIN_REVIEWS = 20
+TOP_EMOJIS = 10
+
+# Per (bank, day) sums; every signal keeps its own denominator because sentiment and
+# themes can arrive in later runs than the review itself
+DAILY_COLUMNS = ["n_reviews", "rating_sum", "rating_n", "sentiment_sum", "sentiment_n", "n_negative", "n_themed"]
+SIGNALS = ("reviews", "sentiment", "themes")
+# What each review contributed, per signal, so it can be taken back out
+LEDGER_COLUMNS = {
+    "reviews": ["review_id", "bank", "day", "rating"],
+    "emojis": ["review_id", "emoji"],
+    "sentiment": ["review_id", "sentiment_score"],
+    "themes": ["review_id", "themes"],
+}
+STATE_FORMAT = 2
+
+
+def _empty_counts(key: str) -> pd.Series:
+    index = pd.MultiIndex.from_arrays([pd.Series([], dtype=object), pd.Series([], dtype="datetime64[ns]"),
+                                       pd.Series([], dtype=object)], names=["bank", "day", key])
+    return pd.Series([], index=index, dtype=np.int64, name="n")
+
+
+def _empty_ledger(name: str) -> pd.DataFrame:
+    dtypes = {"review_id": np.int64, "bank": object, "day": "datetime64[ns]", "rating": np.float64,
+              "emoji": object, "sentiment_score": np.float64, "themes": object}
+    return pd.DataFrame({c: pd.Series([], dtype=dtypes[c]) for c in LEDGER_COLUMNS[name]})
+
+
+def _changed(old: pd.Series, current: pd.Series) -> tuple[pd.Index, pd.Index]:
+    # Ids whose old value has to be subtracted and ids whose current value has to be added
+    both = old.index.intersection(current.index)
+    same = both[old.loc[both].to_numpy() == current.loc[both].to_numpy()]
+    return old.index.difference(same), current.index.difference(same)
+
+
+class TrendState:
+    """Per-bank daily sums of review counts, ratings, sentiment, themes and emojis.
+
+    Next to the sums it keeps a ledger of what every review contributed to each signal.
+    ``update`` compares the current corpus with the ledgers and only aggregates the
+    difference: new reviews are added, removed ones subtracted, and reviews whose
+    sentiment score or themes changed (another backend, new theme rules) are
+    subtracted and added again. Comparing still reads every current review, but the
+    sums are only touched for the changed ones.
+    """
+
+    def __init__(self, daily: Optional[pd.DataFrame] = None, themes: Optional[pd.Series] = None,
+                 emojis: Optional[pd.Series] = None, ledgers: Optional[Dict[str, pd.DataFrame]] = None):
+        if daily is None:
+            index = pd.MultiIndex.from_arrays([pd.Series([], dtype=object), pd.Series([], dtype="datetime64[ns]")],
+                                              names=["bank", "day"])
+            daily = pd.DataFrame(0.0, index=index, columns=DAILY_COLUMNS)
+        self.daily = daily
+        self.themes = themes if themes is not None else _empty_counts("theme")
+        self.emojis = emojis if emojis is not None else _empty_counts("emoji")
+        self.ledgers = {name: (ledgers or {}).get(name, _empty_ledger(name)) for name in LEDGER_COLUMNS}
+
+    @classmethod
+    def load(cls, path: Path = STATE_DIR) -> "TrendState":
+        if not (path / "meta.json").exists():
+            return cls()
+        with open(path / "meta.json", encoding="utf-8") as f:
+            if json.load(f).get("format") != STATE_FORMAT:
+                # Written before ledgers existed: its counts cannot be revised, so start over
+                return cls()
+        return cls(
+            daily=pd.read_parquet(path / "daily.parquet").set_index(["bank", "day"]),
+            themes=pd.read_parquet(path / "themes.parquet").set_index(["bank", "day", "theme"])["n"],
+            emojis=pd.read_parquet(path / "emojis.parquet").set_index(["bank", "day", "emoji"])["n"],
+            ledgers={name: pd.read_parquet(path / f"ledger_{name}.parquet") for name in LEDGER_COLUMNS},
+        )
+
+    def save(self, path: Path = STATE_DIR) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        self.daily.reset_index().to_parquet(path / "daily.parquet", index=False)
+        self.themes.reset_index().to_parquet(path / "themes.parquet", index=False)
+        self.emojis.reset_index().to_parquet(path / "emojis.parquet", index=False)
+        for name, ledger in self.ledgers.items():
+            ledger.to_parquet(path / f"ledger_{name}.parquet", index=False)
+        # meta.json last: a state is only picked up once all of its files are written
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"format": STATE_FORMAT, "bank_days": len(self.daily),
+                       "reviews": len(self.ledgers["reviews"])}, f)
+
+    def update(self, reviews: pd.DataFrame) -> Dict[str, int]:
+        """Bring the state in line with ``reviews``, the full current corpus (``review_id``,
+        ``bank``, ``date``, ``rating``, ``review`` and optionally ``sentiment_score`` and
+        ``themes``). Without a sentiment or themes column, that signal keeps its counts for
+        the reviews still present. Returns the reviews added, revised or removed per signal.
+        """
+        df = reviews[reviews["bank"].notna() & reviews["date"].notna()].drop_duplicates("review_id")
+        df = df.assign(bank=df["bank"].astype(str), day=pd.to_datetime(df["date"]).dt.normalize())
+        df = df.set_index(df["review_id"].to_numpy(dtype=np.int64))
+        old = self.ledgers["reviews"].set_index("review_id")
+        removed, new = old.index.difference(df.index), df.index.difference(old.index)
+        # Bank and day are part of what the content-derived review_id hashes, so either side can supply them
+        where = pd.concat([old[["bank", "day"]], df.loc[new, ["bank", "day"]]])
+        daily_parts, theme_parts, emoji_parts, changed = [], [], [], {}
+
+        def signed(rows: pd.DataFrame, sign: float, **columns) -> pd.DataFrame:
+            return pd.DataFrame({"bank": where.loc[rows.index, "bank"], "day": where.loc[rows.index, "day"],
+                                 **{c: sign * v for c, v in columns.items()}})
+
+        plus = df.loc[new].assign(rating=pd.to_numeric(df.loc[new, "rating"], errors="coerce").astype("float64"))
+        for rows, sign in ((old.loc[removed], -1.0), (plus, 1.0)):
+            daily_parts.append(signed(rows, sign, n_reviews=1.0, rating_sum=rows["rating"].fillna(0.0),
+                                      rating_n=rows["rating"].notna().astype(float)))
+        emojis = self.ledgers["emojis"]
+        found = emoji_table(plus.reset_index(drop=True)[["review_id", "review", "bank"]]) if "review" in df else None
+        gone = emojis[emojis["review_id"].isin(removed)]
+        for rows, sign in ((gone, -1), (found, 1)):
+            if rows is not None and len(rows):
+                keyed = rows.assign(day=where.loc[rows["review_id"], "day"].to_numpy(),
+                                    bank=where.loc[rows["review_id"], "bank"].to_numpy())
+                emoji_parts.append(sign * keyed.groupby(["bank", "day", "emoji"]).size())
+        kept = emojis[~emojis["review_id"].isin(removed)]
+        self.ledgers["emojis"] = kept if found is None else pd.concat([kept, found[["review_id", "emoji"]]],
+                                                                      ignore_index=True)
+        self.ledgers["reviews"] = pd.concat([old.drop(removed), plus[["bank", "day", "rating"]]]).rename_axis(
+            "review_id").reset_index()
+        changed["reviews"] = len(removed) + len(new)
+
+        for signal, col in (("sentiment", "sentiment_score"), ("themes", "themes")):
+            before = self.ledgers[signal].set_index("review_id")[col]
+            if col in df.columns:
+                current = df[col].dropna()
+                current = current.astype("float64") if signal == "sentiment" else current.astype(str)
+            else:
+                current = before.drop(removed, errors="ignore")
+            drop, add = _changed(before, current)
+            for values, sign in ((before.loc[drop], -1.0), (current.loc[add], 1.0)):
+                rows = values.to_frame()
+                if signal == "sentiment":
+                    daily_parts.append(signed(rows, sign, sentiment_sum=values, sentiment_n=1.0,
+                                              n_negative=(values <= NEGATIVE_THRESHOLD).astype(float)))
+                else:
+                    daily_parts.append(signed(rows, sign, n_themed=1.0))
+                    tags = signed(rows, 1.0).assign(theme=values.str.split(", ")).explode("theme")
+                    theme_parts.append(int(sign) * tags.groupby(["bank", "day", "theme"]).size())
+            self.ledgers[signal] = current.rename_axis("review_id").reset_index()
+            changed[signal] = len(drop.union(add))
+
+        delta = pd.concat(daily_parts, ignore_index=True).groupby(["bank", "day"]).sum()
+        delta = delta.reindex(columns=DAILY_COLUMNS, fill_value=0.0).fillna(0.0)
+        daily = self.daily.add(delta, fill_value=0.0).sort_index()
+        # Every signal of a bank-day needs one of its reviews, so no reviews means nothing left
+        self.daily = daily[daily["n_reviews"] > 0]
+        self.themes = _add_counts(self.themes, theme_parts)
+        self.emojis = _add_counts(self.emojis, emoji_parts)
+        return changed
+
+
+def _add_counts(counts: pd.Series, deltas) -> pd.Series:
+    deltas = [d for d in deltas if len(d)]
+    if not deltas:
+        return counts
+    delta = pd.concat(deltas).groupby(level=[0, 1, 2]).sum().rename("n")
+    out = counts.add(delta, fill_value=0).astype(np.int64).rename("n").sort_index()
+    return out[out > 0]
+
+
+def _calendar(frame: pd.DataFrame) -> pd.DataFrame:
+    if frame.empty:
+        return frame
+    # Days without reviews count as zeros, so rolling windows span calendar days
+    return frame.reindex(pd.date_range(frame.index.min(), frame.index.max(), freq="D", name="day"), fill_value=0)
+
+
+def _ratio(num: pd.Series, den: pd.Series) -> pd.Series:
+    return num / den.where(den > 0)
+
+
+def _bank_trends(sub: pd.DataFrame, windows: Sequence[int], spike_z: float, min_reviews: int) -> pd.DataFrame:
+    sub = _calendar(sub)
+    out = pd.DataFrame(index=sub.index)
+    for w in (1, *windows):
+        s = sub if w == 1 else sub.rolling(w, min_periods=1).sum()
+        suffix = "" if w == 1 else f"_{w}d"
+        out[f"n_reviews{suffix}"] = s["n_reviews"].astype(np.int64)
+        out[f"avg_rating{suffix}"] = _ratio(s["rating_sum"], s["rating_n"])
+        out[f"sentiment_mean{suffix}"] = _ratio(s["sentiment_sum"], s["sentiment_n"])
+        out[f"negative_share{suffix}"] = _ratio(s["n_negative"], s["sentiment_n"])
+    if 7 in windows:
+        # Week over week: this 7-day window against the one before it
+        out["sentiment_mean_7d_wow"] = out["sentiment_mean_7d"].diff(7)
+        out["negative_share_7d_wow"] = out["negative_share_7d"].diff(7)
+
+    # Binomial z-score of the day's negatives against the rate of the preceding days
+    base = sub[["n_negative", "sentiment_n"]].rolling(BASELINE_DAYS, min_periods=1).sum().shift(1)
+    p = _ratio(base["n_negative"], base["sentiment_n"].where(base["sentiment_n"] >= BASELINE_MIN_REVIEWS))
+    p = p.clip(0.02, 0.98)
+    n = sub["sentiment_n"]
+    out["negative_z"] = (sub["n_negative"] - n * p) / np.sqrt(n * p * (1 - p)).where(n > 0)
+    out["negative_spike"] = (n >= min_reviews) & (out["negative_z"] >= spike_z)
+    return out
+
+
+def daily_trends(daily: pd.DataFrame, windows: Sequence[int] = WINDOWS, spike_z: float = SPIKE_Z,
+                 min_reviews: int = SPIKE_MIN_REVIEWS) -> pd.DataFrame:
+    """Per bank and calendar day: counts, mean rating, mean sentiment and negative share for
+    the day and over each rolling window, week-over-week changes and negative-spike flags.
+    """
+    frames = [_bank_trends(sub.droplevel("bank"), windows, spike_z, min_reviews).reset_index().assign(bank=bank)
+              for bank, sub in daily.groupby(level="bank", sort=True)]
+    if not frames:
+        # No dated reviews yet: same columns, no rows
+        empty = daily.droplevel("bank").iloc[:0]
+        frames = [_bank_trends(empty, windows, spike_z, min_reviews).reset_index().assign(bank=pd.Series(dtype=object))]
+    result = pd.concat(frames, ignore_index=True)
+    return result[["bank", "day"] + [c for c in result.columns if c not in ("bank", "day")]]
+
+
+def share_trends(counts: pd.Series, totals: pd.Series, key: str, windows: Sequence[int] = WINDOWS,
+                 top: Optional[int] = None) -> pd.DataFrame:
+    """Rolling share of reviews per ``key`` value (theme or emoji) for each bank and day.
+
+    ``counts`` is indexed by (bank, day, key) and ``totals``, the reviews the shares are
+    taken of, by (bank, day). With ``top``, only each bank's most frequent values are kept.
+    Days outside every window of a value's occurrences are left out.
+    """
+    frames = []
+    if counts.empty:
+        shares = [c for w in windows for c in ([f"share_{w}d", "share_7d_wow"] if w == 7 else [f"share_{w}d"])]
+        return pd.DataFrame(columns=["bank", "day", key, "n"] + shares)
+    wide_all = counts.unstack(key, fill_value=0)
+    for bank, wide in wide_all.groupby(level="bank", sort=True):
+        wide = wide.droplevel("bank")
+        wide = wide.loc[:, wide.sum() > 0]
+        if top is not None:
+            wide = wide[wide.sum().sort_values(ascending=False, kind="stable").index[:top]]
+        wide = _calendar(wide)
+        total = totals.loc[bank].reindex(wide.index, fill_value=0)
+        long = wide.stack(future_stack=True).rename("n").to_frame()
+        for w in windows:
+            in_window = total.rolling(w, min_periods=1).sum()
+            shares = wide.rolling(w, min_periods=1).sum().div(in_window.where(in_window > 0), axis=0)
+            long[f"share_{w}d"] = shares.stack(future_stack=True)
+            if w == 7:
+                long["share_7d_wow"] = shares.diff(7).stack(future_stack=True)
+        recent = wide.rolling(max(windows), min_periods=1).sum().stack(future_stack=True) > 0
+        frames.append(long[recent.to_numpy()].reset_index().assign(bank=bank))
+    result = pd.concat(frames, ignore_index=True)
+    return result[["bank", "day", key] + [c for c in result.columns if c not in ("bank", "day", key)]]
+
+
+@instrumented("trends")
+def main():
+    parser = argparse.ArgumentParser(description="Update daily per-bank aggregates and write rolling trend series.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the persisted aggregates and start over")
+    parser.add_argument("--spike_z", type=float, default=SPIKE_Z,
+                        help="Binomial z-score of a day's negative reviews that counts as a spike")
+    parser.add_argument("--min_reviews", type=int, default=SPIKE_MIN_REVIEWS,
+                        help="Days with fewer scored reviews are never flagged")
+    args = parser.parse_args()
+
+    if not dataset_exists(CLEAN_NAME):
+        raise FileNotFoundError(f"Cleaned dataset '{CLEAN_NAME}' not found")
+    with span("read_dataset") as s:
+        df = read_reviews(CLEAN_NAME, columns=["review_id", "review", "rating", "date", "bank"])
+        for name, cols in ((SENTIMENT_NAME, ["review_id", "sentiment_score"]), (THEMES_NAME, ["review_id", "themes"])):
+            if dataset_exists(name):
+                df = df.merge(read_reviews(name, columns=cols).drop_duplicates("review_id"), on="review_id", how="left")
+        s.rows_out = len(df)
+
+    with span("update_state", rows_in=len(df)) as s:
+        state = TrendState() if args.rebuild else TrendState.load()
+        changed = state.update(df)
+        state.save()
+        s.rows_out = sum(changed.values())
+    print("Trend state updated (reviews added, revised or removed): "
+          + ", ".join(f"{n} {signal}" for signal, n in changed.items()))
+
+    with span("rolling_series", rows_in=len(state.daily)) as s:
+        daily = daily_trends(state.daily, spike_z=args.spike_z, min_reviews=args.min_reviews)
+        themes = share_trends(state.themes, state.daily["n_themed"], "theme")
+        emojis = share_trends(state.emojis, state.daily["n_reviews"], "emoji", top=TOP_EMOJIS)
+        s.rows_out = len(daily)
+    DAILY_OUT.parent.mkdir(parents=True, exist_ok=True)
+    daily.to_csv(DAILY_OUT, index=False, date_format="%Y-%m-%d")
+    themes.to_csv(THEME_OUT, index=False, date_format="%Y-%m-%d")
+    emojis.to_csv(EMOJI_OUT, index=False, date_format="%Y-%m-%d")
+
+    spikes = daily[daily["negative_spike"]]
+    print(f"Saved {DAILY_OUT}, {THEME_OUT} and {EMOJI_OUT}; {len(spikes)} negative-sentiment spike days")
+    for row in spikes.tail(10).itertuples():
+        print(f"  {row.day:%Y-%m-%d} {row.bank}: {row.negative_share:.0%} negative of {row.n_reviews} reviews "
+              f"(z={row.negative_z:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
+import argparse
 from pathlib import Path
+from typing import List
 
 import pandas as pd
 import matplotlib
@@ -9,85 +11,119 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from wordcloud import WordCloud
 
-CLEAN_PATH = Path("data/processed/reviews_clean.csv")
-SENTIMENT_PATH = Path("data/processed/reviews_sentiment_partial.csv")
+from scripts.dataset_io import dataset_exists
+from scripts.figures import FIG_DIR, FigureJob, bank_slug, render_figures
+from scripts.instrument import instrumented, span
+from scripts.keywords_themes import TERM_FREQ_OUT, term_frequencies_by_group, tokenize_corpus
+from scripts.schema import read_reviews
+
+CLEAN_NAME = "reviews_clean"
+SENTIMENT_NAME = "reviews_sentiment_partial"
 KEYWORDS_PATH = Path("data/processed/keywords_by_bank.csv")
-FIG_DIR = Path("outputs/figures")
 
 sns.set(style="whitegrid")
 
 
-def plot_rating_distribution(df: pd.DataFrame):
+def _count_by_bank(df: pd.DataFrame, col: str) -> pd.DataFrame:
+    # What a countplot draws, computed once up front so only these counts go to the worker
+    return df.groupby([col, "bank"], sort=False, observed=True).size().rename("count").reset_index()
+
+
+def plot_rating_distribution(counts: pd.DataFrame, out_path: Path, dpi: int):
     plt.figure(figsize=(8, 5))
-    sns.countplot(data=df, x="rating", hue="bank")
+    sns.barplot(data=counts, x="rating", y="count", hue="bank",
+                hue_order=sorted(counts["bank"].unique()))
     plt.title("Rating Distribution by Bank")
     plt.tight_layout()
-    FIG_DIR.mkdir(parents=True, exist_ok=True)
-    plt.savefig(FIG_DIR / "rating_distribution_by_bank.png", dpi=200)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 
-def plot_sentiment_bars(df: pd.DataFrame):
+def plot_sentiment_bars(counts: pd.DataFrame, out_path: Path, dpi: int):
     plt.figure(figsize=(8, 5))
-    sns.countplot(data=df, x="sentiment_label", hue="bank")
+    sns.barplot(data=counts, x="sentiment_label", y="count", hue="bank",
+                hue_order=sorted(counts["bank"].unique()))
     plt.title("Sentiment Labels by Bank (VADER)")
     plt.tight_layout()
-    FIG_DIR.mkdir(parents=True, exist_ok=True)
-    plt.savefig(FIG_DIR / "sentiment_labels_by_bank.png", dpi=200)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 
-def plot_top_keywords(kw: pd.DataFrame, topn: int = 15):
-    for bank, sub in kw.groupby("bank"):
-        sub = sub.sort_values("score", ascending=False).head(topn)
-        plt.figure(figsize=(8, 5))
-        sns.barplot(data=sub, y="term", x="score", color="#4C72B0")
-        plt.title(f"Top Keywords (TF-IDF): {bank}")
-        plt.xlabel("Avg TF-IDF Score")
-        plt.ylabel("Term")
-        plt.tight_layout()
-        FIG_DIR.mkdir(parents=True, exist_ok=True)
-        plt.savefig(FIG_DIR / f"top_keywords_{bank.replace(' ', '_').lower()}.png", dpi=200)
-        plt.close()
-
-
-def wordcloud_per_bank(df: pd.DataFrame):
-    for bank, sub in df.groupby("bank"):
-        text = " ".join(sub["review"].dropna().astype(str).tolist())
-        if not text.strip():
-            continue
-        wc = WordCloud(width=800, height=400, background_color="white").generate(text)
-        plt.figure(figsize=(10, 5))
-        plt.imshow(wc, interpolation="bilinear")
-        plt.axis("off")
-        plt.tight_layout()
-        FIG_DIR.mkdir(parents=True, exist_ok=True)
-        plt.savefig(FIG_DIR / f"wordcloud_{bank.replace(' ', '_').lower()}.png", dpi=200)
-        plt.close()
+def plot_top_keywords(sub: pd.DataFrame, out_path: Path, dpi: int):
+    bank = sub["bank"].iat[0]
+    plt.figure(figsize=(8, 5))
+    sns.barplot(data=sub, y="term", x="score", color="#4C72B0")
+    plt.title(f"Top Keywords (TF-IDF): {bank}")
+    plt.xlabel("Avg TF-IDF Score")
+    plt.ylabel("Term")
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
 
 
-def main():
-    if not CLEAN_PATH.exists():
-        raise FileNotFoundError(f"Clean dataset not found at {CLEAN_PATH}")
-    df_clean = pd.read_csv(CLEAN_PATH)
+def plot_wordcloud(freqs: pd.DataFrame, out_path: Path, dpi: int):
+    wc = WordCloud(width=800, height=400, background_color="white")
+    wc.generate_from_frequencies(dict(zip(freqs["term"], freqs["count"])))
+    plt.figure(figsize=(10, 5))
+    plt.imshow(wc, interpolation="bilinear")
+    plt.axis("off")
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+
+
+def figure_jobs(topn: int = 15) -> List[FigureJob]:
+    if not dataset_exists(CLEAN_NAME):
+        raise FileNotFoundError(f"Clean dataset '{CLEAN_NAME}' not found")
+    jobs = []
 
     # Ratings
-    plot_rating_distribution(df_clean)
+    ratings = read_reviews(CLEAN_NAME, columns=["rating", "bank"]).sort_values("rating", kind="stable")
+    jobs.append(FigureJob("rating_distribution_by_bank.png", plot_rating_distribution,
+                          _count_by_bank(ratings, "rating")))
 
     # Sentiment
-    if SENTIMENT_PATH.exists():
-        df_sent = pd.read_csv(SENTIMENT_PATH)
-        plot_sentiment_bars(df_sent)
+    if dataset_exists(SENTIMENT_NAME):
+        labels = read_reviews(SENTIMENT_NAME, columns=["sentiment_label", "bank"])
+        jobs.append(FigureJob("sentiment_labels_by_bank.png", plot_sentiment_bars,
+                              _count_by_bank(labels, "sentiment_label")))
 
     # Keywords
     if KEYWORDS_PATH.exists():
         kw_df = pd.read_csv(KEYWORDS_PATH)
-        plot_top_keywords(kw_df)
-
-    # Wordclouds
-    wordcloud_per_bank(df_clean)
-
-    print(f"Saved figures to {FIG_DIR}")
+        for bank, sub in kw_df.groupby("bank"):
+            sub = sub.sort_values("score", ascending=False).head(topn).reset_index(drop=True)
+            jobs.append(FigureJob(f"top_keywords_{bank_slug(bank)}.png", plot_top_keywords, sub))
+
+    # Wordclouds, from the word counts keywords_themes saved alongside its keywords
+    if TERM_FREQ_OUT.exists():
+        freq_df = pd.read_csv(TERM_FREQ_OUT, keep_default_na=False)
+    else:
+        reviews = read_reviews(CLEAN_NAME, columns=["review", "bank"])
+        X, terms = tokenize_corpus(reviews["review"])
+        freq_df = term_frequencies_by_group(X, terms, reviews["bank"])
+    for bank, sub in freq_df.groupby("bank"):
+        jobs.append(FigureJob(f"wordcloud_{bank_slug(bank)}.png", plot_wordcloud,
+                              sub[["term", "count"]].reset_index(drop=True)))
+    return jobs
+
+
+@instrumented("visualize")
+def main():
+    parser = argparse.ArgumentParser(description="Render the rating, sentiment, keyword and word cloud figures.")
+    parser.add_argument("--workers", type=int, default=None, help="Processes rendering figures (default: all cores)")
+    parser.add_argument("--preview", action="store_true",
+                        help="Quick low-resolution render into outputs/figures/preview")
+    parser.add_argument("--force", action="store_true", help="Re-render figures even if their data is unchanged")
+    args = parser.parse_args()
+
+    with span("aggregate") as s:
+        jobs = figure_jobs()
+        s.rows_out = len(jobs)
+    with span("render_figures", rows_in=len(jobs)) as s:
+        stats = render_figures(jobs, "visualize", workers=args.workers, preview=args.preview, force=args.force)
+        s.rows_out = stats["rendered"]
+    print(f"Saved figures to {FIG_DIR} ({stats['rendered']} rendered, {stats['skipped']} unchanged)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+from benchmarks.bench_pipeline import compare, parse_size
+from benchmarks.synthetic import BANK_WEIGHTS, make_reviews
+
+
+def test_synthetic_corpus_shape():
+    df = make_reviews(2000, seed=1)
+    assert list(df.columns) == ["review", "rating", "date", "bank", "source"]
+    assert set(df["bank"]) == set(BANK_WEIGHTS)
+    assert df.duplicated().sum() >= 30
+    assert (~df["review"].map(str.isascii)).mean() > 0.2
+    assert df.equals(make_reviews(2000, seed=1))
+
+
+def test_compare_flags_only_real_slowdowns():
+    assert [parse_size(s) for s in ["10k", "1M", "2500"]] == [10_000, 1_000_000, 2500]
+    baseline = [
+        {"stage": "clean", "rows": 10, "seconds": 1.0, "peak_mb": 100.0},
+        {"stage": "emoji", "rows": 10, "seconds": 0.01},
+    ]
+    current = [
+        {"stage": "clean", "rows": 10, "seconds": 1.1, "peak_mb": 200.0},
+        {"stage": "emoji", "rows": 10, "seconds": 0.04},
+        {"stage": "themes", "rows": 10, "seconds": 9.0},
+    ]
+    flagged = compare(current, baseline, threshold=1.25)
+    assert [(f["stage"], f["metric"]) for f in flagged] == [("clean", "peak_mb")]
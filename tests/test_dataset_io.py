@@ -0,0 +1,51 @@
+import pandas as pd
+
+import scripts.dataset_io as dio
+
+
+def _reviews():
+    return pd.DataFrame([
+        {"review": "Great app", "rating": 5, "date": pd.Timestamp("2025-11-28").date(), "bank": "CBE", "source": "Google Play"},
+        {"review": "slow loading", "rating": 2, "date": pd.Timestamp("2025-11-29").date(), "bank": "Dashen Bank", "source": "Google Play"},
+    ])
+
+
+def test_parquet_roundtrip_with_column_and_bank_pruning(tmp_path, monkeypatch):
+    monkeypatch.setattr(dio, "PROCESSED_DIR", tmp_path)
+    df = _reviews()
+    dio.write_dataset(df, "reviews_clean", formats=("parquet", "csv"))
+
+    assert (tmp_path / "reviews_clean").is_dir() and (tmp_path / "reviews_clean.csv").exists()
+    back = dio.read_dataset("reviews_clean").sort_values("review").reset_index(drop=True)
+    pd.testing.assert_frame_equal(back, df)
+
+    sub = dio.read_dataset("reviews_clean", columns=["rating", "bank"], banks=["Dashen Bank"])
+    assert list(sub.columns) == ["rating", "bank"]
+    assert sub.to_dict("records") == [{"rating": 2, "bank": "Dashen Bank"}]
+
+
+def test_append_and_csv_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(dio, "PROCESSED_DIR", tmp_path)
+    df = _reviews()
+    dio.write_dataset(df.iloc[:1], "reviews_clean", formats=("parquet",))
+    dio.write_dataset(df.iloc[1:], "reviews_clean", formats=("parquet",), append=True)
+    assert len(dio.read_dataset("reviews_clean")) == 2
+
+    dio.write_dataset(df, "legacy", formats=("csv",))
+    assert dio.read_dataset("legacy", columns=["review"], banks=["CBE"])["review"].tolist() == ["Great app"]
+
+
+def test_single_format_rewrite_removes_the_stale_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(dio, "PROCESSED_DIR", tmp_path)
+    df = _reviews()
+    dio.write_dataset(df, "reviews_clean", formats=("parquet",))
+    dio.write_dataset(df.iloc[:1], "reviews_clean", formats=("csv",))
+    assert not dio.parquet_path("reviews_clean").exists()
+    assert len(dio.read_dataset("reviews_clean")) == 1
+
+    dio.write_dataset(df, "reviews_clean", formats=("parquet", "csv"))
+    dio.write_dataset(df.iloc[:1], "reviews_clean", formats=("parquet",))
+    assert not dio.csv_path("reviews_clean").exists()
+    # Appends only add to the formats they write
+    dio.write_dataset(df.iloc[1:], "reviews_clean", formats=("csv",), append=True)
+    assert len(dio.read_dataset("reviews_clean")) == 1
@@ -0,0 +1,170 @@
+import datetime as dt
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import MetaData, create_engine, text
+
+from scripts.db_init_and_load import define_rollups, define_schema, load_reviews, upsert_banks
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Set TEST_DATABASE_URL to a scratch Postgres database to exercise the COPY path
+    url = os.getenv("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'reviews.db'}")
+    engine = create_engine(url, future=True)
+    yield engine
+    # drop_all orders the drops by foreign key, so the rollups go before banks on Postgres too
+    metadata = MetaData()
+    define_schema(metadata)
+    define_rollups(metadata)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+def make_reviews(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "review_id": np.arange(n, dtype="int64") - n // 2,
+        "review": ["", "Fast, \"reliable\"\napp"] + [f"review {i}" for i in range(n - 2)],
+        "rating": rng.integers(1, 6, n).astype(float),
+        "date": ["2024-05-01", None] + ["2024-06-02"] * (n - 2),
+        "bank": rng.choice(["Bank A", "Bank B"], n),
+        "source": "Google Play",
+        "sentiment_label": ["positive", None] + ["neutral"] * (n - 2),
+        "sentiment_score": [0.5, np.nan] + [0.0] * (n - 2),
+    })
+
+
+def test_chunked_load_round_trips(engine):
+    df = make_reviews(2500)
+    metadata = MetaData()
+    banks_t, reviews_t = define_schema(metadata)
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        bank_map = upsert_banks(conn, banks_t, df)
+        assert load_reviews(conn, reviews_t, bank_map, df, chunk_rows=700) == len(df)
+
+    with engine.connect() as conn:
+        rows = pd.read_sql(text("SELECT * FROM reviews ORDER BY review_id"), conn)
+    assert len(rows) == len(df)
+    assert rows["review_id"].tolist() == sorted(df["review_id"])
+    first, second = rows.iloc[0], rows.iloc[1]
+    assert first["review_text"] == "" and first["rating"] == df["rating"][0]
+    assert pd.Timestamp(first["review_date"]).date() == dt.date(2024, 5, 1)
+    assert second["review_text"] == "Fast, \"reliable\"\napp"
+    assert pd.isna(second["review_date"]) and pd.isna(second["sentiment_label"]) and pd.isna(second["sentiment_score"])
+
+
+@pytest.mark.parametrize("on_conflict", [True, False])
+def test_upsert_is_idempotent_and_only_rewrites_changed_rows(engine, monkeypatch, on_conflict):
+    import scripts.db_init_and_load as db
+    from scripts.db_init_and_load import upsert_reviews
+
+    if not on_conflict:
+        # As on a database without ON CONFLICT support
+        monkeypatch.setattr(db, "ON_CONFLICT_INSERTS", {})
+
+    df = make_reviews(300)
+    df["themes"] = "Other"
+    metadata = MetaData()
+    banks_t, reviews_t = define_schema(metadata)
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        bank_map = upsert_banks(conn, banks_t, df)
+        assert upsert_reviews(conn, reviews_t, bank_map, df) == (300, 300)
+    with engine.begin() as conn:
+        assert upsert_banks(conn, banks_t, df) == bank_map
+        assert upsert_reviews(conn, reviews_t, bank_map, df) == (300, 0)
+
+    changed = df.copy()
+    changed.loc[:9, "sentiment_score"] = 0.75
+    changed.loc[10:14, "themes"] = "Transaction Performance"
+    extra = make_reviews(2).assign(review_id=[1000, 1001], themes=None)
+    with engine.begin() as conn:
+        assert upsert_reviews(conn, reviews_t, bank_map, pd.concat([changed, extra])) == (302, 17)
+
+    with engine.connect() as conn:
+        rows = pd.read_sql(text("SELECT * FROM reviews ORDER BY review_id"), conn).set_index("review_id")
+    assert len(rows) == 302
+    assert (rows.loc[changed["review_id"][:10], "sentiment_score"] == 0.75).all()
+    assert (rows.loc[changed["review_id"][10:15], "themes"] == "Transaction Performance").all()
+
+
+def test_rollups_follow_incremental_loads(engine):
+    from scripts.db_init_and_load import ensure_schema, upsert_reviews
+    from scripts.report_queries import avg_rating_per_bank, reviews_per_bank, sentiment_per_bank, top_themes
+
+    df = make_reviews(400)
+    df["date"] = pd.date_range("2024-01-01", periods=10).repeat(40).strftime("%Y-%m-%d")
+    df["sentiment_score"] = np.linspace(-1, 1, len(df))
+    df["themes"] = np.where(df.index % 3 == 0, "Transaction Performance, UX & Navigation", "Other")
+    metadata = MetaData()
+    banks_t, reviews_t = define_schema(metadata)
+    rollups = define_rollups(metadata)
+
+    def check(expected):
+        with engine.connect() as conn:
+            counts = reviews_per_bank(conn).set_index("bank_name")["n_reviews"]
+            ratings = avg_rating_per_bank(conn).set_index("bank_name")["avg_rating"]
+            sentiment = sentiment_per_bank(conn).set_index("bank_name")["sentiment_mean"]
+            themes = top_themes(conn, n=10).set_index(["bank_name", "theme"])["n_reviews"]
+        by_bank = expected.groupby("bank")
+        assert counts.to_dict() == by_bank.size().to_dict()
+        pd.testing.assert_series_equal(ratings.sort_index(), by_bank["rating"].mean(), check_names=False)
+        pd.testing.assert_series_equal(sentiment.sort_index(), by_bank["sentiment_score"].mean(), check_names=False)
+        exploded = expected.assign(theme=expected["themes"].str.split(", ")).explode("theme")
+        assert themes.to_dict() == exploded.groupby(["bank", "theme"]).size().to_dict()
+
+    with engine.begin() as conn:
+        ensure_schema(conn, metadata)
+        bank_map = upsert_banks(conn, banks_t, df)
+        upsert_reviews(conn, reviews_t, bank_map, df.iloc[:300], rollups=rollups)
+    check(df.iloc[:300])
+
+    changed = df.copy()
+    changed.loc[:49, "sentiment_score"] = 1.0
+    changed.loc[:49, "themes"] = "Other"
+    with engine.begin() as conn:
+        upsert_reviews(conn, reviews_t, bank_map, changed.iloc[:350], rollups=rollups)
+        upsert_reviews(conn, reviews_t, bank_map, changed, rollups=rollups)
+        ensure_schema(conn, metadata)
+    check(changed)
+
+
+def test_rollups_are_backfilled_for_existing_reviews_and_count_undated_ones(engine):
+    from scripts.db_init_and_load import ensure_schema, rebuild_rollups, upsert_reviews
+    from scripts.report_queries import reviews_per_bank, sentiment_per_bank
+
+    df = make_reviews(200)
+    df["themes"] = "Other"
+    metadata = MetaData()
+    banks_t, reviews_t = define_schema(metadata)
+    with engine.begin() as conn:
+        # Loaded before the rollup tables existed
+        metadata.create_all(conn)
+        bank_map = upsert_banks(conn, banks_t, df)
+        upsert_reviews(conn, reviews_t, bank_map, df.iloc[:150])
+
+    def counts():
+        with engine.connect() as conn:
+            return reviews_per_bank(conn).set_index("bank_name")["n_reviews"].to_dict()
+
+    rollups = define_rollups(metadata)
+    with engine.begin() as conn:
+        ensure_schema(conn, metadata)
+        upsert_reviews(conn, reviews_t, bank_map, df, rollups=rollups)
+    assert counts() == df.groupby("bank").size().to_dict()
+    with engine.connect() as conn:
+        assert reviews_per_bank(conn, end=dt.date(2024, 12, 31))["n_reviews"].sum() == len(df) - 1
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM daily_bank_stats WHERE day = '2024-05-01'"))
+        conn.execute(text("UPDATE daily_bank_stats SET n_reviews = 0, sentiment_sum = 0"))
+        rebuild_rollups(conn, reviews_t, rollups)
+    assert counts() == df.groupby("bank").size().to_dict()
+    with engine.connect() as conn:
+        sentiment = sentiment_per_bank(conn).set_index("bank_name")["sentiment_mean"]
+    pd.testing.assert_series_equal(sentiment.sort_index(), df.groupby("bank")["sentiment_score"].mean(),
+                                   check_names=False)
@@ -0,0 +1,31 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from scripts.emoji_analysis import aggregate_emojis, emoji_table, extract_emojis
+
+
+def test_single_pass_aggregation_matches_per_review_loops():
+    df = pd.DataFrame({
+        "review_id": np.arange(8, dtype="int64"),
+        "bank": ["A", "A", "B", "B", "A", "B", "A", "B"],
+        "review": ["great 😍😍", "plain ascii", "👍🏽 ok", None, "bad 😡 app 👍", "🇪🇹 flag 👨‍👩‍👧", "😍", "café"],
+    })
+    scores = pd.Series([0.9, 0.1, 0.4, 0.0, np.nan, -0.3, 0.7, 0.2])
+
+    emojis = emoji_table(df)
+    assert emojis["review_id"].tolist() == [0, 0, 2, 4, 4, 5, 5, 6]
+    emojis["sentiment_score"] = scores[emojis["review_id"]].to_numpy()
+    agg = aggregate_emojis(emojis).set_index(["bank", "emoji"])
+
+    counts, sentiment = Counter(), defaultdict(list)
+    for bank, text, score in zip(df["bank"], df["review"], scores):
+        for e in extract_emojis(text):
+            counts[(bank, e)] += 1
+            if pd.notna(score):
+                sentiment[(bank, e)].append(score)
+    assert agg["count"].to_dict() == dict(counts)
+    assert agg.loc[agg["n"] > 0, "n"].to_dict() == {k: len(v) for k, v in sentiment.items()}
+    for key, vals in sentiment.items():
+        assert np.isclose(agg.loc[key, "sentiment_mean"], np.mean(vals))
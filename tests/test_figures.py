@@ -0,0 +1,28 @@
+import pandas as pd
+
+from scripts.figures import FigureJob, render_figures
+
+
+def write_rows(data, out_path, dpi):
+    out_path.write_text(f"{dpi}\n{data.to_csv(index=False)}")
+
+
+def test_unchanged_figures_are_skipped(tmp_path):
+    def jobs(scale=1):
+        return [FigureJob(f"fig_{i}.txt", write_rows, pd.DataFrame({"x": [i, i * scale]})) for i in range(3)]
+
+    assert render_figures(jobs(), "test", workers=2, fig_dir=tmp_path) == {"rendered": 3, "skipped": 0}
+    assert (tmp_path / "fig_2.txt").read_text().startswith("200\n")
+    assert render_figures(jobs(), "test", workers=2, fig_dir=tmp_path) == {"rendered": 0, "skipped": 3}
+
+    # Only the figures whose data changed are redrawn; a deleted file is redrawn too
+    (tmp_path / "fig_0.txt").unlink()
+    assert render_figures(jobs(scale=2), "test", workers=2, fig_dir=tmp_path) == {"rendered": 3, "skipped": 0}
+    assert render_figures(jobs(scale=2), "test", fig_dir=tmp_path) == {"rendered": 0, "skipped": 3}
+    (tmp_path / "fig_0.txt").unlink()
+    assert render_figures(jobs(scale=2), "test", fig_dir=tmp_path) == {"rendered": 1, "skipped": 2}
+
+    # Previews go to their own directory at low resolution
+    assert render_figures(jobs(), "test", preview=True, fig_dir=tmp_path)["rendered"] == 3
+    assert (tmp_path / "preview" / "fig_1.txt").read_text().startswith("60\n")
+    assert (tmp_path / "fig_1.txt").read_text().startswith("200\n")
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from scripts.instrument import span, stage
+
+
+def test_stage_records_spans_and_exports(tmp_path):
+    with stage("clean", out_dir=tmp_path) as metrics:
+        with span("read", rows_in=10) as s:
+            s.rows_out = 8
+        for _ in range(2):
+            with span("chunk", rows_in=4):
+                pass
+
+    assert [s.span for s in metrics.spans] == ["read", "chunk", "chunk", "total"]
+    records = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert len(records) == 4
+    assert records[0]["stage"] == "clean" and records[0]["rows_out"] == 8
+    assert records[0]["wall_seconds"] >= 0 and records[0]["rows_per_second"] is not None
+
+    # Repeated spans collapse into one series per span
+    prom = (tmp_path / "clean.prom").read_text()
+    assert 'reviews_span_rows_in{stage="clean",span="chunk"} 8' in prom
+    assert prom.count('reviews_span_wall_seconds{stage="clean",span="chunk"}') == 1
+    assert "rows_in" in prom and "# TYPE reviews_span_wall_seconds gauge" in prom
+
+    # A second run appends to the JSON lines and replaces the Prometheus file
+    with stage("clean", out_dir=tmp_path):
+        pass
+    assert len((tmp_path / "metrics.jsonl").read_text().splitlines()) == 5
+    assert 'span="chunk"' not in (tmp_path / "clean.prom").read_text()
+
+
+def test_failed_stage_is_still_exported(tmp_path):
+    with pytest.raises(RuntimeError):
+        with stage("load", out_dir=tmp_path):
+            with span("insert"):
+                raise RuntimeError("boom")
+    assert 'span="insert"' in (tmp_path / "load.prom").read_text()
+
+
+def test_profiling_is_opt_in(tmp_path, monkeypatch):
+    with stage("keywords", out_dir=tmp_path):
+        pass
+    assert not (tmp_path / "keywords.prof").exists()
+
+    monkeypatch.setenv("REVIEWS_PROFILE", "sentiment, keywords")
+    with stage("keywords", out_dir=tmp_path):
+        sum(range(1000))
+    assert (tmp_path / "keywords.prof").exists()
+    assert "cumulative" in (tmp_path / "keywords.prof.txt").read_text()
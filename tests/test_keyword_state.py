@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from scripts.keyword_state import KeywordState
+from scripts.keywords_themes import term_frequencies_by_group, top_keywords_by_group, tokenize_corpus
+
+
+def make_reviews():
+    texts = ["app crashes on login", "great app fast transfer", "login fails after update",
+             "slow transfer and crashes", "great support fast reply", "update broke login again"] * 4
+    return pd.DataFrame({
+        "review_id": np.arange(len(texts), dtype="int64"),
+        "bank": ["A", "B", "A", "B", "C", "A"] * 4,
+        "review": [f"{t} {i % 3}" for i, t in enumerate(texts)],
+    })
+
+
+def test_incremental_updates_match_single_build(tmp_path):
+    df = make_reviews()
+    full = KeywordState()
+    assert full.update(df) == len(df)
+
+    KeywordState().save(tmp_path)
+    for part in (df.iloc[:7], df.iloc[5:15], df.iloc[15:]):
+        state = KeywordState.load(tmp_path)
+        state.update(part)
+        state.save(tmp_path)
+    state = KeywordState.load(tmp_path)
+
+    assert state.update(df) == 0
+    assert list(state.n_docs[np.argsort(state.banks)]) == [12, 8, 4]
+    pd.testing.assert_frame_equal(state.top_keywords(n=5, min_df=2), full.top_keywords(n=5, min_df=2))
+
+    X, terms = tokenize_corpus(df["review"])
+    pd.testing.assert_frame_equal(state.term_frequencies(n=4), term_frequencies_by_group(X, terms, df["bank"], n=4))
+
+
+def test_incremental_keywords_track_full_tfidf():
+    df = make_reviews()
+    state = KeywordState()
+    state.update(df)
+    X, terms = tokenize_corpus(df["review"])
+    exact = top_keywords_by_group(X, terms, df[["bank"]], n=5, min_df=2)
+    approx = state.top_keywords(n=5, min_df=2)
+    for bank in "ABC":
+        overlap = set(exact.loc[exact["bank"] == bank, "term"]) & set(approx.loc[approx["bank"] == bank, "term"])
+        assert len(overlap) >= 3
+
+
+def test_removed_reviews_are_detected():
+    df = make_reviews()
+    state = KeywordState()
+    state.update(df)
+    assert state.removed(df["review_id"]) == 0
+    assert state.removed(df["review_id"].iloc[3:]) == 3
+    assert state.removed(np.arange(100)) == 0
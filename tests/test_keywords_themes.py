@@ -0,0 +1,96 @@
+import itertools
+import re
+
+import pandas as pd
+import pytest
+
+from scripts.keywords_themes import THEME_RULES, ThemeTagger, load_theme_rules
+
+
+def legacy_assign_themes(text, rules=THEME_RULES):
+    text_l = text.lower()
+    matched = []
+    for theme, patterns in rules.items():
+        for pat in patterns:
+            if re.search(pat, text_l):
+                matched.append(theme)
+                break
+    return matched if matched else ["Other"]
+
+
+def test_compiled_tagger_matches_per_pattern_search():
+    words = ["quick", "slow", "slowly", "login", "ui", "called", "emails", "transfers", "face id",
+             "Hard to", "otp", "great", "supportive", "bugfix", "delayed"]
+    texts = [" ".join(combo) for combo in itertools.permutations(words[:8], 3)]
+    texts += [" ".join(combo) for combo in itertools.combinations(words, 4)]
+    texts += ["", "😍 Great App!", "statement template beneficiary notification feature"]
+
+    tagger = ThemeTagger()
+    assert [tagger.tag(t) for t in texts] == [legacy_assign_themes(t) for t in texts]
+
+
+def test_overlapping_rules_from_config(tmp_path):
+    # Both themes match at the same position and one match lies inside the other
+    rules = {"Login": ["log in|login"], "Logs": ["log"], "Ins": ["gin"]}
+    path = tmp_path / "rules.json"
+    pd.Series(rules).to_json(path)
+
+    tagger = ThemeTagger(load_theme_rules(path))
+    texts = pd.Series(["cannot login", "read the logs", "nothing here", None])
+    assert tagger.tag_column(texts).tolist() == [
+        ", ".join(legacy_assign_themes(t or "", rules)) for t in texts
+    ] == ["Login, Logs, Ins", "Logs", "Other", "Other"]
+
+
+def test_vectorized_column_path_handles_non_ascii_rows():
+    texts = pd.Series(["slow transfer", "slowé app", "ሰላም slow", "Login ERROR", "", None, "çall support"])
+    expected = [", ".join(legacy_assign_themes(t or "")) for t in texts]
+
+    assert ThemeTagger().tag_column(texts).tolist() == expected
+    # Lookarounds are not RE2 syntax, so this tagger falls back to the scanner for every row
+    rules = {**THEME_RULES, "Praise": [r"good(?! luck)"]}
+    fallback = ThemeTagger(rules)
+    assert not fallback._re2_ok
+    assert fallback.tag_column(pd.Series(["good app", "good luck"])).tolist() == ["Praise", "Other"]
+
+
+def test_grouped_keywords_match_per_bank_tfidf():
+    from scripts.keywords_themes import _top_tfidf_keywords, tokenize_corpus, top_keywords_by_group
+
+    df = pd.DataFrame({
+        "bank": ["A"] * 6 + ["B"] * 5 + [None],
+        "review": [
+            "app is slow", "slow transfer again", "slow app", "great app", "great app great service", "login fails",
+            "otp never arrives", "otp code slow", "otp again", "good good app", "good", "orphan review",
+        ],
+    })
+    X, terms = tokenize_corpus(df["review"])
+    got = top_keywords_by_group(X, terms, df[["bank"]], n=3)
+
+    for bank in ["A", "B"]:
+        expected = _top_tfidf_keywords(df[df["bank"] == bank], "review", n=3)
+        sub = got[got["bank"] == bank]
+        assert sub["term"].tolist() == [t for t, _ in expected]
+        assert sub["score"].tolist() == pytest.approx([s for _, s in expected], rel=1e-12)
+
+
+def test_term_frequencies_count_words_per_bank():
+    from collections import Counter
+
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    from scripts.keywords_themes import KEYWORD_VECTORIZER, term_frequencies_by_group, tokenize_corpus
+
+    df = pd.DataFrame({
+        "bank": ["A", "A", "B", "B", None],
+        "review": ["Slow app, slow transfer 2024", "great app", "OTP otp code", "great service", "orphan"],
+    })
+    X, terms = tokenize_corpus(df["review"])
+    got = term_frequencies_by_group(X, terms, df["bank"], n=2)
+
+    analyzer = CountVectorizer(**{**KEYWORD_VECTORIZER, "ngram_range": (1, 1)}).build_analyzer()
+    for bank in ["A", "B"]:
+        counts = Counter(w for text in df.loc[df["bank"] == bank, "review"] for w in analyzer(text) if not w.isdigit())
+        expected = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:2]
+        sub = got[got["bank"] == bank]
+        assert list(zip(sub["term"], sub["count"])) == expected
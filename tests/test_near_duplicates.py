@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.near_duplicates import FLAG_COL, NearDuplicateIndex, apply_near_duplicates, lsh_params
+
+BASE = "The app keeps crashing every time I try to transfer money to another account, please fix it"
+
+
+def _reviews(ids, texts):
+    return pd.DataFrame({"review_id": ids, "review": texts, "bank": "CBE"})
+
+
+def test_flag_and_drop_modes():
+    df = _reviews([10, 11, 12, 13, 14], [
+        BASE,
+        BASE.replace("keeps", "kept") + "!!",   # small edit
+        BASE.upper(),                            # case only
+        "Lovely interface, fast transfers and the support team answered my call quickly",
+        "good app",                              # too short to judge
+    ])
+    flagged = apply_near_duplicates(df, NearDuplicateIndex(), "flag")
+    assert flagged[FLAG_COL].tolist() == [pd.NA, 10, 10, pd.NA, pd.NA]
+
+    dropped = apply_near_duplicates(df, NearDuplicateIndex(), "drop")
+    assert dropped["review_id"].tolist() == [10, 13, 14]
+    assert apply_near_duplicates(df, NearDuplicateIndex(), "off") is df
+    with pytest.raises(ValueError):
+        apply_near_duplicates(df, NearDuplicateIndex(), "bogus")
+
+
+def test_short_reviews_are_never_flagged():
+    df = _reviews([1, 2], ["good app", "good app!"])
+    assert apply_near_duplicates(df, NearDuplicateIndex(), "flag")[FLAG_COL].isna().all()
+
+
+def test_index_persists_and_only_compares_new_reviews(tmp_path):
+    index = NearDuplicateIndex()
+    index.update(_reviews([1, 2], [BASE, "Statement download works well and the fingerprint login is quick"]))
+    index.save(tmp_path)
+
+    index = NearDuplicateIndex.load(tmp_path)
+    assert len(index.ids) == 2
+    out = index.update(_reviews([1, 3, 4], [BASE, BASE + " thanks", "Completely unrelated words about airtime top up"]))
+    # Known ids keep their status, the new copy points at the indexed original
+    assert out.tolist() == [pd.NA, 1, pd.NA]
+    assert len(index.ids) == 4
+
+    # Other parameters mean another index
+    assert len(NearDuplicateIndex.load(tmp_path, threshold=0.5).ids) == 0
+
+
+def test_near_copies_are_found_among_many_distinct_reviews():
+    rng = np.random.default_rng(0)
+    words = np.array(["app", "bank", "slow", "transfer", "login", "otp", "error", "support", "great", "update",
+                      "crash", "balance", "statement", "branch", "fingerprint", "receipt"])
+    texts = [" ".join(rng.choice(words, size=12)) for _ in range(500)]
+    copies = [texts[i] + " pls" for i in range(0, 500, 50)]
+    out = NearDuplicateIndex().update(_reviews(np.arange(510), texts + copies))
+    assert out.iloc[500:].tolist() == list(range(0, 500, 50))
+    assert out.iloc[:500].notna().sum() <= 5
+
+
+def test_lsh_params_track_the_threshold():
+    bands, rows = lsh_params(0.8, 64)
+    assert bands * rows <= 64 and abs((1 / bands) ** (1 / rows) - 0.8) < 0.05
+
+
+def test_band_collisions_do_not_hide_later_similar_reviews():
+    index = NearDuplicateIndex()
+    rows = index.rows
+    rng = np.random.default_rng(1)
+    b = rng.integers(0, 2 ** 32, size=index.num_perm, dtype=np.uint32)
+    # a shares only the first band with b; c is b with one value changed in every other band
+    a = rng.integers(0, 2 ** 32, size=index.num_perm, dtype=np.uint32)
+    a[:rows] = b[:rows]
+    c = b.copy()
+    c[rows::rows] += 1
+    assert (c == b).mean() >= index.threshold > (c == a).mean()
+
+    index._add(np.array([1, 2, 3]), np.vstack([a, b, c]))
+    assert index.canon.tolist() == [0, 1, 1]
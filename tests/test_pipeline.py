@@ -0,0 +1,95 @@
+import threading
+import time
+
+from scripts.pipeline import Stage, dependencies, run_pipeline
+
+
+def make_stages(root):
+    return [
+        Stage("clean", "preprocess_reviews", inputs=[f"{root}/raw"], outputs=[f"{root}/clean.txt"]),
+        Stage("sentiment", "sentiment_partial", inputs=[f"{root}/clean.txt"], outputs=[f"{root}/sent.txt"]),
+        Stage("keywords", "keywords_themes", inputs=[f"{root}/clean.txt"], outputs=[f"{root}/kw.txt"]),
+        Stage("emoji", "emoji_analysis", inputs=[f"{root}/clean.txt", f"{root}/sent.txt"],
+              outputs=[f"{root}/emoji.txt"]),
+    ]
+
+
+class FakeRunner:
+    """Writes each stage's outputs from its inputs and records overlapping runs."""
+
+    def __init__(self, delay=0.0):
+        self.calls, self.active, self.max_active = [], 0, 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, stage):
+        with self._lock:
+            self.calls.append(stage.name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        for out in stage.outputs:
+            with open(out, "w") as f:
+                # Deterministic outputs, so unchanged inputs give unchanged outputs
+                f.write(stage.name + "".join(sorted(str(len(i)) for i in stage.inputs)))
+        with self._lock:
+            self.active -= 1
+
+
+def test_dependencies_follow_declared_files(tmp_path):
+    deps = dependencies(make_stages(tmp_path))
+    assert deps == {"clean": [], "sentiment": ["clean"], "keywords": ["clean"], "emoji": ["clean", "sentiment"]}
+
+
+def test_reruns_skip_current_stages_and_run_independent_ones_together(tmp_path):
+    (tmp_path / "raw").mkdir()
+    (tmp_path / "raw" / "a.csv").write_text("review\nok\n")
+    stages = make_stages(tmp_path)
+    names = [s.name for s in stages]
+    state = tmp_path / "state.json"
+
+    runner = FakeRunner(delay=0.2)
+    assert set(run_pipeline(stages, names, jobs=4, state_path=state, runner=runner).values()) == {"ran"}
+    assert runner.calls[0] == "clean" and runner.calls[-1] == "emoji"
+    assert runner.max_active == 2  # sentiment and keywords
+
+    runner = FakeRunner()
+    assert set(run_pipeline(stages, names, state_path=state, runner=runner).values()) == {"skipped"}
+    assert runner.calls == []
+
+    # New raw data reruns clean; unchanged clean output leaves the rest current
+    (tmp_path / "raw" / "b.csv").write_text("review\nnew\n")
+    status = run_pipeline(stages, names, state_path=state, runner=runner)
+    assert status == {"clean": "ran", "sentiment": "skipped", "keywords": "skipped", "emoji": "skipped"}
+
+    (tmp_path / "kw.txt").unlink()
+    (tmp_path / "clean.txt").write_text("changed")
+    assert run_pipeline(stages, names, state_path=state, dry_run=True, runner=runner) == {
+        "clean": "skipped", "sentiment": "stale", "keywords": "stale", "emoji": "stale"}
+
+
+def test_failed_stage_blocks_downstream(tmp_path):
+    (tmp_path / "raw").mkdir()
+    stages = make_stages(tmp_path)
+
+    def runner(stage):
+        if stage.name == "sentiment":
+            raise RuntimeError("boom")
+        FakeRunner()(stage)
+
+    status = run_pipeline(stages, [s.name for s in stages], state_path=tmp_path / "state.json", runner=runner)
+    assert status == {"clean": "ran", "sentiment": "failed", "keywords": "ran", "emoji": "blocked"}
+
+
+def test_always_run_stages_are_never_current(tmp_path):
+    stages = [Stage("scrape", "scrape_reviews", outputs=[f"{tmp_path}/raw.txt"], always_run=True),
+              Stage("clean", "preprocess_reviews", inputs=[f"{tmp_path}/raw.txt"], outputs=[f"{tmp_path}/clean.txt"])]
+    state = tmp_path / "state.json"
+    run_pipeline(stages, ["scrape", "clean"], state_path=state, runner=FakeRunner())
+
+    runner = FakeRunner()
+    # Same fetched content: only the scrape itself runs again
+    assert run_pipeline(stages, ["scrape", "clean"], state_path=state, runner=runner) == {
+        "scrape": "ran", "clean": "skipped"}
+    assert runner.calls == ["scrape"]
+    assert run_pipeline(stages, ["scrape"], state_path=state, dry_run=True, runner=runner) == {"scrape": "stale"}
@@ -0,0 +1,131 @@
+import datetime as dt
+import json
+import threading
+import urllib.request
+
+import pandas as pd
+from sqlalchemy import MetaData, create_engine
+
+from scripts.db_init_and_load import define_rollups, define_schema, ensure_schema, upsert_banks, upsert_reviews
+from scripts.pipeline import mark_published
+from scripts.query_service import QueryService, ReviewStore, make_server
+from scripts.schema import apply_schema
+
+
+def _reviews():
+    return apply_schema(pd.DataFrame({
+        "review_id": [1, 2, 3, 4, 5],
+        "review": ["Login fails with OTP error", "Great app, fast transfer", "OTP never arrives, login blocked",
+                   "ጥሩ አፕ login", "Slow transfer today"],
+        "rating": [1, 5, 1, 4, 2],
+        "date": ["2024-06-01", "2024-06-03", "2024-06-05", "2024-06-02", None],
+        "bank": ["Dashen Bank", "Dashen Bank", "Bank of Abyssinia", "Dashen Bank", "Dashen Bank"],
+        "source": "Google Play",
+        "sentiment_label": ["negative", "positive", "negative", "positive", "negative"],
+        "sentiment_score": [-0.6, 0.8, -0.5, 0.4, -0.3],
+        "themes": ["Reliability & Access", "Transaction Performance", "Reliability & Access",
+                   "Reliability & Access", "Transaction Performance"],
+    }))
+
+
+def test_search_filters_and_keywords():
+    store = ReviewStore(_reviews())
+
+    def ids(**kw):
+        return [r["review_id"] for r in store.search(**kw)["reviews"]]
+
+    # Newest first, undated last
+    assert ids() == [3, 2, 4, 1, 5]
+    assert ids(q="login") == [3, 4, 1]
+    assert ids(q="OTP login", bank="Dashen Bank") == [1]
+    assert ids(q="nothing here") == []
+    assert ids(sentiment="negative", theme="Reliability & Access") == [3, 1]
+    assert ids(start=dt.date(2024, 6, 2), end=dt.date(2024, 6, 3)) == [2, 4]
+    assert ids(bank="Unknown Bank") == []
+
+    page = store.search(limit=2, offset=1)
+    assert page["total"] == 5 and [r["review_id"] for r in page["reviews"]] == [2, 4]
+    first = store.search(q="arrives")["reviews"][0]
+    assert first["date"] == "2024-06-05" and first["rating"] == 1 and first["bank"] == "Bank of Abyssinia"
+
+
+def test_results_are_cached_until_new_data_is_published(tmp_path):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return ReviewStore(_reviews())
+
+    marker = tmp_path / ".published"
+    service = QueryService(published_path=marker, store_loader=loader)
+    status, body = service.handle("/reviews", {"q": "login"})
+    assert status == 200 and json.loads(body)["total"] == 3
+    assert service.handle("/reviews", {"q": "login"}) == (200, body)
+    assert service.cache.hits == 1 and len(loads) == 1
+
+    mark_published(marker)
+    service.handle("/reviews", {"q": "login"})
+    assert service.cache.hits == 1 and len(loads) == 2
+
+    assert service.handle("/reviews", {"limit": "0"})[0] == 400
+    assert service.handle("/reviews", {"start": "June"})[0] == 400
+    assert service.handle("/missing", {})[0] == 404
+    assert service.handle("/aggregates/banks", {})[0] == 400  # no database configured
+
+
+def test_slow_requests_do_not_block_cached_ones(tmp_path):
+    service = QueryService(published_path=tmp_path / ".published", store_loader=lambda: ReviewStore(_reviews()))
+    cached = service.handle("/reviews", {"q": "login"})
+    release = threading.Event()
+    service._routes["/aggregates/banks"] = lambda params: release.wait(5) and {"rows": []}
+
+    slow = threading.Thread(target=service.handle, args=("/aggregates/banks", {}))
+    slow.start()
+    try:
+        assert service.handle("/reviews", {"q": "login"}) == cached
+        assert service.handle("/reviews", {"q": "transfer"})[0] == 200
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join()
+    assert service.handle("/aggregates/banks", {})[0] == 200
+
+
+def test_aggregates_from_rollups_over_http(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}", future=True)
+    metadata = MetaData()
+    banks_t, reviews_t = define_schema(metadata)
+    rollups = define_rollups(metadata)
+    df = _reviews()
+    with engine.begin() as conn:
+        ensure_schema(conn, metadata)
+        upsert_reviews(conn, reviews_t, upsert_banks(conn, banks_t, df), df, rollups=rollups)
+
+    service = QueryService(engine, published_path=tmp_path / ".published",
+                           store_loader=lambda: ReviewStore(_reviews()))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        def get(path):
+            with urllib.request.urlopen(base + path) as resp:
+                return json.loads(resp.read())
+
+        banks = {r["bank_name"]: r for r in get("/aggregates/banks")["rows"]}
+        assert banks["Dashen Bank"]["n_reviews"] == 4 and banks["Dashen Bank"]["avg_rating"] == 3.0
+        assert banks["Bank of Abyssinia"]["avg_rating"] == 1.0
+        # The undated review falls in no date range and has no day of its own
+        dated = {r["bank_name"]: r for r in get("/aggregates/banks?end=2024-06-30")["rows"]}
+        assert dated["Dashen Bank"]["n_reviews"] == 3
+        daily = get("/aggregates/daily?bank=Dashen+Bank")["rows"]
+        assert [r["day"] for r in daily] == ["2024-06-01", "2024-06-02", "2024-06-03"]
+        daily = get("/aggregates/daily?bank=Dashen+Bank&start=2024-06-02")["rows"]
+        assert [r["day"] for r in daily] == ["2024-06-02", "2024-06-03"]
+        themes = get("/aggregates/themes?n=1")["rows"]
+        assert {r["bank_name"]: r["theme"] for r in themes}["Dashen Bank"] == "Reliability & Access"
+        assert get("/reviews?q=%E1%8C%A5%E1%88%A9")["total"] == 1  # Amharic keyword
+    finally:
+        server.shutdown()
+        server.server_close()
+        engine.dispose()
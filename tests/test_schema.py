@@ -0,0 +1,37 @@
+import pandas as pd
+
+import scripts.dataset_io as dio
+from benchmarks.synthetic import make_reviews
+from scripts.preprocess_reviews import clean
+from scripts.schema import REVIEW_DTYPES, apply_schema, read_reviews
+
+
+def test_clean_output_is_typed_and_smaller():
+    raw = make_reviews(3000, seed=1)
+    typed = clean(raw)
+    for col in ["review", "rating", "date", "bank", "source"]:
+        assert typed[col].dtype == REVIEW_DTYPES[col] or (
+            REVIEW_DTYPES[col] == "category" and isinstance(typed[col].dtype, pd.CategoricalDtype))
+    untyped = typed.astype({"review": object, "rating": "float64", "bank": object, "source": object})
+    untyped["date"] = typed["date"].dt.date
+    assert typed.memory_usage(deep=True).sum() * 2 < untyped.memory_usage(deep=True).sum()
+    # Casting an already typed frame is a no-op
+    assert apply_schema(typed) is typed
+
+
+def test_parquet_and_csv_read_back_alike(tmp_path, monkeypatch):
+    monkeypatch.setattr(dio, "PROCESSED_DIR", tmp_path)
+    df = clean(make_reviews(200, seed=2)).assign(sentiment_label="positive", sentiment_score=0.5)
+    df.loc[0, "sentiment_label"] = "unknown"
+    dio.write_dataset(df, "typed", formats=("parquet",))
+    dio.write_dataset(df, "typed_csv", formats=("csv",))
+
+    from_parquet = read_reviews("typed").sort_values("review_id").reset_index(drop=True)
+    from_csv = read_reviews("typed_csv").sort_values("review_id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_categorical=False)
+    assert list(from_csv["sentiment_label"].cat.categories) == ["negative", "neutral", "positive"]
+    assert from_csv["sentiment_label"].isna().sum() == 1
+
+    # Group-bys on categories only see the banks that are present
+    sub = read_reviews("typed", columns=["bank", "rating"], banks=["Dashen Bank"])
+    assert sub.groupby("bank", observed=True).size().index.tolist() == ["Dashen Bank"]
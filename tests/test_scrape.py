@@ -0,0 +1,199 @@
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from google_play_scraper.features.reviews import _ContinuationToken
+
+import scripts.scrape_reviews as scrape
+
+
+def make_fake_reviews(total: int, fail_on_page: int = None, newest: int = 0):
+    # Review i is i days older than review 0; pass newest > 0 to publish that many newer reviews
+    calls = []
+
+    def fake_reviews(app_id, lang="en", country="us", sort=None, count=100, continuation_token=None):
+        offset = int(continuation_token.token) if continuation_token else 0
+        calls.append(offset)
+        if fail_on_page is not None and len(calls) == fail_on_page:
+            raise ConnectionError("simulated outage")
+        batch = [
+            {
+                "reviewId": f"{app_id}-{i - newest}",
+                "content": f"{app_id} review {i - newest}",
+                "score": 5,
+                "at": datetime(2025, 11, 30) - timedelta(days=i - newest),
+            }
+            for i in range(offset, min(offset + count, total))
+        ]
+        nxt = offset + len(batch)
+        token = _ContinuationToken(str(nxt) if nxt < total else None, lang, country, sort, count, None, None)
+        return batch, token
+
+    fake_reviews.calls = calls
+    return fake_reviews
+
+
+def test_scrape_all_concurrent(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app", "Bank B": "b.app"}
+    counts = scrape.scrape_all(apps, count=450, workers=2, checkpoint_path=tmp_path / "ckpt.json",
+                               watermark_path=tmp_path / "wm.json", fetch=make_fake_reviews(1000))
+
+    assert counts == {"Bank A": 450, "Bank B": 450}
+    out = pd.read_csv(tmp_path / "bank_a_reviews.csv")
+    assert len(out) == 450 and out["review"].is_unique
+    assert not (tmp_path / "ckpt.json").exists()
+
+
+def test_scrape_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    ckpt = tmp_path / "ckpt.json"
+    wm = tmp_path / "wm.json"
+
+    with pytest.raises(ConnectionError):
+        scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm,
+                          fetch=make_fake_reviews(1000, fail_on_page=3))
+    assert ckpt.exists()
+
+    fetch = make_fake_reviews(1000)
+    scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm, fetch=fetch)
+    # Only the last page is requested again, starting at the saved cursor
+    assert fetch.calls == [400]
+    out = pd.read_csv(tmp_path / "bank_a_reviews.csv")
+    assert len(out) == 500 and out["review"].is_unique
+
+
+def test_rows_appended_before_a_crash_are_not_duplicated(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    ckpt = tmp_path / "ckpt.json"
+    wm = tmp_path / "wm.json"
+    update = scrape.ScrapeCheckpoint.update
+
+    def crash_on_third_page(self, app_id, **fields):
+        if fields.get("pages") == 3:
+            raise OSError("killed after the page was appended")
+        update(self, app_id, **fields)
+
+    monkeypatch.setattr(scrape.ScrapeCheckpoint, "update", crash_on_third_page)
+    with pytest.raises(OSError):
+        scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm,
+                          fetch=make_fake_reviews(1000))
+    monkeypatch.setattr(scrape.ScrapeCheckpoint, "update", update)
+
+    fetch = make_fake_reviews(1000)
+    scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm, fetch=fetch)
+    assert fetch.calls == [400]
+    out = pd.read_csv(tmp_path / "bank_a_reviews.csv")
+    assert len(out) == 500 and out["review"].is_unique
+
+
+def test_unreadable_continuation_token_restarts_the_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    ckpt = tmp_path / "ckpt.json"
+    wm = tmp_path / "wm.json"
+    with pytest.raises(ConnectionError):
+        scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm,
+                          fetch=make_fake_reviews(1000, fail_on_page=3))
+
+    # As if the checkpoint had been written by a library version with other token fields
+    saved = json.loads(ckpt.read_text())
+    saved["apps"]["a.app"]["token"] = {"token": "400", "page_token": "x"}
+    ckpt.write_text(json.dumps(saved))
+
+    fetch = make_fake_reviews(1000)
+    scrape.scrape_all(apps, count=500, workers=1, checkpoint_path=ckpt, watermark_path=wm, fetch=fetch)
+    assert fetch.calls[0] == 0
+    out = pd.read_csv(tmp_path / "bank_a_reviews.csv")
+    assert len(out) == 500 and out["review"].is_unique
+
+
+def test_incremental_scrape_fetches_only_new_reviews(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    paths = {"checkpoint_path": tmp_path / "ckpt.json", "watermark_path": tmp_path / "wm.json"}
+
+    scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1000), **paths)
+    assert scrape.load_watermarks(paths["watermark_path"])["a.app"]["review_id"] == "a.app-0"
+
+    fetch = make_fake_reviews(1005, newest=5)
+    counts = scrape.scrape_all(apps, count=300, workers=1, fetch=fetch, incremental=True, **paths)
+
+    assert counts == {"Bank A": 5}
+    assert len(fetch.calls) == 1
+    partitions = list(tmp_path.glob("bank_a_*_reviews.csv"))
+    assert len(partitions) == 1
+    assert len(pd.read_csv(partitions[0])) == 5
+    assert scrape.load_watermarks(paths["watermark_path"])["a.app"]["review_id"] == "a.app--5"
+
+
+def test_incremental_scrape_catches_up_past_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    paths = {"checkpoint_path": tmp_path / "ckpt.json", "watermark_path": tmp_path / "wm.json"}
+    scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1000), **paths)
+
+    fetch = make_fake_reviews(1450, newest=450)
+    counts = scrape.scrape_all(apps, count=300, workers=1, fetch=fetch, incremental=True, **paths)
+    assert counts == {"Bank A": 450}
+    out = pd.read_csv(next(tmp_path.glob("bank_a_*_reviews.csv")))
+    assert len(out) == 450 and out["review"].is_unique
+    assert scrape.load_watermarks(paths["watermark_path"])["a.app"]["review_id"] == "a.app--450"
+
+
+def test_reviews_tied_with_the_watermark_are_matched_by_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    paths = {"checkpoint_path": tmp_path / "ckpt.json", "watermark_path": tmp_path / "wm.json"}
+    noon = datetime(2025, 11, 30, 12)
+
+    def listing(*ids):
+        def fetch(app_id, continuation_token=None, **kw):
+            batch = [{"reviewId": i, "content": i, "score": 4, "at": noon} for i in ids]
+            batch.append({"reviewId": "old", "content": "old", "score": 4, "at": noon - timedelta(days=1)})
+            return batch, _ContinuationToken(None, "en", "us", None, 200, None, None)
+        return fetch
+
+    scrape.scrape_all(apps, count=10, workers=1, fetch=listing("x1", "x2"), **paths)
+    assert scrape.load_watermarks(paths["watermark_path"])["a.app"]["ids"] == ["x1", "x2"]
+
+    # Same-second reviews come back in another order, with one new review among them
+    counts = scrape.scrape_all(apps, count=10, workers=1, fetch=listing("x2", "y", "x1"), incremental=True, **paths)
+    assert counts == {"Bank A": 1}
+    out = pd.read_csv(next(tmp_path.glob("bank_a_*_reviews.csv")))
+    assert out["review"].tolist() == ["y"]
+    assert scrape.load_watermarks(paths["watermark_path"])["a.app"]["ids"] == ["x1", "x2", "y"]
+
+
+def test_interrupted_incremental_partitions_are_resumed_or_discarded(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape, "RAW_DIR", tmp_path)
+    apps = {"Bank A": "a.app"}
+    paths = {"checkpoint_path": tmp_path / "ckpt.json", "watermark_path": tmp_path / "wm.json"}
+    scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1000), **paths)
+
+    # Crash on the very first page: the partition is already known to the checkpoint
+    with pytest.raises(ConnectionError):
+        scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1005, fail_on_page=1, newest=5),
+                          incremental=True, **paths)
+    partition = json.loads(paths["checkpoint_path"].read_text())["apps"]["a.app"]["output"]
+    Path(partition).write_text("review,rating,date,bank,source\npartial,5,2025-12-01,Bank A,Google Play\n")
+    # A new run stamp, so resuming must come from the checkpoint rather than a matching name
+    monkeypatch.setattr(scrape, "partition_path_for", lambda bank, stamp: tmp_path / "bank_a_later_reviews.csv")
+    scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1005, newest=5), incremental=True, **paths)
+    partitions = list(tmp_path.glob("bank_a_*_reviews.csv"))
+    assert [str(p) for p in partitions] == [partition]
+    assert len(pd.read_csv(partition)) == 5
+
+    # --fresh drops the partition of the run it abandons
+    with pytest.raises(ConnectionError):
+        scrape.scrape_all(apps, count=300, workers=1, fetch=make_fake_reviews(1250, fail_on_page=2, newest=250),
+                          incremental=True, **paths)
+    abandoned = json.loads(paths["checkpoint_path"].read_text())["apps"]["a.app"]["output"]
+    assert abandoned != partition and Path(abandoned).exists()
+    scrape.discard_checkpoint(paths["checkpoint_path"])
+    assert not Path(abandoned).exists() and Path(partition).exists()
+    assert not paths["checkpoint_path"].exists()
@@ -0,0 +1,110 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+import scripts.sentiment_engine as engine
+from scripts.sentiment_partial import label_from_score
+
+REVIEWS = pd.Series([
+    "Great app, very easy to use 😍",
+    "keeps crashing after the update",
+    "Great   app, very easy to use 😍",
+    None,
+    "it is ok",
+])
+
+
+def test_parallel_scores_match_legacy_path():
+    analyzer = SentimentIntensityAnalyzer()
+    expected = REVIEWS.fillna("").astype(str).apply(lambda t: analyzer.polarity_scores(t)["compound"])
+
+    scores = engine.score_reviews(REVIEWS, workers=2, chunksize=2)
+
+    assert scores.tolist() == expected.tolist()
+    assert engine.label_scores(scores).tolist() == expected.apply(label_from_score).tolist()
+
+
+def test_cache_only_scores_new_texts(tmp_path, monkeypatch):
+    path = tmp_path / "cache.parquet"
+    first = engine.score_reviews(REVIEWS, cache=engine.ScoreCache(path))
+    assert len(engine.ScoreCache(path)) == 4  # whitespace variants share one entry
+
+    scored = []
+    real = engine.score_texts
+    monkeypatch.setattr(engine, "score_texts", lambda texts, **kw: scored.extend(texts) or real(texts, **kw))
+    again = engine.score_reviews(pd.concat([REVIEWS, pd.Series(["terrible support"])]),
+                                 cache=engine.ScoreCache(path))
+
+    assert scored == ["terrible support"]
+    assert again[:-1].tolist() == first.tolist()
+
+
+def test_custom_backend_gets_length_grouped_batches(monkeypatch):
+    from scripts.sentiment_backends import BACKENDS, SentimentBackend, Throughput
+
+    batches = []
+
+    class LengthBackend(SentimentBackend):
+        name = "length"
+
+        def score_batch(self, texts):
+            batches.append([len(t) for t in texts])
+            return [min(len(t) / 10, 1.0) for t in texts]
+
+    monkeypatch.setitem(BACKENDS, "length", LengthBackend)
+    texts = ["a" * n for n in (9, 1, 7, 3, 5, 2)]
+    throughput = Throughput("length")
+
+    scores = engine.score_texts(texts, backend="length", options={"max_batch_size": 2}, throughput=throughput)
+
+    assert batches == [[1, 2], [3, 5], [7, 9]]
+    assert scores.tolist() == [0.9, 0.1, 0.7, 0.3, 0.5, 0.2]
+    assert throughput.texts == 6
+
+
+def test_transformers_backend_reads_three_class_labels(monkeypatch):
+    from scripts.sentiment_backends import TransformersBackend
+
+    class FakePipeline:
+        # LABEL_0/1/2 = negative/neutral/positive, as in most 3-class sentiment checkpoints
+        model = types.SimpleNamespace(config=types.SimpleNamespace(id2label={0: "LABEL_0", 1: "LABEL_1", 2: "LABEL_2"}))
+
+        def __call__(self, texts, batch_size=None):
+            probs = {"good": (0.1, 0.2, 0.7), "meh": (0.1, 0.8, 0.1), "bad": (0.6, 0.3, 0.1)}
+            return [[{"label": f"LABEL_{i}", "score": p} for i, p in enumerate(probs[t])] for t in texts]
+
+    monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(pipeline=lambda *a, **kw: FakePipeline()))
+    scores = TransformersBackend("model-dir").score(["good", "meh", "bad"])
+    assert scores == pytest.approx([0.6, 0.0, -0.5])
+
+    # An explicit map wins, e.g. for a checkpoint ordered (pos, neg)
+    backend = TransformersBackend("model-dir", label_map={"LABEL_0": 1, "LABEL_1": -1})
+    assert backend.score(["good"]) == pytest.approx([-0.1])
+
+    with pytest.raises(ValueError):
+        TransformersBackend.label_weights({0: "1 star", 1: "5 stars"})
+
+
+def test_cache_follows_the_model_file_and_whitespace_only_merges_for_vader(tmp_path, monkeypatch):
+    from scripts.sentiment_backends import BACKENDS, SentimentBackend
+
+    model = tmp_path / "model.joblib"
+    model.write_bytes(b"v1")
+    first = engine.cache_path("sklearn", {"model_path": str(model)})
+    assert engine.cache_path("sklearn", {"model_path": str(model)}) == first
+    model.write_bytes(b"v2 retrained")
+    assert engine.cache_path("sklearn", {"model_path": str(model)}) != first
+
+    class LengthBackend(SentimentBackend):
+        name = "length"
+
+        def score_batch(self, texts):
+            return [len(t) / 100 for t in texts]
+
+    monkeypatch.setitem(BACKENDS, "length", LengthBackend)
+    cache = engine.ScoreCache(tmp_path / "length.parquet")
+    scores = engine.score_reviews(pd.Series(["a b", "a  b"]), cache=cache, backend="length")
+    assert scores.tolist() == [0.03, 0.04] and len(cache) == 2
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from scripts.trends import TrendState, daily_trends, share_trends
+
+
+def _reviews():
+    return pd.DataFrame({
+        "review_id": [1, 2, 3, 4, 5, 6],
+        "review": ["great 👍", "slow", "crash again 😡", "ok", "login fails 😡😡", "nice"],
+        "rating": [5, 2, 1, 4, 1, np.nan],
+        "date": pd.to_datetime(["2024-06-01", "2024-06-01", "2024-06-03", "2024-06-03", "2024-06-03", None]),
+        "bank": ["A", "A", "A", "B", "B", "B"],
+        "sentiment_score": [0.8, -0.4, -0.6, 0.1, -0.7, 0.5],
+        "themes": ["Other", "Transaction Performance", "Reliability & Access", "Other",
+                   "Reliability & Access, Support & Service", "Other"],
+    })
+
+
+def test_incremental_updates_match_a_single_pass(tmp_path):
+    df = _reviews()
+    full = TrendState()
+    full.update(df)
+
+    # Reviews first without sentiment/themes, then the rest, then everything again
+    state = TrendState()
+    assert state.update(df.iloc[:3].drop(columns=["sentiment_score", "themes"])) == {
+        "reviews": 3, "sentiment": 0, "themes": 0}
+    state.save(tmp_path)
+    state = TrendState.load(tmp_path)
+    assert state.update(df) == {"reviews": 2, "sentiment": 5, "themes": 5}
+    assert state.update(df) == {"reviews": 0, "sentiment": 0, "themes": 0}
+
+    pd.testing.assert_frame_equal(state.daily, full.daily)
+    pd.testing.assert_series_equal(state.themes, full.themes)
+    pd.testing.assert_series_equal(state.emojis, full.emojis)
+    assert state.daily.loc[("A", pd.Timestamp("2024-06-01"))].to_dict() == {
+        "n_reviews": 2, "rating_sum": 7, "rating_n": 2, "sentiment_sum": 0.8 - 0.4,
+        "sentiment_n": 2, "n_negative": 1, "n_themed": 2}
+    assert full.themes[("B", pd.Timestamp("2024-06-03"), "Support & Service")] == 1
+    assert full.emojis[("B", pd.Timestamp("2024-06-03"), "😡")] == 2
+
+
+def test_revised_and_removed_reviews_are_taken_back_out(tmp_path):
+    state = TrendState()
+    state.update(_reviews())
+    state.save(tmp_path)
+
+    # Another sentiment model, new theme rules and one review dropped as a near-duplicate
+    revised = _reviews().iloc[[0, 1, 3, 4, 5]].assign(
+        sentiment_score=[0.8, 0.6, -0.2, -0.7, 0.5],
+        themes=["Other", "Other", "Other", "Reliability & Access", "Other"])
+    state = TrendState.load(tmp_path)
+    assert state.update(revised) == {"reviews": 1, "sentiment": 3, "themes": 3}
+    fresh = TrendState()
+    fresh.update(revised)
+    pd.testing.assert_frame_equal(state.daily, fresh.daily)
+    pd.testing.assert_series_equal(state.themes, fresh.themes)
+    pd.testing.assert_series_equal(state.emojis, fresh.emojis)
+
+    # Runs without the sentiment and themes datasets keep those counts for the remaining reviews
+    state.update(revised.iloc[1:].drop(columns=["sentiment_score", "themes"]))
+    fresh = TrendState()
+    fresh.update(revised.iloc[1:])
+    pd.testing.assert_frame_equal(state.daily, fresh.daily)
+    pd.testing.assert_series_equal(state.themes, fresh.themes)
+
+
+def test_states_without_ledgers_are_rebuilt_and_empty_input_has_all_columns(tmp_path):
+    (tmp_path / "meta.json").write_text('{"bank_days": 3, "reviews": 5}')
+    state = TrendState.load(tmp_path)
+    assert state.daily.empty and state.ledgers["reviews"].empty
+
+    trends = daily_trends(state.daily)
+    assert trends.empty and {"negative_spike", "negative_z", "sentiment_mean_7d_wow"} <= set(trends.columns)
+    assert trends[trends["negative_spike"]].empty
+
+
+def test_rolling_windows_and_shares():
+    state = TrendState()
+    state.update(_reviews())
+    daily = daily_trends(state.daily).set_index(["bank", "day"])
+
+    a = daily.loc["A"]
+    assert list(a.index.strftime("%Y-%m-%d")) == ["2024-06-01", "2024-06-02", "2024-06-03"]
+    assert a["n_reviews"].tolist() == [2, 0, 1]
+    assert a["n_reviews_7d"].tolist() == [2, 2, 3]
+    assert np.isnan(a.loc["2024-06-02", "avg_rating"])
+    assert a.loc["2024-06-03", "avg_rating_7d"] == (5 + 2 + 1) / 3
+    assert a.loc["2024-06-03", "negative_share_30d"] == 2 / 3
+
+    themes = share_trends(state.themes, state.daily["n_themed"], "theme").set_index(["bank", "day", "theme"])
+    assert themes.loc[("A", pd.Timestamp("2024-06-03"), "Reliability & Access"), "share_7d"] == 1 / 3
+    assert themes.loc[("B", pd.Timestamp("2024-06-03"), "Other"), "share_7d"] == 1 / 2
+
+
+def test_negative_spike_is_flagged():
+    days = pd.date_range("2024-01-01", periods=60, freq="D")
+    rng = np.random.default_rng(0)
+    rows = []
+    for i, day in enumerate(days):
+        n_neg = 12 if i == 50 else int(rng.integers(0, 2))
+        rows += [{"bank": "A", "day": day, "score": -0.5 if j < n_neg else 0.5} for j in range(15)]
+    df = pd.DataFrame(rows)
+    df = pd.DataFrame({"review_id": np.arange(len(df)), "review": "x", "rating": 3, "date": df["day"],
+                       "bank": df["bank"], "sentiment_score": df["score"]})
+    state = TrendState()
+    state.update(df)
+    trends = daily_trends(state.daily)
+    assert trends.loc[trends["negative_spike"], "day"].dt.strftime("%Y-%m-%d").tolist() == ["2024-02-20"]
+    assert trends["sentiment_mean_7d_wow"].notna().sum() == 60 - 7